@@ -1,8 +1,14 @@
-from flask import Flask, send_from_directory
+from flask import Flask, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from config import Config
+from .snapshot_cache import SnapshotCache
+from .metrics import RequestMetrics
+from .diagnostics import Diagnostics
+from .json_provider import FastJSONProvider
+from .static_files import serve_static
+from .sqlite_profile import configure_sqlite
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -10,11 +16,17 @@ from logging.handlers import RotatingFileHandler
 # 在全局作用域创建扩展实例
 db = SQLAlchemy()
 migrate = Migrate()
+snapshot_cache = SnapshotCache()
+metrics = RequestMetrics()
+diagnostics = Diagnostics()
 
 def create_app(config_class=Config):
     # 创建 Flask app 实例
-    app = Flask(__name__, static_folder=config_class.STATIC_FOLDER)
+    app = Flask(__name__, static_folder=config_class.STATIC_FOLDER, static_url_path='/static')
     app.config.from_object(config_class)
+    # 【新增】jsonify 在装有 orjson 时用 orjson 编码 (输出不变)，见 json_provider.py
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = app.json.use_orjson and app.config.get('JSON_PROVIDER', 'auto') != 'stdlib'
 
     # --- 日志配置 ---
     # 只有在非调试模式下才启用文件日志记录
@@ -58,23 +70,57 @@ def create_app(config_class=Config):
         if not os.path.exists(subdir_path):
             os.makedirs(subdir_path)
 
-    # --- 静态文件路由 (主要用于本地开发) ---
-    @app.route('/static/<path:filename>')
+    # --- 静态文件路由 (生产环境中不带摘要的请求由 nginx 直接发送，带摘要的经过这里核对后由 nginx 发送文件内容) ---
+    # 【修改】带内容摘要 (?v=) 的地址返回 immutable 缓存头，其余用强 ETag 协商 (见 static_files.py)
+    # Flask 自带的 static 路由 (static_url_path 固定为 /static) 先注册、会遮住同一路径的新路由，所以直接替换它的视图函数
     def static_files(filename):
-        return send_from_directory(app.config['STATIC_FOLDER'], filename)
+        return serve_static(app.config['STATIC_FOLDER'], filename)
+    app.view_functions['static'] = static_files
     
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return serve_static(app.config['UPLOAD_FOLDER'], filename)
 
     # --- 扩展初始化 ---
     db.init_app(app)
+    # 【新增】SQLite 连接参数 (WAL、busy_timeout 等)，见 sqlite_profile.py
+    with app.app_context():
+        configure_sqlite(app, db.engine)
     migrate.init_app(app, db)
-    CORS(app)
+    snapshot_cache.init_app(app)
+    # 【新增】/sale/api 请求计时 (Server-Timing 响应头 + /metrics)，见 metrics.py
+    metrics.init_app(app)
+    # 【新增】慢查询日志与采样分析 (默认关闭)，输出在 app/logs 下，见 diagnostics.py
+    diagnostics.init_app(app)
+    with app.app_context():
+        metrics.init_engine(db.engine)
+        diagnostics.init_engine(db.engine)
+    # 顾客菜单的版本号放在响应头中，跨域部署时需要暴露给前端
+    CORS(app, expose_headers=['X-Menu-Version', 'Server-Timing', 'Idempotent-Replayed'])
+
+    # 【新增】Prometheus 指标 (所有 worker 合并)；nginx 只允许本机访问
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if not metrics.enabled:
+            return Response('metrics disabled\n', status=404, mimetype='text/plain')
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
     # --- 蓝图注册 ---
     from .sale_system import sale_bp
     app.register_blueprint(sale_bp, url_prefix='/sale')
+
+    # 【新增】定时取消过期的待处理订单 (多个 worker 用文件锁选出一个执行)，见 order_sweeper.py
+    from .sale_system.order_sweeper import OrderSweeper
+    OrderSweeper().init_app(app)
+
+    # --- 管理命令注册 ---
+    from .commands import register_commands
+    register_commands(app)
+
+    # --- 可选：预加载重量级依赖 (默认关闭，按需导入) ---
+    if app.config.get('PRELOAD_HEAVY_MODULES'):
+        from .warmup import preload_heavy_modules
+        preload_heavy_modules(app)
     
     return app
 
@@ -0,0 +1,129 @@
+import csv
+import click
+from flask.cli import with_appcontext
+from . import snapshot_cache
+from .models import MasterProduct
+from .sqlite_profile import immediate_transactions
+from .sale_system.inventory import recount_products
+from .sale_system.image_pipeline import process_product_image
+from .sale_system.catalog_import import import_catalog, CatalogImportError
+from .sale_system.order_sweeper import expire_stale_orders
+from .sale_system.order_feed import purge_order_changes
+
+
+# --- 管理命令 (flask <command>) ---
+
+@click.command('recount-stock')
+@click.option('--event-id', type=int, default=None, help='只核对指定展会的商品')
+@click.option('--fix', is_flag=True, help='用订单明细的统计结果覆盖计数器 (迁移后回填也用它)')
+@with_appcontext
+def recount_stock_command(event_id, fix):
+    """核对 Product 的已售/预留计数器是否与订单明细一致"""
+    if fix:
+        # 统计与覆盖在同一个 BEGIN IMMEDIATE 事务内，期间的新订单不会被覆盖掉
+        with immediate_transactions():
+            mismatches = recount_products(event_id=event_id, fix=fix)
+    else:
+        mismatches = recount_products(event_id=event_id, fix=fix)
+    if not mismatches:
+        click.echo('所有商品的计数器都与订单明细一致。')
+        return
+
+    for m in mismatches:
+        click.echo(
+            f"商品 {m['product_id']} (展会 {m['event_id']}): "
+            f"sold {m['sold_quantity']} -> {m['expected_sold_quantity']}, "
+            f"reserved {m['reserved_quantity']} -> {m['expected_reserved_quantity']}"
+        )
+    if fix:
+        click.echo(f'已修正 {len(mismatches)} 个商品的计数器。')
+    else:
+        click.echo(f'发现 {len(mismatches)} 个商品的计数器不一致，使用 --fix 修正。')
+        raise SystemExit(1)
+
+
+@click.command('cache-stats')
+@with_appcontext
+def cache_stats_command():
+    """查看统计快照缓存的命中/未命中次数"""
+    stats = snapshot_cache.stats()
+    if not stats:
+        click.echo('快照缓存未启用或暂无记录。')
+        return
+    for namespace, s in sorted(stats.items()):
+        total = s['hits'] + s['misses']
+        ratio = s['hits'] / total if total else 0
+        click.echo(f"{namespace}: 命中 {s['hits']}, 未命中 {s['misses']} (命中率 {ratio:.1%}), 条目 {s['entries']}")
+
+
+@click.command('process-images')
+@click.option('--all', 'reprocess_all', is_flag=True, help='重新生成所有商品图片的各尺寸 (默认只处理还没有生成的)')
+@with_appcontext
+def process_images_command(reprocess_all):
+    """为主商品图片生成各尺寸 WebP (回填旧数据，或补做重启时未完成的后台任务)"""
+    query = MasterProduct.query.filter(MasterProduct.image_url.isnot(None))
+    if not reprocess_all:
+        query = query.filter(MasterProduct.image_variants.is_(None))
+    targets = [(mp.id, mp.image_url) for mp in query.order_by(MasterProduct.id)]
+    done = sum(1 for mp_id, image_url in targets if process_product_image(mp_id, image_url))
+    click.echo(f'已处理 {done}/{len(targets)} 个商品图片。')
+
+
+@click.command('import-catalog')
+@click.argument('catalog', type=click.Path(exists=True, dir_okay=False))
+@click.option('--images', type=click.Path(exists=True, dir_okay=False), default=None, help='商品图片 ZIP')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='把每一行的导入结果写入 CSV 文件')
+@with_appcontext
+def import_catalog_command(catalog, images, report):
+    """从 CSV / XLSX 批量导入主商品目录 (按编号新增或更新)"""
+    report_file = open(report, 'w', newline='', encoding='utf-8-sig') if report else None
+    writer = csv.writer(report_file) if report_file else None
+    if writer:
+        writer.writerow(['line', 'product_code', 'result', 'detail'])
+
+    def on_row(entry):
+        detail = entry.get('error') or ' '.join(entry.get('changes', []))
+        if writer:
+            writer.writerow([entry['line'], entry['product_code'], entry['result'], detail])
+        if entry['result'] == 'failed':
+            click.echo(f"第 {entry['line']} 行 ({entry['product_code']}): {detail}", err=True)
+
+    images_file = open(images, 'rb') if images else None
+    try:
+        with open(catalog, 'rb') as catalog_file:
+            summary = import_catalog(catalog_file, catalog, images_file, on_row=on_row)
+    except CatalogImportError as e:
+        raise click.ClickException(str(e))
+    finally:
+        for f in (images_file, report_file):
+            if f:
+                f.close()
+    click.echo(
+        f"新增 {summary['created']}，更新 {summary['updated']}，"
+        f"未变化 {summary['unchanged']}，失败 {summary['failed']}。"
+    )
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+@click.command('expire-orders')
+@click.option('--dry-run', is_flag=True, help='只统计会被取消的订单，不修改')
+@with_appcontext
+def expire_orders_command(dry_run):
+    """取消超过保留时长的待处理订单并释放预留的库存，顺带清理过期的订单变更记录 (可以由 cron 定时执行)"""
+    report = expire_stale_orders(dry_run=dry_run)
+    for event_id, count in sorted(report['events'].items()):
+        click.echo(f'展会 {event_id}: {count} 个订单')
+    action = '将取消' if dry_run else '已取消'
+    click.echo(f"{action} {report['orders']} 个过期的待处理订单，释放 {report['units']} 件库存。")
+    if not dry_run:
+        click.echo(f"清理了 {purge_order_changes()} 条过期的订单变更记录。")
+
+
+def register_commands(app):
+    app.cli.add_command(recount_stock_command)
+    app.cli.add_command(cache_stats_command)
+    app.cli.add_command(process_images_command)
+    app.cli.add_command(import_catalog_command)
+    app.cli.add_command(expire_orders_command)
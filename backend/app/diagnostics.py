@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+# --- 线上诊断：慢查询日志 + 采样分析 ---
+# 展会现场变慢之后很难复现，这两个开关可以在生产环境常开：
+#   慢查询日志   超过 SLOW_QUERY_MS 的 SQL 语句连同参数、耗时、来源接口写入 logs/slow_queries.log
+#                (每行一个 JSON，按大小轮转)。关闭时不注册任何引擎事件。
+#   采样分析     按 PROFILER_SAMPLE_RATE 的比例抽取请求，由后台线程每 PROFILER_INTERVAL_MS 毫秒
+#                抓一次该请求线程的调用栈，请求结束后写成 collapsed stack 文件 (flamegraph.pl、
+#                speedscope 可以直接打开)，放在 logs/profiles/ 下，总大小超过 PROFILER_MAX_BYTES
+#                时删除最旧的。未被抽中的请求只多一次随机数判断。
+
+PROFILE_SUFFIX = '.collapsed'
+MAX_PARAMS_LENGTH = 1000
+
+
+class Diagnostics:
+    def __init__(self, app=None):
+        self.folder = None
+        self.slow_query_seconds = None
+        self.sample_rate = 0.0
+        self.profile_folder = None
+        self._slow_logger = None
+        self._sampler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.config.get('DIAGNOSTICS_FOLDER') or os.path.join(app.root_path, 'logs')
+        self.profile_folder = os.path.join(self.folder, 'profiles')
+        app.extensions['diagnostics'] = self
+
+        if app.config.get('SLOW_QUERY_LOG_ENABLED'):
+            self.slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+            self._slow_logger = _file_logger(
+                'abl.slow_query', self.slow_query_path,
+                app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)
+            )
+
+        if app.config.get('PROFILER_ENABLED'):
+            self.sample_rate = app.config.get('PROFILER_SAMPLE_RATE', 0.01)
+            self.min_profile_seconds = app.config.get('PROFILER_MIN_DURATION_MS', 0) / 1000
+            self.max_profile_bytes = app.config.get('PROFILER_MAX_BYTES', 50 * 1024 * 1024)
+            self._sampler = StackSampler(app.config.get('PROFILER_INTERVAL_MS', 5) / 1000)
+            os.makedirs(self.profile_folder, exist_ok=True)
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+
+    @property
+    def slow_query_path(self):
+        return os.path.join(self.folder, 'slow_queries.log')
+
+    # --- 慢查询日志 ---
+
+    def init_engine(self, engine):
+        """注册慢查询的引擎事件 (需要在 db.init_app 之后、应用上下文中调用)"""
+        if self._slow_logger is None:
+            return
+
+        # 与 metrics 相同，开始时间记在执行上下文上 (语句出错时随上下文丢弃)
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._slow_query_started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, '_slow_query_started', None)
+            if started is None:
+                return
+            duration = time.perf_counter() - started
+            if duration >= self.slow_query_seconds:
+                self._log_slow_query(statement, parameters, executemany, duration)
+
+    def _log_slow_query(self, statement, parameters, executemany, duration):
+        if has_request_context():
+            route = request.url_rule.rule if request.url_rule else request.path
+            origin = f'{request.method} {route}'
+        else:
+            origin = threading.current_thread().name  # 后台线程 / 命令行
+        if executemany:
+            params = {'rows': len(parameters), 'first': parameters[0] if parameters else None}
+        else:
+            params = parameters
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': round(duration * 1000, 1),
+            'origin': origin,
+            'sql': ' '.join(statement.split()),
+            'params': repr(params)[:MAX_PARAMS_LENGTH],
+            'pid': os.getpid(),
+        }
+        self._slow_logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def recent_slow_queries(self, limit=100):
+        """最近的慢查询 (新的在前)，只读当前日志文件，不含已轮转的部分"""
+        if not os.path.exists(self.slow_query_path):
+            return []
+        with open(self.slow_query_path, encoding='utf-8') as f:
+            lines = f.readlines()[-limit:]
+        entries = []
+        for line in reversed(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    # --- 采样分析 ---
+
+    def _before_request(self):
+        if request.path.startswith('/sale/api/') and random.random() < self.sample_rate:
+            g.profile_started = time.perf_counter()
+            self._sampler.start(threading.get_ident())
+
+    def _after_request(self, response):
+        started = g.pop('profile_started', None)
+        if started is None:
+            return response
+        stacks = self._sampler.stop(threading.get_ident())
+        duration = time.perf_counter() - started
+        if stacks and duration >= self.min_profile_seconds:
+            try:
+                self._write_profile(stacks, duration, response.status_code)
+            except OSError:
+                # 写不进去 (磁盘满等) 不影响请求本身
+                pass
+        return response
+
+    def _write_profile(self, stacks, duration, status):
+        rule = request.url_rule.rule if request.url_rule else request.path
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '.', rule.strip('/'))
+        # 文件名：时间_进程_耗时_方法_状态码_接口 (接口放最后，本身可以含下划线)
+        name = (f"{datetime.now():%Y%m%dT%H%M%S%f}_{os.getpid()}_{round(duration * 1000)}ms_"
+                f"{request.method}_{status}_{slug}{PROFILE_SUFFIX}")
+        with open(os.path.join(self.profile_folder, name), 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        self._rotate_profiles()
+
+    def _rotate_profiles(self):
+        files = self.list_profiles()
+        total = sum(p['size'] for p in files)
+        # list_profiles 新的在前，从最旧的开始删
+        for profile in reversed(files):
+            if total <= self.max_profile_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.profile_folder, profile['name']))
+            except OSError:
+                continue
+            total -= profile['size']
+
+    def list_profiles(self):
+        if not self.profile_folder or not os.path.isdir(self.profile_folder):
+            return []
+        profiles = []
+        for entry in os.scandir(self.profile_folder):
+            if not entry.name.endswith(PROFILE_SUFFIX):
+                continue
+            parts = entry.name[:-len(PROFILE_SUFFIX)].split('_', 5)
+            if len(parts) != 6:
+                continue
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+                'pid': parts[1],
+                'duration_ms': int(parts[2].rstrip('ms') or 0),
+                'method': parts[3],
+                'status': parts[4],
+                'route': parts[5],
+            })
+        profiles.sort(key=lambda p: p['name'], reverse=True)
+        return profiles
+
+    def profile_path(self, name):
+        """按文件名找到分析文件，名称不合法或不存在时返回 None"""
+        if not self.profile_folder or os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.profile_folder, name)
+        return path if os.path.isfile(path) else None
+
+
+class StackSampler:
+    """
+    每个进程一个后台线程，只在有请求被抽中时工作：定时抓取这些线程当前的调用栈，
+    按 "根;...;叶" 的 collapsed 格式计数。
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._wakeup.clear()
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, counter in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[_collapse(frame)] += 1
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _file_logger(name, path, max_bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=5, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    return logger
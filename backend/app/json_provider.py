@@ -0,0 +1,92 @@
+import re
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 可选依赖：pip install orjson
+    orjson = None
+
+# --- 更快的 JSON 编码 (可选 orjson) ---
+# 列表接口返回几百上千行时，标准库 json 的编码占了不少 CPU。安装了 orjson 时，jsonify 改用 orjson 编码，
+# 输出与 Flask 默认的 (键排序、紧凑分隔符、非 ASCII 字符转成 \uXXXX、末尾换行) 逐字节相同，
+# 快照缓存里已有的内容、ETag、客户端都不受影响：
+#   - orjson 直接输出 UTF-8，这里用 C 实现的 backslashreplace 把非 ASCII 字符转成 \uXXXX (小写十六进制，
+#     与标准库相同)，少数 \xNN / \UNNNNNNNN 再改写成 \u00NN / 代理对；DEL (0x7f) 标准库也会转义
+#   - 标准库对 >=1e16 或 <1e-4 的浮点数用指数形式 (1e+16、1e-05)，orjson 不同；
+#     输出中出现这类数字 (或看起来像的文本) 时改用标准库重新编码
+#   - 日期、Decimal、dataclass 等交给 Flask 默认的 default 处理，orjson 不支持的对象 (超过 64 位的整数等)
+#     抛出异常时也改用标准库
+#   - 不开启 OPT_NON_STR_KEYS：orjson 把整数等非字符串键按字符串排序 ("10" 在 "2" 前面)，
+#     标准库按原始值排序，遇到非字符串键时 orjson 抛出异常，同样改用标准库
+# 唯一无法对齐的是 NaN/Infinity (标准库输出非法的 NaN，orjson 输出 null)，数据库里的数值不会出现 NaN。
+# 调试模式 (带缩进输出) 或 JSON_PROVIDER=stdlib 时始终使用标准库。
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+# 标准库会写成指数形式的浮点数在 orjson 输出里的特征片段：1e16 ~ 1e308 (e1/e2/e3)、1e-7 (e-)、
+# 0.00001 ~ 0.0000999 (0.0000)。bytes.find 先找片段，找到了再往前确认是不是数字 (而不是字符串里的文本)，
+# 比正则扫描整个输出快得多
+_FLOAT_MARKERS = (b'e-', b'e1', b'e2', b'e3', b'0.0000')
+_NUMBER_BYTES = frozenset(b'0123456789.-')
+_NUMBER_START = frozenset(b':,[')
+# backslashreplace 对 U+0080~U+00FF 输出 \xNN、对超出 BMP 的字符输出 \UNNNNNNNN，需要改成 JSON 的 \uXXXX；
+# 前面有偶数个反斜杠 (转义后的字面反斜杠) 时才是真正的转义序列
+_NON_JSON_ESCAPE = re.compile(rb'(?<!\\)((?:\\\\)*)\\(x[0-9a-f]{2}|U[0-9a-f]{8})')
+
+
+def _has_exponent_float(payload):
+    for marker in _FLOAT_MARKERS:
+        pos = payload.find(marker)
+        while pos != -1:
+            start = pos
+            while start and payload[start - 1] in _NUMBER_BYTES:
+                start -= 1
+            if (start < pos or not marker.startswith(b'e')) and (start == 0 or payload[start - 1] in _NUMBER_START):
+                return True
+            pos = payload.find(marker, pos + 1)
+    return False
+
+
+def _json_escape(match):
+    n = int(match.group(2)[1:], 16)
+    if n > 0xFFFF:
+        n -= 0x10000
+        return match.group(1) + b'\\u%04x\\u%04x' % (0xD800 | (n >> 10), 0xDC00 | (n & 0x3FF))
+    return match.group(1) + b'\\u%04x' % n
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify 在装有 orjson 时用 orjson 编码，输出与 DefaultJSONProvider 相同"""
+
+    use_orjson = orjson is not None
+
+    def default(self, o):
+        # 只读 DTO (见 sale_system/read_models.py) 直接编码，不需要在路由里先转成 dict
+        to_dict = getattr(o, 'to_dict', None)
+        if to_dict is not None and getattr(o, '__slots__', None) is not None:
+            return to_dict()
+        return super().default(o)
+
+    def encode_compact(self, obj):
+        """与 response() 的紧凑输出相同的字节 (不含末尾换行)"""
+        if self.use_orjson and self.sort_keys and self.ensure_ascii:
+            try:
+                payload = orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS)
+            except TypeError:
+                payload = None
+            if payload is not None and not _has_exponent_float(payload):
+                if not payload.isascii():
+                    payload = payload.decode().encode('ascii', 'backslashreplace')
+                    if b'\\x' in payload or b'\\U' in payload:
+                        payload = _NON_JSON_ESCAPE.sub(_json_escape, payload)
+                return payload.replace(b'\x7f', b'\\u007f')
+        return self.dumps(obj, separators=(',', ':')).encode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode_compact(obj) + b'\n', mimetype=self.mimetype)
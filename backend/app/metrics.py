@@ -0,0 +1,190 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from .sqlite_profile import sqlite_side_path
+
+# 请求耗时直方图的桶上限 (秒)，最后还有一个 +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAMS = {
+    'http_request_duration_seconds': '请求处理耗时 (不含流式响应的发送时间)',
+    'http_request_sql_duration_seconds': '请求内执行 SQL 的累计耗时',
+}
+COUNTERS = {
+    'http_requests_total': '请求数',
+    'http_request_sql_statements_total': '请求内执行的 SQL 语句数',
+    'http_response_bytes_total': '响应体字节数 (流式响应不计)',
+}
+
+
+class RequestMetrics:
+    """
+    /sale/api 请求的计时与统计。
+
+    每个请求记录总耗时、SQL 语句数与 SQL 耗时 (通过 SQLAlchemy 引擎事件) 和响应大小，
+    以 Server-Timing 响应头返回 (浏览器开发者工具的 Timing 面板可以直接看到)，
+    同时累加到按接口 (URL 规则) 区分的直方图/计数器中。
+
+    gunicorn 的每个 worker 是独立进程，各自先在内存里累加，至多每 METRICS_FLUSH_INTERVAL 秒
+    把增量加到一个共享的 SQLite 文件里 (与快照缓存相同的做法)。直方图按桶计数、求和都是简单相加，
+    所以多个 worker 的数据合并后仍然正确。/metrics 从这个文件输出 Prometheus 文本格式。
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self.enabled = True
+        self.flush_interval = 1.0
+        self._pending = defaultdict(float)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+        self.path = app.config.get('METRICS_PATH') or sqlite_side_path(app, '-metrics', 'metrics.db')
+        app.extensions['request_metrics'] = self
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS series ('
+                ' metric TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL,'
+                ' PRIMARY KEY (metric, labels))'
+            )
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        atexit.register(self.flush)
+
+    def init_engine(self, engine):
+        """注册 SQL 计时的引擎事件 (需要在 db.init_app 之后、应用上下文中调用)"""
+        if not self.enabled:
+            return
+
+        # 开始时间记在这条语句的执行上下文上：语句出错时没有 after_cursor_execute，
+        # 上下文随语句一起丢弃，不会在连接上留下多余的记录
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._metrics_started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, '_metrics_started', None)
+            if started is None:
+                return
+            # 只统计请求线程内的语句；后台线程 (导出、图片处理) 没有请求上下文
+            if has_request_context() and 'request_timing' in g:
+                timing = g.request_timing
+                timing['sql_count'] += 1
+                timing['sql_seconds'] += time.perf_counter() - started
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- 请求计时 ---
+
+    def _before_request(self):
+        if request.path.startswith('/sale/api/'):
+            g.request_timing = {'started': time.perf_counter(), 'sql_count': 0, 'sql_seconds': 0.0}
+
+    def _after_request(self, response):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return response
+        duration = time.perf_counter() - timing['started']
+        response.headers['Server-Timing'] = (
+            f"app;dur={duration * 1000:.1f}, "
+            f"db;dur={timing['sql_seconds'] * 1000:.1f};desc=\"{timing['sql_count']} queries\""
+        )
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = f'method="{request.method}",endpoint="{_escape(endpoint)}"'
+        size = None if response.is_streamed else response.calculate_content_length()
+        self._record(labels, response.status_code, duration, timing, size)
+        return response
+
+    def _record(self, labels, status, duration, timing, size):
+        with self._lock:
+            pending = self._pending
+            pending[('http_requests_total', f'{labels},status="{status}"')] += 1
+            pending[('http_request_sql_statements_total', labels)] += timing['sql_count']
+            if size is not None:
+                pending[('http_response_bytes_total', labels)] += size
+            for metric, value in (('http_request_duration_seconds', duration),
+                                  ('http_request_sql_duration_seconds', timing['sql_seconds'])):
+                # 只记在第一个能放下的桶里，输出时再累加成 Prometheus 的累积桶
+                le = next((f'{bound}' for bound in DURATION_BUCKETS if value <= bound), '+Inf')
+                pending[(f'{metric}_bucket', f'{labels},le="{le}"')] += 1
+                pending[(f'{metric}_sum', labels)] += value
+                pending[(f'{metric}_count', labels)] += 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把本进程累计的增量加到共享文件里"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+        if not pending or not self.enabled:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    'INSERT INTO series (metric, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT(metric, labels) DO UPDATE SET value = value + excluded.value',
+                    [(metric, labels, value) for (metric, labels), value in pending.items()]
+                )
+        except sqlite3.Error:
+            # 写入失败 (例如文件被锁住超时) 时放回去，下次再写
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    # --- 输出 ---
+
+    def render(self):
+        """所有 worker 合并后的 Prometheus 文本格式"""
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute('SELECT metric, labels, value FROM series ORDER BY metric, labels').fetchall()
+        series = defaultdict(dict)
+        for metric, labels, value in rows:
+            series[metric][labels] = value
+
+        lines = []
+        for name, help_text in COUNTERS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{{labels}}} {_number(value)}' for labels, value in series[name].items()]
+        for name, help_text in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for labels, count in series[f'{name}_count'].items():
+                cumulative = 0
+                for bound in [f'{b}' for b in DURATION_BUCKETS] + ['+Inf']:
+                    cumulative += series[f'{name}_bucket'].get(f'{labels},le="{bound}"', 0)
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {_number(cumulative)}')
+                lines.append(f'{name}_sum{{{labels}}} {series[f"{name}_sum"].get(labels, 0)!r}')
+                lines.append(f'{name}_count{{{labels}}} {_number(count)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from . import db
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.orm import joinedload, selectinload
 
 # Event (展会) 模型
 class Event(db.Model):
@@ -13,9 +14,39 @@ class Event(db.Model):
     
     products = db.relationship('Product', backref='event', lazy=True, cascade="all, delete-orphan")
     orders = db.relationship('Order', backref='event', lazy=True, cascade="all, delete-orphan")
+    order_changes = db.relationship('OrderChange', lazy=True, cascade="all, delete-orphan")
     vendor_password = db.Column(db.String(128), nullable=True) # nullable=True 表示可以为空 
 
     qrcode_url=db.Column(db.String(256),nullable=True)
+    # 【新增】数据版本：订单、商品等任何影响该展会统计数据的修改都会加一，用作缓存的失效依据
+    data_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # 【新增】顾客菜单的版本 (取值与 data_version 同一序列)：
+    # menu_version = 菜单最后一次变化时的 data_version (商品增删改或某个商品的 current_stock 变化)
+    # lineup_version = 商品阵容最后一次变化时的 data_version (增删商品、价格/名称/图片变化)，
+    # 早于它的客户端无法只靠库存增量更新，需要重新拉取完整菜单
+    menu_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    lineup_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # 【新增】待处理订单的保留时长 (分钟)，超过后由 order_sweeper 自动取消并释放预留的库存；
+    # 为空时使用 PENDING_ORDER_TTL_MINUTES，0 表示不自动取消
+    pending_order_ttl_minutes = db.Column(db.Integer, nullable=True)
+
+    @classmethod
+    def bump_data_version(cls, *event_ids, menu=False, lineup=False):
+        """
+        在当前事务内把指定展会的数据版本加一 (SQL 自增，多 worker 并发也不会丢失)。
+        menu=True 表示顾客菜单 (库存) 也变了，lineup=True 表示商品阵容变了 (隐含 menu)。
+        """
+        if not event_ids:
+            return
+        new_version = cls.data_version + 1
+        values = {cls.data_version: new_version}
+        if menu or lineup:
+            values[cls.menu_version] = new_version
+        if lineup:
+            values[cls.lineup_version] = new_version
+        db.session.query(cls).filter(cls.id.in_(event_ids))\
+            .update(values, synchronize_session=False)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -23,7 +54,8 @@ class Event(db.Model):
             'date': self.date.isoformat(),
             'location': self.location,
             'status': self.status,  # 直接从数据库字段读取 status
-            'qrcode_url':self.qrcode_url
+            'qrcode_url':self.qrcode_url,
+            'pending_order_ttl_minutes': self.pending_order_ttl_minutes
         }
 
 # 【新增】MasterProduct (主商品) 模型
@@ -34,11 +66,19 @@ class MasterProduct(db.Model):
     name = db.Column(db.String(128), nullable=False)
     default_price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(256))
+    # 【新增】后台生成的各尺寸图片 {'original', 'detail', 'thumb': URL, 'placeholder': data URI}，
+    # 处理完成前为空，此时 image_url 指向上传的原始文件 (见 sale_system/image_pipeline.py)
+    image_variants = db.Column(db.JSON(none_as_null=True), nullable=True)
     is_active = db.Column(db.Boolean, default=True, nullable=False, index=True)
     # 反向关系，可以找到所有使用此模板的展会商品
     products = db.relationship('Product', backref='master_product', lazy=True, cascade="all, delete-orphan")
 
     category = db.Column(db.String(64), nullable=True, index=True)  # 新增分类字段
+
+    __table_args__ = (
+        # 【新增】默认只列出上架商品并按编号分页，(is_active, product_code) 可直接按游标定位、无需排序
+        db.Index('ix_master_product_is_active_product_code', 'is_active', 'product_code'),
+    )
     
     def to_dict(self):
         return {
@@ -47,6 +87,7 @@ class MasterProduct(db.Model):
             'name': self.name,
             'default_price': self.default_price,
             'image_url': self.image_url,
+            'image_variants': self.image_variants or {},
             'is_active': self.is_active,
             'category': self.category
         }
@@ -60,30 +101,44 @@ class Product(db.Model):
     initial_stock = db.Column(db.Integer, nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     master_product_id = db.Column(db.Integer, db.ForeignKey('master_product.id'), nullable=False)
+    # 【新增】冗余计数器：随订单创建/状态变更在同一事务内维护 (见 sale_system/inventory.py)
+    # sold_quantity = 已完成(completed)订单中的数量, reserved_quantity = 待处理(pending)订单中的数量
+    sold_quantity = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    reserved_quantity = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # 【新增】current_stock 最后一次变化时所属展会的 data_version，用于顾客菜单的库存增量更新
+    stock_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     __table_args__ = (
         UniqueConstraint('event_id', 'master_product_id', name='_event_master_product_uc'),
+        # 【新增】按主商品查找所有展会商品 (主商品信息/图片变化时让相关展会的缓存失效)
+        db.Index('ix_product_master_product_id', 'master_product_id'),
     )
 
-    # 【新增】计算属性：已售出数量
+    # 【修改】计算属性：已售出数量，直接读取计数器，不再每次 SUM 订单明细
     @property
     def sold_count(self):
         """只计算已完成订单中的销量"""
-        from .models import Order, OrderItem 
-        count = db.session.query(db.func.sum(OrderItem.quantity)).join(Order).filter(
-            OrderItem.product_id == self.id,
-            Order.status == 'completed'
-        ).scalar()
-        return count or 0
+        return self.sold_quantity or 0
 
     # 【新增】计算属性：当前库存
     @property
     def current_stock(self):
         """当前库存 = 初始库存 - 已售出数量"""
         return self.initial_stock - self.sold_count
+
+    # 【新增】计算属性：可下单库存 (还要扣除待处理订单占用的数量)
+    @property
+    def available_stock(self):
+        """可用库存 = 初始库存 - 已售出数量 - 已预留数量"""
+        return self.initial_stock - self.sold_count - (self.reserved_quantity or 0)
     @property
     def name(self):
         return self.master_product.name if self.master_product else "未知商品"
 
+    @classmethod
+    def event_data_version(cls):
+        """SQL 表达式：商品所属展会当前的 data_version，用于在 UPDATE 中设置 stock_version"""
+        return db.select(Event.data_version).where(Event.id == cls.event_id).scalar_subquery()
+
     def to_dict(self):
         # 通过关系，将主商品的信息和本次展会的信息组合在一起返回
         return {
@@ -95,6 +150,7 @@ class Product(db.Model):
             'initial_stock': self.initial_stock,
             'current_stock': self.current_stock, # 【新增】在 API 响应中加入当前库存
             'image_url': self.master_product.image_url,
+            'image_variants': self.master_product.image_variants or {},
             'event_id': self.event_id,
             'category': self.master_product.category
         }
@@ -103,15 +159,26 @@ class Product(db.Model):
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    # 【新增】最后修改时间，状态变更时更新，用于增量拉取 (updated_since)
+    updated_at = db.Column(db.DateTime, index=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(64), default='pending') # pending, completed, cancelled
     total_amount = db.Column(db.Float, nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
+    # 【新增】热点查询的复合索引 (用 benchmarks/query_plans.py 检查执行计划)：
+    # 订单列表按展会筛选、按下单时间倒序；带状态筛选时 (待处理订单) 用第二个；
+    # 第三个是统计汇总 (按状态条件求和) 的覆盖索引，不需要回表
+    __table_args__ = (
+        db.Index('ix_order_event_id_timestamp', 'event_id', 'timestamp'),
+        db.Index('ix_order_event_id_status_timestamp', 'event_id', 'status', 'timestamp'),
+        db.Index('ix_order_event_id_status_total_amount', 'event_id', 'status', 'total_amount'),
+    )
 
     def to_dict(self):
         return {
             'id': self.id,
             'timestamp': self.timestamp.isoformat(),
+            'updated_at': (self.updated_at or self.timestamp).isoformat(),
             'status': self.status,
             'total_amount': self.total_amount,
             'event_id': self.event_id,
@@ -127,6 +194,11 @@ class OrderItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     # 建立与 Product 的关系，以便轻松获取商品信息
     product = db.relationship('Product')
+    # 【新增】按订单批量加载订单项 (selectinload) 的覆盖索引；按商品汇总订单项 (recount-stock) 用第二个
+    __table_args__ = (
+        db.Index('ix_order_item_order_id_product_id_quantity', 'order_id', 'product_id', 'quantity'),
+        db.Index('ix_order_item_product_id', 'product_id'),
+    )
 
     def to_dict(self):
         return {
@@ -136,4 +208,46 @@ class OrderItem(db.Model):
             'product_name': self.product.master_product.name, 
             'product_price': self.product.price,
             'product_image_url': self.product.master_product.image_url 
-        }
\ No newline at end of file
+        }
+
+
+# 【新增】OrderChange (订单变更流水) 模型
+# 订单创建/状态变更时在同一事务内写入一行，SSE 推送接口按自增 id 读取，
+# 因为存放在数据库里，所有 gunicorn worker 都能看到同一份变更流。
+class OrderChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    kind = db.Column(db.String(32), nullable=False) # order_created, order_status
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    order = db.relationship('Order')
+    __table_args__ = (
+        db.Index('ix_order_change_event_id_id', 'event_id', 'id'),
+    )
+
+
+# 【新增】IdempotencyRecord (下单幂等记录) 模型
+# 顾客端带 Idempotency-Key 重试下单时，直接返回第一次成功的响应，不会重复下单、重复预留库存。
+# 记录过了 IDEMPOTENCY_KEY_TTL 就失效，由下单接口顺带定期清理 (按 created_at 索引删除)。
+class IdempotencyRecord(db.Model):
+    event_id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(128), primary_key=True)
+    # 请求体的摘要：同一个 key 带着不同的请求体重试时拒绝，而不是返回别的订单
+    request_hash = db.Column(db.String(32), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow)
+
+
+# 【新增】列表接口使用的预加载策略
+# to_dict() 会访问关联对象，若逐行懒加载，N 行数据就会产生 N 次以上的额外查询。
+# 列表查询统一加上这些选项，查询次数与行数无关。
+# (master_product 等 backref 要到 mapper 配置完成后才存在，所以用函数而不是模块级常量)
+def product_load_options():
+    return (joinedload(Product.master_product),)
+
+
+def order_load_options():
+    return (
+        selectinload(Order.items).joinedload(OrderItem.product).joinedload(Product.master_product),
+    )
@@ -14,4 +14,5 @@ from . import master_product_routes
 from . import product_routes
 from . import order_routes
 from . import stats_routes
-from . import auth_routes
\ No newline at end of file
+from . import auth_routes
+from . import diagnostics_routes
\ No newline at end of file
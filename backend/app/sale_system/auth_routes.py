@@ -1,7 +1,20 @@
+import hmac
+from functools import wraps
 from flask import request, jsonify, current_app
 from . import sale_bp
 from ..models import Event
 
+
+def admin_required(view):
+    """【新增】只允许管理员调用的接口：请求头 X-Admin-Password 需要与管理员密码一致"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        password = request.headers.get('X-Admin-Password', '')
+        if not hmac.compare_digest(password.encode(), current_app.config['ADMIN_PASSWORD'].encode()):
+            return jsonify(error="Admin password required"), 401
+        return view(*args, **kwargs)
+    return wrapper
+
 @sale_bp.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -0,0 +1,232 @@
+import csv
+import io
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from .. import db
+from ..models import Event, Order, OrderItem, Product, MasterProduct
+from .stats import build_sales_summary
+from .excel_export import get_sales_summary_workbook
+
+# --- 多展会批量导出 (ZIP) ---
+# 一个压缩包里包含：每个展会一份出摊记录 Excel、一份跨展会汇总表、订单和订单明细的原始 CSV。
+# 各展会的 Excel 在线程池中并行生成 (复用单展会下载的磁盘缓存)，哪个先完成就先写进压缩包；
+# 压缩包边生成边发送，内存中只保留当前正在写的一小块数据，展会再多内存占用也不会增长。
+
+COPY_CHUNK_SIZE = 64 * 1024
+CSV_BATCH_SIZE = 500
+
+COMBINED_COLUMNS = [
+    ('event_name', '展会'),
+    ('event_date', '日期'),
+    ('product_code', '制品编号'),
+    ('product_name', '制品名'),
+    ('unit_price', '单价'),
+    ('total_quantity', '销量'),
+    ('total_revenue_per_item', '销售额'),
+]
+ORDER_CSV_HEADER = ['订单号', '展会ID', '展会', '下单时间', '状态', '订单金额']
+ORDER_ITEM_CSV_HEADER = ['订单号', '展会ID', '制品编号', '制品名', '数量', '单价', '小计']
+
+
+class _StreamBuffer:
+    """ZipFile 的输出目标：只收集写入的字节，由生成器定期取走发送"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def select_events(status=None, date_from=None, date_to=None):
+    """按状态和日期范围 (包含两端) 筛选展会，按日期排序"""
+    query = Event.query
+    if status:
+        query = query.filter(Event.status == status)
+    if date_from:
+        query = query.filter(Event.date >= date_from)
+    if date_to:
+        query = query.filter(Event.date <= date_to)
+    return query.order_by(Event.date, Event.id).all()
+
+
+def _safe_name(name):
+    # 压缩包内的文件名不能含有路径分隔符等特殊字符
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name).strip('_') or 'event'
+
+
+def _workbook_arcname(event_info):
+    return f"{event_info['date']}_{_safe_name(event_info['name'])}_{event_info['id']}.xlsx"
+
+
+def _build_event_workbook(app, event_id):
+    """
+    线程池任务：在独立的应用上下文中查询销售总结并生成 (或命中缓存) 该展会的 Excel。
+    返回已打开的文件，之后即使缓存文件因数据版本更新被删除也能继续读取。
+    展会在导出过程中被删除时返回 None，压缩包里跳过它。
+    """
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        if event is None:
+            return None
+        sales_data = build_sales_summary(event)
+        path = get_sales_summary_workbook(event, sales_data)
+        return event.to_dict(), sales_data, open(path, 'rb')
+
+
+def _copy_file(zf, arcname, src, compress_type=zipfile.ZIP_STORED):
+    """把已打开的文件分块写入压缩包，每块之后让出一次，调用方据此发送缓冲区"""
+    with src, _open_entry(zf, arcname, compress_type) as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            dst.write(chunk)
+            yield
+
+
+def _zip_time():
+    return datetime.now().timetuple()[:6]
+
+
+def _open_entry(zf, arcname, compress_type):
+    info = zipfile.ZipInfo(arcname, date_time=_zip_time())
+    info.compress_type = compress_type
+    return zf.open(info, 'w')
+
+
+def _write_combined_workbook(results, output):
+    """跨展会汇总表：每个展会的有销量商品一行，每个展会后面跟一行小计"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('全部展会汇总')
+    bold = Font(bold=True)
+
+    def bold_cell(value):
+        c = WriteOnlyCell(ws, value=value)
+        c.font = bold
+        return c
+
+    ws.append([bold_cell(header) for _, header in COMBINED_COLUMNS])
+    grand_total = 0
+    for event_info, sales_data in results:
+        for item in sales_data['summary']:
+            row = dict(item, event_name=event_info['name'], event_date=event_info['date'])
+            ws.append([row.get(key) for key, _ in COMBINED_COLUMNS])
+        ws.append([event_info['name'], event_info['date'], None, bold_cell('小计'), None, None,
+                   bold_cell(sales_data['total_revenue'])])
+        grand_total += sales_data['total_revenue']
+    ws.append([bold_cell('合计'), None, None, None, None, None, bold_cell(round(grand_total, 2))])
+    wb.save(output)
+
+
+def _write_csv(zf, arcname, header, rows):
+    """把查询结果逐批写成 CSV (带 BOM，Excel 可以直接打开)，每批之后让出一次"""
+    with _open_entry(zf, arcname, zipfile.ZIP_DEFLATED) as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text)
+        writer.writerow(header)
+        for index, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if index % CSV_BATCH_SIZE == 0:
+                text.flush()
+                yield
+        text.flush()
+        text.detach()
+    yield
+
+
+def _order_rows(event_ids):
+    query = db.session.query(
+        Order.id, Order.event_id, Event.name, Order.timestamp, Order.status, Order.total_amount
+    ).join(Event, Order.event_id == Event.id)\
+     .filter(Order.event_id.in_(event_ids))\
+     .order_by(Order.event_id, Order.id)
+    for order_id, event_id, event_name, timestamp, status, total_amount in query.yield_per(CSV_BATCH_SIZE):
+        yield [order_id, event_id, event_name, timestamp.isoformat(sep=' ', timespec='seconds'), status, total_amount]
+
+
+def _order_item_rows(event_ids):
+    query = db.session.query(
+        OrderItem.order_id, Order.event_id, MasterProduct.product_code, MasterProduct.name,
+        OrderItem.quantity, Product.price
+    ).join(Order, OrderItem.order_id == Order.id)\
+     .join(Product, OrderItem.product_id == Product.id)\
+     .join(MasterProduct, Product.master_product_id == MasterProduct.id)\
+     .filter(Order.event_id.in_(event_ids))\
+     .order_by(Order.event_id, OrderItem.order_id, OrderItem.id)
+    for order_id, event_id, code, name, quantity, price in query.yield_per(CSV_BATCH_SIZE):
+        yield [order_id, event_id, code, name, quantity, price, round(quantity * price, 2)]
+
+
+def _generate_entries(app, zf, event_ids):
+    """依次写入压缩包的各个文件，每写完一块让出一次"""
+    workers = max(1, min(app.config.get('BULK_EXPORT_WORKERS', 4), len(event_ids)))
+    finished = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 同时最多提交 workers 个任务：每个任务完成后都持有一个打开的文件，
+        # 一次全部提交的话，展会很多时文件句柄会一直堆积到压缩包写到它们为止
+        queued = iter(event_ids)
+        running = set()
+        try:
+            while True:
+                for event_id in queued:
+                    running.add(pool.submit(_build_event_workbook, app, event_id))
+                    if len(running) >= workers:
+                        break
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.discard(future)
+                    result = future.result()
+                    if result is None:
+                        continue
+                    event_info, sales_data, workbook = result
+                    finished[event_info['id']] = (event_info, sales_data)
+                    yield from _copy_file(zf, _workbook_arcname(event_info), workbook)
+        finally:
+            # 客户端中途断开 (生成器被关闭) 或出错时，关闭已经生成好但还没写入的文件
+            for future in running:
+                if not future.cancel() and future.exception() is None and future.result() is not None:
+                    future.result()[2].close()
+
+    # 汇总表按展会日期排序，数据量很小，先写到临时文件再复制进压缩包
+    with tempfile.TemporaryFile() as combined:
+        _write_combined_workbook([finished[event_id] for event_id in event_ids if event_id in finished], combined)
+        combined.seek(0)
+        yield from _copy_file(zf, '全部展会汇总.xlsx', combined)
+
+    yield from _write_csv(zf, 'orders.csv', ORDER_CSV_HEADER, _order_rows(event_ids))
+    yield from _write_csv(zf, 'order_items.csv', ORDER_ITEM_CSV_HEADER, _order_item_rows(event_ids))
+
+
+def generate_bulk_export(app, event_ids):
+    """
+    逐块生成批量导出的 ZIP 字节流。
+    在自己的应用上下文中运行 (响应开始发送后请求上下文已经结束)，线程池任务各自再开上下文。
+    """
+    buffer = _StreamBuffer()
+    with app.app_context():
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for _ in _generate_entries(app, zf, event_ids):
+                data = buffer.drain()
+                if data:
+                    yield data
+        # 关闭 ZipFile 时写入中央目录
+        yield buffer.drain()
@@ -0,0 +1,335 @@
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
+from .. import db
+from ..models import MasterProduct, Product, Event
+from ..sqlite_profile import immediate_transactions
+from ..static_files import path_for_static_url
+from .image_pipeline import render_variant_files, variant_urls, image_file_urls, product_image_dir, remove_quietly
+
+# --- 主商品目录批量导入 ---
+# 从 CSV / XLSX 逐行读取商品目录 (可附带一个图片 ZIP)，按 product_code 新增或更新 MasterProduct。
+# 文件按 IMPORT_BATCH_SIZE 行一批处理，内存占用只与批大小有关，与文件大小无关：
+#   1. 校验本批的每一行，查出本批已存在的商品
+#   2. 从 ZIP 中逐个解出本批的图片，交给进程池并行生成各尺寸 WebP
+#      (图片文件名带内容摘要，与当前图片相同的不会重复处理)
+#   3. 在一个 BEGIN IMMEDIATE 事务里写入本批的新增/修改，让相关展会的缓存失效一次，然后提交
+# 每一行的结果 (created / updated / unchanged / failed) 通过 on_row 回调报告，最后返回各结果的数量。
+#
+# 表头 (第一行) 支持以下列名，未知的列会被忽略；category / image / is_active 列不存在时不会修改对应字段：
+#   product_code (编号)  name (名称)  default_price (价格)  category (分类)
+#   image (图片，ZIP 中的文件名，留空时查找 <编号>.png/.jpg/... )  is_active (上架，1/0、true/false、是/否)
+
+COLUMN_ALIASES = {
+    'product_code': ('product_code', 'code', '编号', '商品编号'),
+    'name': ('name', '名称', '商品名称'),
+    'default_price': ('default_price', 'price', '价格', '默认价格'),
+    'category': ('category', '分类'),
+    'image': ('image', '图片'),
+    'is_active': ('is_active', '上架'),
+}
+REQUIRED_COLUMNS = ('product_code', 'name', 'default_price')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', '是', '上架'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', '否', '下架'}
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+
+
+class CatalogImportError(ValueError):
+    """文件格式不支持或表头缺少必需的列"""
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    # Excel 把纯数字的编号存成浮点数 (101 -> 101.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()  # 不关闭调用方的文件
+
+
+def _iter_xlsx(stream):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_catalog_rows(stream, filename):
+    """逐行读取目录文件，产出 (行号, {字段: 文本})，只包含表头中出现的字段"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        rows = _iter_csv(stream)
+    elif extension == 'xlsx':
+        rows = _iter_xlsx(stream)
+    else:
+        raise CatalogImportError("Only .csv and .xlsx files are supported.")
+
+    columns = None
+    for line, row in enumerate(rows, start=1):
+        cells = [_cell_text(value) for value in row]
+        if not any(cells):
+            continue
+        if columns is None:
+            aliases = {alias: field for field, names in COLUMN_ALIASES.items() for alias in names}
+            columns = {index: aliases[cell.lower()] for index, cell in enumerate(cells) if cell.lower() in aliases}
+            missing = [field for field in REQUIRED_COLUMNS if field not in columns.values()]
+            if missing:
+                raise CatalogImportError(f"Missing required columns: {', '.join(missing)}")
+            continue
+        yield line, {field: cells[index] if index < len(cells) else '' for index, field in columns.items()}
+
+
+def _parse_row(fields):
+    """把一行文本转换为 MasterProduct 的字段值；数据有误时抛出 ValueError"""
+    if not fields['product_code'] or not fields['name']:
+        raise ValueError('product_code and name must not be empty')
+    values = {
+        'product_code': fields['product_code'],
+        'name': fields['name'],
+        'default_price': float(fields['default_price']),
+    }
+    if 'category' in fields:
+        values['category'] = fields['category'] or None
+    if 'is_active' in fields:
+        flag = fields['is_active'].lower()
+        if flag not in TRUE_VALUES | FALSE_VALUES:
+            raise ValueError(f"invalid is_active value '{fields['is_active']}'")
+        values['is_active'] = flag in TRUE_VALUES
+    return values
+
+
+class _ImageArchive:
+    """图片 ZIP：按文件名 (不区分大小写、忽略目录) 查找，逐个解压到商品图片目录"""
+
+    def __init__(self, stream):
+        try:
+            self.archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            raise CatalogImportError("The image archive is not a valid ZIP file.")
+        self.entries = {
+            os.path.basename(info.filename).lower(): info
+            for info in self.archive.infolist() if not info.is_dir()
+        }
+
+    def find(self, name, product_code):
+        if name:
+            return self.entries.get(os.path.basename(name).lower())
+        for extension in IMAGE_EXTENSIONS:
+            info = self.entries.get(f'{product_code}.{extension}'.lower())
+            if info:
+                return info
+        return None
+
+    def extract(self, info, save_dir):
+        """边解压边计算摘要，返回 (临时文件路径, sha256)"""
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(save_dir, f'.import-{uuid.uuid4().hex}.part')
+        with self.archive.open(info) as source, open(tmp_path, 'wb') as target:
+            while chunk := source.read(64 * 1024):
+                digest.update(chunk)
+                target.write(chunk)
+        return tmp_path, digest.hexdigest()
+
+
+def _image_stem(product_code, digest):
+    # 文件名包含编号和内容摘要：同一商品再次导入相同图片时可以识别出来跳过
+    return f"import_{secure_filename(product_code) or 'product'}_{digest[:12]}"
+
+
+def _prepare_images(batch, archive, existing_images, pool):
+    """
+    为本批有图片的行解压图片并提交到进程池。
+    返回 ({product_code: (源文件路径, future)}, {product_code: 错误信息})。
+    """
+    save_dir = product_image_dir()
+    os.makedirs(save_dir, exist_ok=True)
+    jobs, errors = {}, {}
+    for _, values, image_name in batch:
+        code = values['product_code']
+        info = archive.find(image_name, code)
+        if info is None:
+            if image_name:
+                errors[code] = f"image '{image_name}' not found in archive"
+            continue
+        tmp_path, digest = archive.extract(info, save_dir)
+        stem = _image_stem(code, digest)
+        current = existing_images.get(code)
+        if current and os.path.basename(path_for_static_url(current)) == f'{stem}.webp':
+            remove_quietly(tmp_path)  # 与当前图片相同
+            continue
+        extension = os.path.splitext(info.filename)[1].lower()
+        source_path = os.path.join(save_dir, f'{stem}_upload{extension}')
+        os.replace(tmp_path, source_path)
+        if pool is not None:
+            jobs[code] = (source_path, pool.submit(render_variant_files, source_path, stem))
+            continue
+        # IMPORT_IMAGE_WORKERS=0：在当前进程内处理 (调试用)
+        future = Future()
+        try:
+            future.set_result(render_variant_files(source_path, stem))
+        except Exception as e:
+            future.set_exception(e)
+        jobs[code] = (source_path, future)
+    return jobs, errors
+
+
+def _collect_images(jobs):
+    """等待进程池完成，返回 ({product_code: image_variants}, {product_code: 错误信息})"""
+    images, errors = {}, {}
+    for code, (source_path, job) in jobs.items():
+        try:
+            files = job.result()
+        except Exception as e:
+            errors[code] = f'invalid image ({e.__class__.__name__})'
+            remove_quietly(source_path)
+            continue
+        if files['original'] != source_path:
+            remove_quietly(source_path)
+        images[code] = variant_urls(files)
+    return images, errors
+
+
+def _remove_variants(variants):
+    for url in variants.values():
+        if url.startswith('/static/'):
+            remove_quietly(path_for_static_url(url))
+
+
+def _write_batch(batch, images):
+    """在一个 BEGIN IMMEDIATE 事务里写入本批数据，返回 ([(行号, 编号, 结果, 变化的字段)], 被替换的旧图片 URL)"""
+    codes = [values['product_code'] for _, values, _ in batch]
+    results, replaced_files, updated_ids = [], [], []
+    with immediate_transactions():
+        existing = {mp.product_code: mp for mp in MasterProduct.query.filter(MasterProduct.product_code.in_(codes))}
+        for line, values, _ in batch:
+            code = values['product_code']
+            variants = images.get(code)
+            mp = existing.get(code)
+            if mp is None:
+                mp = MasterProduct(**values)
+                if variants:
+                    mp.image_url, mp.image_variants = variants['original'], variants
+                db.session.add(mp)
+                results.append((line, code, 'created', sorted(values) + (['image'] if variants else [])))
+                continue
+            changes = [field for field, value in values.items() if getattr(mp, field) != value]
+            for field in changes:
+                setattr(mp, field, values[field])
+            if variants:
+                replaced_files += image_file_urls(mp)
+                mp.image_url, mp.image_variants = variants['original'], variants
+                changes.append('image')
+            if changes:
+                updated_ids.append(mp.id)
+            results.append((line, code, 'updated' if changes else 'unchanged', changes))
+
+        if updated_ids:
+            event_ids = [event_id for (event_id,) in
+                         db.session.query(Product.event_id).filter(Product.master_product_id.in_(updated_ids)).distinct()]
+            Event.bump_data_version(*event_ids, lineup=True)
+        db.session.commit()
+    return results, replaced_files
+
+
+def _image_pool():
+    workers = current_app.config.get('IMPORT_IMAGE_WORKERS', os.cpu_count() or 1)
+    if workers <= 0:
+        return None
+    # gunicorn 的 gthread worker 是多线程进程，用 spawn 启动子进程，避免 fork 继承锁的状态
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def import_catalog(stream, filename, images_stream=None, on_row=None):
+    """
+    导入主商品目录 (需要在应用上下文中调用)。每处理完一行调用一次
+    on_row({'line', 'product_code', 'result', 'changes' 或 'error'})，返回各结果的数量。
+    """
+    batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 500)
+    archive = _ImageArchive(images_stream) if images_stream is not None else None
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    seen_codes = set()  # 只保存编号，用于发现文件内重复的行
+    pool = _image_pool() if archive is not None else None
+
+    def report(line, code, result, **detail):
+        summary[result] += 1
+        if on_row:
+            on_row({'line': line, 'product_code': code, 'result': result, **detail})
+
+    def process_batch(batch):
+        if not batch:
+            return
+        image_errors = {}
+        images = {}
+        if archive is not None:
+            existing_images = dict(
+                db.session.query(MasterProduct.product_code, MasterProduct.image_url)
+                .filter(MasterProduct.product_code.in_([values['product_code'] for _, values, _ in batch]))
+            )
+            db.session.rollback()  # 结束只读事务，处理图片期间不占用数据库
+            jobs, image_errors = _prepare_images(batch, archive, existing_images, pool)
+            images, render_errors = _collect_images(jobs)
+            image_errors.update(render_errors)
+        for line, values, _ in batch:
+            if values['product_code'] in image_errors:
+                report(line, values['product_code'], 'failed', error=image_errors[values['product_code']])
+        batch = [entry for entry in batch if entry[1]['product_code'] not in image_errors]
+        if not batch:
+            return
+        try:
+            results, replaced_files = _write_batch(batch, images)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.exception("Catalog import batch failed")
+            for variants in images.values():
+                _remove_variants(variants)
+            for line, values, _ in batch:
+                report(line, values['product_code'], 'failed', error=f'database error: {e.__class__.__name__}')
+            return
+        for line, code, result, changes in results:
+            report(line, code, result, changes=changes)
+        new_files = {url for variants in images.values() for url in variants.values()}
+        for url in replaced_files:
+            if url not in new_files:
+                remove_quietly(path_for_static_url(url))
+
+    try:
+        batch = []
+        for line, fields in iter_catalog_rows(stream, filename):
+            code = fields.get('product_code', '')
+            try:
+                values = _parse_row(fields)
+            except (ValueError, TypeError) as e:
+                report(line, code or None, 'failed', error=str(e))
+                continue
+            if code in seen_codes:
+                report(line, code, 'failed', error='duplicate product_code in file')
+                continue
+            seen_codes.add(code)
+            batch.append((line, values, fields.get('image', '')))
+            if len(batch) >= batch_size:
+                process_batch(batch)
+                batch = []
+        process_batch(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return summary
@@ -0,0 +1,42 @@
+from flask import request, jsonify, send_file, abort
+from . import sale_bp
+from .auth_routes import admin_required
+from .. import diagnostics
+
+# --- 线上诊断 (慢查询日志、采样分析结果)，只允许管理员访问 ---
+
+@sale_bp.route('/api/admin/diagnostics', methods=['GET'])
+@admin_required
+def get_diagnostics_status():
+    """当前进程的诊断开关状态"""
+    return jsonify(
+        slow_query_log=diagnostics.slow_query_seconds is not None,
+        slow_query_ms=diagnostics.slow_query_seconds * 1000 if diagnostics.slow_query_seconds is not None else None,
+        profiler=diagnostics.sample_rate > 0,
+        profiler_sample_rate=diagnostics.sample_rate,
+    )
+
+
+@sale_bp.route('/api/admin/diagnostics/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """最近的慢查询 (新的在前)，?limit= 默认 100，最多 1000"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify(diagnostics.recent_slow_queries(limit))
+
+
+@sale_bp.route('/api/admin/diagnostics/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    """采样分析文件列表 (新的在前)"""
+    return jsonify(diagnostics.list_profiles())
+
+
+@sale_bp.route('/api/admin/diagnostics/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """下载一个 collapsed stack 文件 (可以用 speedscope 或 flamegraph.pl 打开)"""
+    path = diagnostics.profile_path(name)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
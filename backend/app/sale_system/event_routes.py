@@ -3,6 +3,9 @@ from datetime import datetime
 from . import sale_bp
 from .. import db
 from ..models import Event
+from .read_models import EventDTO, event_query
+from ..sqlite_profile import write_transaction
+from ..static_files import path_for_static_url, versioned_url
 import uuid
 from werkzeug.utils import secure_filename
 import os
@@ -16,9 +19,8 @@ def delete_file(file_url):
     if not file_url:
         return
     try:
-        # 将 URL (/static/uploads/...) 转换为文件系统路径 (app/static/uploads/...)
-        # lstrip('/') 防止 os.path.join 行为异常
-        file_path = os.path.join(current_app.static_folder, file_url.lstrip('/'))
+        # 将 URL (/static/uploads/...?v=摘要) 转换为文件系统路径 (STATIC_FOLDER/uploads/...)
+        file_path = path_for_static_url(file_url)
         if os.path.exists(file_path):
             os.remove(file_path)
     except Exception as e:
@@ -26,18 +28,32 @@ def delete_file(file_url):
         print(f"Error deleting file {file_url}: {e}")
 
 
+def parse_pending_order_ttl(value):
+    """表单中的待处理订单保留时长 (分钟)：空值表示使用默认值 (None)，0 表示不自动取消"""
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        minutes = int(value)
+    except ValueError:
+        raise ValueError("pending_order_ttl_minutes must be a whole number of minutes.")
+    if minutes < 0:
+        raise ValueError("pending_order_ttl_minutes cannot be negative.")
+    return minutes
+
+
 # --- 展会管理 API ---
 
 @sale_bp.route('/api/events', methods=['GET'])
 def get_events():
     status_filter = request.args.get('status')
-    query = Event.query
+    # 【修改】只查询需要的列，不加载 ORM 对象 (见 read_models.py)
+    query = event_query()
 
     if status_filter in VALID_STATUSES:
         query = query.filter(Event.status == status_filter)
 
-    events = query.order_by(Event.date.desc()).all()
-    return jsonify([event.to_dict() for event in events]), 200
+    rows = query.order_by(Event.date.desc()).all()
+    return jsonify([EventDTO(row) for row in rows]), 200
 
 @sale_bp.route('/api/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
@@ -51,6 +67,16 @@ def create_event():
     if not data or 'name' not in data or 'date' not in data:
         return jsonify(error="Missing required fields: name and date"), 400
 
+    # 【修改】先校验所有字段，最后才保存上传的文件，校验失败时不会留下没有展会引用的文件
+    try:
+        pending_order_ttl = parse_pending_order_ttl(data.get('pending_order_ttl_minutes'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try:
+        event_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify(error="Invalid date format, expected YYYY-MM-DD."), 400
+
     qr_code_url = None
 
     if 'payment_qr_code' in request.files:
@@ -60,14 +86,15 @@ def create_event():
             unique_filename = f"{uuid.uuid4().hex}_{filename}"
             save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
             file.save(save_path)
-            qr_code_url = f"/static/uploads/{unique_filename}"
+            qr_code_url = versioned_url(f"/static/uploads/{unique_filename}")
 
     try:
         new_event = Event(
             name=data['name'],
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
+            date=event_date,
             location=data.get('location', ''),
             vendor_password=data.get('vendor_password'),
+            pending_order_ttl_minutes=pending_order_ttl,
             # 【修正】确保这里的字段名与你的 Event 模型中的定义一致
             qrcode_url=qr_code_url 
         )
@@ -82,6 +109,7 @@ def create_event():
         return jsonify(error=str(e)), 500
 
 @sale_bp.route('/api/events/<int:event_id>/status', methods=['PUT'])
+@write_transaction
 def update_event_status(event_id):
     data = request.get_json()
     new_status = data.get('status')
@@ -91,6 +119,7 @@ def update_event_status(event_id):
 
     event = Event.query.get_or_404(event_id)
     event.status = new_status
+    event.data_version = Event.data_version + 1
     db.session.commit()
     
     return jsonify(event.to_dict()), 200
@@ -102,6 +131,11 @@ def update_event(event_id):
     event = Event.query.get_or_404(event_id)
     # 【修改】从 request.form 获取文本数据
     data = request.form
+    # 【新增】待处理订单的保留时长，空字符串表示恢复默认值
+    try:
+        pending_order_ttl = parse_pending_order_ttl(data.get('pending_order_ttl_minutes'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
     
     try:
         # 1. 更新文本字段
@@ -112,11 +146,13 @@ def update_event(event_id):
         # 允许密码字段更新为空字符串
         if 'vendor_password' in data:
             event.vendor_password = data['vendor_password']
+        if 'pending_order_ttl_minutes' in data:
+            event.pending_order_ttl_minutes = pending_order_ttl
 
         # 2. 处理图片移除逻辑
         if data.get('remove_payment_qr_code') == 'true':
             # 删除旧文件并将数据库字段设为 null
-            delete_file(event.payment_qr_code_url)
+            delete_file(event.qrcode_url) # 【修正】字段名是 qrcode_url
             event.qrcode_url = None
 
         # 3. 处理新图片上传逻辑
@@ -133,8 +169,10 @@ def update_event(event_id):
                 file.save(save_path)
                 
                 # 更新数据库中的 URL
-                event.qrcode_url = f"/static/uploads/{unique_filename}"
+                event.qrcode_url = versioned_url(f"/static/uploads/{unique_filename}")
 
+        # 展会信息也包含在统计数据中，修改后让缓存失效
+        event.data_version = Event.data_version + 1
         db.session.commit()
         return jsonify(event.to_dict()), 200
     except Exception as e:
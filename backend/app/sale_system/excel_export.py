@@ -0,0 +1,193 @@
+import glob
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from flask import current_app
+from .stats import build_sales_summary
+
+# --- 销售总结 Excel 导出 ---
+# 使用 openpyxl 的 write-only 模式逐行写出 "境界景观学会出摊标准记录"，
+# 样式全部注册为命名样式 (NamedStyle)，每个单元格只引用样式名，不再逐格复制样式对象。
+# 生成的文件按 (展会, 数据版本, 月份) 缓存在磁盘上，数据没有变化时重复下载直接返回已有文件。
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+COLUMNS = [
+    ('product_code', '制品编号'),
+    ('product_name', '制品名'),
+    ('initial_stock', '初始数量'),
+    ('ending_stock', '结束数量'), # 留空，出摊结束后手工填写
+    ('unit_price', '单价'),
+    ('total_quantity', '销量'),
+    ('total_revenue_per_item', '销售额'),
+]
+MONEY_COLUMNS = {'unit_price', 'total_revenue_per_item'}
+MONEY_FORMAT = '¥#,##0.00'
+COLUMN_WIDTH = 16
+ROW_HEIGHT = 30
+
+
+def _register_styles(wb):
+    """注册报表用到的全部命名样式"""
+    from openpyxl.styles import NamedStyle, Font, Alignment, PatternFill, Border, Side
+    from openpyxl.styles.fonts import DEFAULT_FONT
+
+    thin_side = Side(style='thin', color='000000')
+    thin_border = Border(left=thin_side, right=thin_side, top=thin_side, bottom=thin_side)
+    center = Alignment(horizontal='center', vertical='center')
+    body_font = Font(name='微软雅黑', size=10)
+    light_blue_fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
+
+    styles = [
+        NamedStyle('report_title', font=Font(name='微软雅黑', size=16, bold=True), alignment=center),
+        NamedStyle('report_plain', font=body_font),
+        NamedStyle('report_header', font=Font(name='微软雅黑', size=11, bold=True), alignment=center, border=thin_border),
+        NamedStyle('report_label', font=body_font, border=thin_border,
+                   alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)),
+        NamedStyle('report_box', font=DEFAULT_FONT, border=thin_border),
+        NamedStyle('report_total', font=Font(name='微软雅黑', size=12, bold=True), border=thin_border,
+                   number_format=MONEY_FORMAT),
+    ]
+    # 数据行：普通/金额 × 白底/浅蓝底 (偶数行)
+    for money in (False, True):
+        for striped in (False, True):
+            style = NamedStyle(
+                _body_style_name(money, striped), font=body_font, alignment=center, border=thin_border
+            )
+            if money:
+                style.number_format = MONEY_FORMAT
+            if striped:
+                style.fill = light_blue_fill
+            styles.append(style)
+    for style in styles:
+        wb.add_named_style(style)
+
+
+def _body_style_name(money, striped):
+    return f"report_body{'_money' if money else ''}{'_striped' if striped else ''}"
+
+
+def write_sales_summary_workbook(sales_data, output, now=None):
+    """把销售总结写成 xlsx 到 output (文件路径或二进制文件对象)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    now = now or datetime.now()
+    wb = Workbook(write_only=True)
+    _register_styles(wb)
+    ws = wb.create_sheet('出摊记录')
+
+    def cell(value=None, style=None):
+        c = WriteOnlyCell(ws, value=value)
+        if style:
+            c.style = style
+        return c
+
+    row_number = 0
+
+    def append(cells, height=None):
+        # write-only 模式下行高必须在写出该行之前设置
+        nonlocal row_number
+        row_number += 1
+        if height:
+            ws.row_dimensions[row_number].height = height
+        ws.append(cells)
+
+    # 列宽需要在写出第一行之前设置
+    for index in range(1, len(COLUMNS) + 1):
+        ws.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTH
+
+    # --- 标题 ---
+    ws.merged_cells.add('A1:F1')
+    title = f"境界景观学会出摊标准记录 {now.strftime('%Y年%m月')}版"
+    append([cell(title, 'report_title'), None, None, None, None, None, cell("摊位号", 'report_plain')], height=60)
+
+    # --- 表头 ---
+    append([cell(header, 'report_header') for _, header in COLUMNS], height=ROW_HEIGHT)
+
+    # --- 数据行 (偶数行浅蓝底) ---
+    for item in sales_data['summary']:
+        striped = (row_number + 1) % 2 == 0
+        append([
+            cell(item.get(key), _body_style_name(key in MONEY_COLUMNS, striped))
+            for key, _ in COLUMNS
+        ], height=ROW_HEIGHT)
+
+    # --- 底部信息区域 (与数据区之间空一行) ---
+    append([])
+    bottom = row_number + 1
+
+    def box_row(cells, height=None):
+        # 底部区域 A:G 每个单元格都有边框，未指定内容的单元格留空
+        append([cells.get(col) or cell(None, 'report_box') for col in 'ABCDEFG'], height=height)
+
+    box_row({'A': cell("出席人\n与其联系方式", 'report_label'), 'C': cell("日期", 'report_label')})
+    box_row({
+        'A': cell("活动名", 'report_label'),
+        'B': cell(sales_data['event_name'], 'report_box'),
+        'E': cell("总销售额", 'report_label'),
+        'F': cell(sales_data['total_revenue'], 'report_total'),
+    }, height=ROW_HEIGHT)
+    box_row({'A': cell("特殊情况\n备注", 'report_label')}, height=ROW_HEIGHT)
+    box_row({'A': cell("快递信息", 'report_label')}, height=ROW_HEIGHT)
+    ws.merged_cells.add(f'B{bottom + 1}:D{bottom + 1}')
+    ws.merged_cells.add(f'B{bottom + 2}:G{bottom + 2}')
+    ws.merged_cells.add(f'B{bottom + 3}:G{bottom + 3}')
+
+    wb.save(output)
+
+
+def _cache_folder():
+    folder = current_app.config['EXPORT_CACHE_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _cache_prefix(event):
+    # 文件名带上数据库标识，避免不同数据库 (例如压测用的临时库) 中同 id 的展会互相覆盖
+    db_key = hashlib.sha1(current_app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:8]
+    return f"sales_summary_{db_key}_{event.id}_"
+
+
+def get_sales_summary_workbook(event, sales_data=None):
+    """
+    返回该展会当前数据版本的 Excel 文件路径，缓存中没有时生成。
+    标题中含有月份，所以缓存键也包含月份。生成新文件时保留上一个版本 (其他请求可能刚拿到它的路径、
+    正要用 send_file 发送)，更早的版本删除。
+    已经查询过销售总结的调用方 (例如批量导出) 可以通过 sales_data 传入，避免重复查询。
+    """
+    now = datetime.now()
+    prefix = _cache_prefix(event)
+    folder = _cache_folder()
+    path = os.path.join(folder, f"{prefix}v{event.data_version}_{now.strftime('%Y%m')}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    # 先写到临时文件再原子替换，多个 worker 同时生成也不会读到写了一半的文件
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx.tmp', dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_sales_summary_workbook(sales_data or build_sales_summary(event), f, now=now)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    old_paths = [p for p in glob.glob(os.path.join(folder, glob.escape(prefix) + 'v*.xlsx')) if p != path]
+    old_paths.sort(key=_mtime, reverse=True)
+    for old_path in old_paths[1:]:
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+    return path
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:  # 已被其他 worker 删除
+        return 0
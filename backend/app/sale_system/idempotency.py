@@ -0,0 +1,86 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from flask import request, current_app
+from .. import db
+from ..models import IdempotencyRecord
+
+# --- 下单接口的幂等键 (Idempotency-Key) ---
+# 场馆网络拥堵时顾客端会在超时后重试 POST .../orders，没有幂等键时每次重试都会新建一个待处理订单、
+# 再预留一次库存。客户端为每次 "提交" 生成一个随机 key 放在 Idempotency-Key 请求头中，重试时不变：
+#   1. 先在普通 (只读) 事务里按主键查找，命中就原样返回保存的响应 (带 Idempotent-Replayed: true)，
+#      不拿写锁，也不做库存检查
+#   2. 未命中时进入写事务，拿到写锁后再查一次 (两个重试同时到达时，后一个在这里命中)
+#   3. 下单成功后在同一个事务里保存响应，订单与记录要么都写入、要么都不写入
+# 只保存成功的响应；库存不足等错误不保存，重试时重新检查。
+# 同一个 key 带着不同的请求体时返回 422。记录保存 IDEMPOTENCY_KEY_TTL 秒，过期的由下单接口
+# 至多每 IDEMPOTENCY_PURGE_INTERVAL 秒顺带清理一次 (已经持有写锁，按 created_at 索引删除，开销很小)。
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 128
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+_last_purge = 0.0
+
+
+class IdempotencyError(ValueError):
+    pass
+
+
+class IdempotencyConflict(IdempotencyError):
+    pass
+
+
+def key_from_request():
+    """请求头中的幂等键，没有时返回 None；格式不对时抛出 IdempotencyError"""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+        raise IdempotencyError(f'{HEADER} must be 1-{MAX_KEY_LENGTH} printable characters')
+    return key
+
+
+def request_fingerprint(data):
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def _cutoff():
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400))
+
+
+def find_response(event_id, key, fingerprint):
+    """
+    未过期的已保存响应，没有时返回 None；同一个 key 对应的请求体不同时抛出 IdempotencyConflict。
+    """
+    record = db.session.get(IdempotencyRecord, (event_id, key))
+    if record is None or record.created_at < _cutoff():
+        return None
+    if record.request_hash != fingerprint:
+        raise IdempotencyConflict(f'{HEADER} was already used for a different request')
+    response = current_app.response_class(record.body, status=record.status_code, mimetype='application/json')
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def store_response(event_id, key, fingerprint, response):
+    """在当前 (写) 事务中保存响应，随订单一起提交；同一个 key 的过期记录直接覆盖"""
+    db.session.merge(IdempotencyRecord(
+        event_id=event_id, key=key, request_hash=fingerprint,
+        status_code=response.status_code, body=response.get_data(as_text=True),
+        created_at=datetime.utcnow(),
+    ))
+
+
+def purge_expired(force=False):
+    """删除过期的记录；force=False 时每个进程至多每 IDEMPOTENCY_PURGE_INTERVAL 秒执行一次。返回删除的行数"""
+    global _last_purge
+    now = time.monotonic()
+    if not force and now - _last_purge < current_app.config.get('IDEMPOTENCY_PURGE_INTERVAL', 600):
+        return 0
+    _last_purge = now
+    return IdempotencyRecord.query.filter(IdempotencyRecord.created_at < _cutoff())\
+        .delete(synchronize_session=False)
@@ -0,0 +1,181 @@
+import base64
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from .. import db
+from ..models import MasterProduct, Product, Event
+from ..static_files import versioned_url, path_for_static_url
+
+# --- 商品图片后台处理 ---
+# 上传请求只检查文件头并把原始文件存到磁盘，image_url 先指向这份原始文件，请求立即返回。
+# 之后由后台线程池解码并生成多个尺寸的 WebP：
+#   original  原尺寸 (与之前上传时直接生成的文件相同)
+#   detail    最长边 800px，商品详情/大卡片
+#   thumb     最长边 320px，顾客端商品网格
+#   placeholder  16px 的极小预览，以 data URI 内嵌在 JSON 里，图片加载前作为模糊背景
+# 处理完成后 image_url 改为 original，各尺寸的地址写入 MasterProduct.image_variants，
+# 并让上架了该商品的展会的菜单缓存失效。所有文件地址都带内容摘要 (?v=)，可以被浏览器永久缓存。
+
+VARIANT_SIZES = {'detail': 800, 'thumb': 320}
+PLACEHOLDER_SIZE = 16
+WEBP_QUALITY = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def product_image_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'products')
+
+
+def _url_for_path(path):
+    relative_path = os.path.relpath(path, current_app.config['STATIC_FOLDER'])
+    return versioned_url(f"/static/{relative_path.replace(os.sep, '/')}")
+
+
+def save_product_upload(file_stream):
+    """
+    只读取文件头确认是图片，然后把上传的原始文件保存下来。
+    返回原始文件的 URL (作为处理完成前的 image_url)；不是有效图片时返回 None。
+    """
+    from PIL import Image
+    try:
+        with Image.open(file_stream) as img:
+            extension = (img.format or 'img').lower()
+        file_stream.seek(0)
+        save_dir = product_image_dir()
+        os.makedirs(save_dir, exist_ok=True)
+        save_path = os.path.join(save_dir, f"{int(time.time() * 1000)}_upload.{extension}")
+        with open(save_path, 'wb') as f:
+            while chunk := file_stream.read(64 * 1024):
+                f.write(chunk)
+        return _url_for_path(save_path)
+    except Exception as e:
+        current_app.logger.warning(f"Image upload rejected: {e}")
+        return None
+
+
+def image_file_urls(mp):
+    """主商品在磁盘上的所有图片文件 (原始上传/原图/各尺寸)，删除或替换图片时一并清理"""
+    urls = [mp.image_url] + [
+        url for url in (mp.image_variants or {}).values() if url and url.startswith('/static/')
+    ]
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def _save_webp(img, path):
+    # 先写临时文件再改名，前端不会读到写了一半的图片
+    tmp_path = path + '.tmp'
+    img.save(tmp_path, 'webp', quality=WEBP_QUALITY)
+    os.replace(tmp_path, path)
+
+
+def render_variant_files(source_path, stem):
+    """
+    解码源文件并生成全部尺寸，返回 {尺寸: 文件路径, 'placeholder': data URI}。
+    不依赖应用上下文，批量导入时在子进程中执行。
+    """
+    from PIL import Image
+
+    save_dir = os.path.dirname(source_path)
+    files = {}
+    with Image.open(source_path) as source:
+        img = source.convert('RGB')
+
+    original_path = os.path.join(save_dir, f"{stem}.webp")
+    if os.path.abspath(original_path) != os.path.abspath(source_path):
+        _save_webp(img, original_path)
+    files['original'] = original_path
+
+    for name, size in VARIANT_SIZES.items():
+        resized = img.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        path = os.path.join(save_dir, f"{stem}_{name}.webp")
+        _save_webp(resized, path)
+        files[name] = path
+
+    tiny = img.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'webp', quality=30)
+    files['placeholder'] = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    return files
+
+
+def variant_urls(files):
+    """把 render_variant_files 的结果转换为 image_variants 字典 (文件路径换成带摘要的 URL)"""
+    return {name: value if name == 'placeholder' else _url_for_path(value) for name, value in files.items()}
+
+
+def render_variants(source_path, stem):
+    """解码源文件并生成全部尺寸，返回 image_variants 字典"""
+    return variant_urls(render_variant_files(source_path, stem))
+
+
+def _stem_for(source_path):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return name[:-len('_upload')] if name.endswith('_upload') else name
+
+
+def process_product_image(mp_id, source_url):
+    """
+    生成主商品图片的各尺寸并写回数据库 (需要在应用上下文中调用)。
+    如果处理期间图片已被替换或移除 (image_url 不再是 source_url)，丢弃这次的结果。
+    """
+    source_path = path_for_static_url(source_url)
+    try:
+        variants = render_variants(source_path, _stem_for(source_path))
+    except Exception:
+        current_app.logger.exception(f"Image processing failed for master product {mp_id}")
+        return False
+
+    updated = MasterProduct.query.filter_by(id=mp_id, image_url=source_url)\
+        .update({'image_url': variants['original'], 'image_variants': variants}, synchronize_session=False)
+    if not updated:
+        db.session.rollback()
+        for url in variants.values():
+            if url.startswith('/static/') and path_for_static_url(url) != source_path:
+                remove_quietly(path_for_static_url(url))
+        return False
+
+    event_ids = [event_id for (event_id,) in
+                 db.session.query(Product.event_id).filter_by(master_product_id=mp_id)]
+    Event.bump_data_version(*event_ids, lineup=True)
+    db.session.commit()
+    if path_for_static_url(variants['original']) != source_path:
+        remove_quietly(source_path)
+    return True
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_in_background(app, mp_id, source_url):
+    with app.app_context():
+        process_product_image(mp_id, source_url)
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('IMAGE_WORKERS', 2), thread_name_prefix='image-pipeline'
+            )
+        return _executor
+
+
+def schedule_product_image(mp_id, source_url):
+    """提交后台处理任务；必须在保存了 image_url 的事务提交之后调用"""
+    app = current_app._get_current_object()
+    if app.config.get('IMAGE_PIPELINE_SYNC'):
+        process_product_image(mp_id, source_url)
+        return
+    _get_executor(app).submit(_run_in_background, app, mp_id, source_url)
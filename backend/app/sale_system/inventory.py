@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, case
+from .. import db
+from ..models import Order, OrderItem, OrderChange, Product, Event
+
+# --- 库存计数器维护 ---
+# Product.sold_quantity / Product.reserved_quantity 是订单明细的冗余汇总，
+# 必须与订单的创建和状态变更在同一个事务内更新，调用方负责 commit。
+
+# 每种订单状态会计入哪个计数器 (cancelled 不占用库存)
+STATUS_COUNTER_COLUMNS = {
+    'pending': 'reserved_quantity',
+    'completed': 'sold_quantity',
+}
+
+
+def _merge_quantities(items):
+    """把 (product_id, quantity) 列表按商品合并，同一商品出现多次时数量相加"""
+    merged = defaultdict(int)
+    for product_id, quantity in items:
+        merged[product_id] += quantity
+    return merged
+
+
+def apply_status_change(items, old_status, new_status):
+    """
+    订单从 old_status 变为 new_status 时，调整涉及商品的计数器。
+    old_status 为 None 表示新建订单。items 为 (product_id, quantity) 列表。
+    使用 SQL 层面的自增/自减 (col = col + n)，多个 worker 并发更新同一商品也不会丢失。
+    已售数量变化会改变 current_stock，同时把 stock_version 设为展会当前的 data_version，
+    所以调用前应先调用 Event.bump_data_version。
+    """
+    if old_status == new_status:
+        return
+    old_column = STATUS_COUNTER_COLUMNS.get(old_status)
+    new_column = STATUS_COUNTER_COLUMNS.get(new_status)
+    if old_column is None and new_column is None:
+        return
+    stock_changes = 'sold_quantity' in (old_column, new_column)
+
+    for product_id, quantity in _merge_quantities(items).items():
+        values = {}
+        if stock_changes:
+            values[Product.stock_version] = Product.event_data_version()
+        if old_column:
+            column = getattr(Product, old_column)
+            values[column] = column - quantity
+        if new_column:
+            column = getattr(Product, new_column)
+            values[column] = column + quantity
+        db.session.query(Product).filter(Product.id == product_id)\
+            .update(values, synchronize_session=False)
+
+
+def reserve_stock(event_id, quantities):
+    """
+    下单时一次性为订单的所有商品预留库存。quantities 为 {product_id: quantity}。
+    只发出一条带条件的 UPDATE：只有可用库存足够的商品行才会被加上预留数量，
+    SQLite 在执行 UPDATE 时持有写锁，因此并发的订单不可能同时通过检查而超卖。
+
+    全部预留成功时返回空字典，调用方继续写入订单并 commit；
+    否则回滚事务，返回库存不足商品的 {product_id: 当前可用库存} (一定非空)。
+    UPDATE 放在 SAVEPOINT 里：部分商品预留失败时只撤销这条 UPDATE，写锁仍然持有，
+    随后读到的可用库存就是 UPDATE 时的库存；如果先回滚整个事务再读，
+    期间其他请求取消订单、补货后读到的库存又足够了，会被误当作预留成功。
+    """
+    if not quantities:
+        return {}
+    requested = case(
+        *((Product.id == product_id, quantity) for product_id, quantity in quantities.items()),
+        else_=0
+    )
+    available = Product.initial_stock - Product.sold_quantity - Product.reserved_quantity
+    savepoint = db.session.begin_nested()
+    result = db.session.execute(
+        db.update(Product)
+        .where(Product.id.in_(list(quantities)))
+        .where(Product.event_id == event_id)
+        .where(available >= requested)
+        .values(reserved_quantity=Product.reserved_quantity + requested)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == len(quantities):
+        savepoint.commit()
+        return {}
+
+    # 有商品预留失败：撤销本次已加上的预留，在同一个事务内读出各商品的可用库存用于报错
+    savepoint.rollback()
+    stocks = dict(
+        db.session.query(Product.id, available)
+        .filter(Product.id.in_(list(quantities)), Product.event_id == event_id)
+    )
+    db.session.rollback()
+    # 不存在或不属于该展会的商品按可用库存 0 处理
+    return {
+        product_id: stocks.get(product_id, 0) for product_id, quantity in quantities.items()
+        if stocks.get(product_id, 0) < quantity
+    }
+
+
+def apply_order_status_change(order, new_status):
+    """修改订单状态，并在同一事务内同步库存计数器和展会数据版本"""
+    old_status = order.status
+    if old_status == new_status:
+        return
+    # 涉及 completed 的变更会改变 current_stock，顾客菜单也需要更新
+    Event.bump_data_version(order.event_id, menu='completed' in (old_status, new_status))
+    apply_status_change(
+        [(item.product_id, item.quantity) for item in order.items],
+        old_status, new_status
+    )
+    order.status = new_status
+    order.updated_at = datetime.utcnow()
+
+
+def apply_batch_status_changes(event_id, transitions):
+    """
+    批量修改同一展会内多个订单的状态。transitions 为 {order_id: new_status}。
+    不逐个加载订单对象，而是：
+      1. 一次查询读出这些订单的当前状态，一次查询读出需要变更的订单明细
+      2. 把所有订单的计数器变化按商品合并成净变化量，用一条 UPDATE ... CASE 写回
+      3. 按目标状态分组，每组一条 UPDATE 修改订单状态；变更记录一次性插入
+      4. 展会数据版本只增加一次
+    调用方负责 commit。返回 {order_id: 'updated' | 'unchanged' | 'not_found'}。
+    """
+    current = dict(
+        db.session.query(Order.id, Order.status)
+        .filter(Order.event_id == event_id, Order.id.in_(list(transitions)))
+    )
+    results = {}
+    changed = {}
+    for order_id, new_status in transitions.items():
+        old_status = current.get(order_id)
+        if old_status is None:
+            results[order_id] = 'not_found'
+        elif old_status == new_status:
+            results[order_id] = 'unchanged'
+        else:
+            results[order_id] = 'updated'
+            changed[order_id] = (old_status, new_status)
+    if not changed:
+        return results
+
+    # 涉及 completed 的变更会改变 current_stock，顾客菜单也需要更新
+    menu = any('completed' in pair for pair in changed.values())
+    Event.bump_data_version(event_id, menu=menu)
+
+    # 每个商品、每个计数器的净变化量 (例如同一批里一单 pending→completed、一单 completed→cancelled)
+    deltas = defaultdict(lambda: defaultdict(int))
+    items = db.session.query(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)\
+        .filter(OrderItem.order_id.in_(list(changed)))
+    for order_id, product_id, quantity in items:
+        old_status, new_status = changed[order_id]
+        old_column = STATUS_COUNTER_COLUMNS.get(old_status)
+        new_column = STATUS_COUNTER_COLUMNS.get(new_status)
+        if old_column:
+            deltas[product_id][old_column] -= quantity
+        if new_column:
+            deltas[product_id][new_column] += quantity
+
+    values = {}
+    for name in STATUS_COUNTER_COLUMNS.values():
+        whens = [(Product.id == pid, delta[name]) for pid, delta in deltas.items() if delta[name]]
+        if whens:
+            column = getattr(Product, name)
+            values[column] = column + case(*whens, else_=0)
+    if values:
+        if Product.sold_quantity in values:
+            sold_changed = [pid for pid, delta in deltas.items() if delta['sold_quantity']]
+            values[Product.stock_version] = case(
+                (Product.id.in_(sold_changed), Product.event_data_version()),
+                else_=Product.stock_version
+            )
+        db.session.query(Product).filter(Product.id.in_(list(deltas)))\
+            .update(values, synchronize_session=False)
+
+    now = datetime.utcnow()
+    by_status = defaultdict(list)
+    for order_id, (_, new_status) in changed.items():
+        by_status[new_status].append(order_id)
+    for new_status, order_ids in by_status.items():
+        db.session.query(Order).filter(Order.id.in_(order_ids))\
+            .update({Order.status: new_status, Order.updated_at: now}, synchronize_session=False)
+    db.session.execute(db.insert(OrderChange), [
+        {'event_id': event_id, 'order_id': order_id, 'kind': 'order_status', 'timestamp': now}
+        for order_id in changed
+    ])
+    return results
+
+
+def recount_products(event_id=None, fix=False):
+    """
+    用订单明细重新统计每个商品的已售/预留数量，与计数器对账。
+    返回不一致的记录列表；fix=True 时直接用统计结果覆盖计数器 (用于迁移后回填)，
+    并在同一事务内推进涉及展会的数据版本和这些商品的 stock_version，
+    统计缓存、快照缓存和顾客菜单的增量更新才会拿到修正后的数字。
+    """
+    ledger_query = db.session.query(
+        OrderItem.product_id,
+        func.sum(case((Order.status == 'completed', OrderItem.quantity), else_=0)),
+        func.sum(case((Order.status == 'pending', OrderItem.quantity), else_=0)),
+    ).join(Order, OrderItem.order_id == Order.id)
+    if event_id is not None:
+        ledger_query = ledger_query.filter(Order.event_id == event_id)
+    ledger = {
+        product_id: (int(sold or 0), int(reserved or 0))
+        for product_id, sold, reserved in ledger_query.group_by(OrderItem.product_id)
+    }
+
+    products_query = Product.query
+    if event_id is not None:
+        products_query = products_query.filter_by(event_id=event_id)
+
+    mismatches = []
+    corrections = []
+    for product in products_query.all():
+        sold, reserved = ledger.get(product.id, (0, 0))
+        if product.sold_quantity == sold and product.reserved_quantity == reserved:
+            continue
+        mismatches.append({
+            "product_id": product.id,
+            "event_id": product.event_id,
+            "sold_quantity": product.sold_quantity,
+            "expected_sold_quantity": sold,
+            "reserved_quantity": product.reserved_quantity,
+            "expected_reserved_quantity": reserved,
+        })
+        corrections.append((product, sold, reserved))
+
+    if fix and mismatches:
+        # 先推进展会数据版本，再修改计数器：stock_version 取到的是新的 data_version
+        Event.bump_data_version(*{m['event_id'] for m in mismatches}, menu=True)
+        for product, sold, reserved in corrections:
+            product.sold_quantity = sold
+            product.reserved_quantity = reserved
+            product.stock_version = Product.event_data_version()
+        db.session.commit()
+    return mismatches
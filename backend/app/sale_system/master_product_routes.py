@@ -1,11 +1,15 @@
 import os
-import time
 from flask import request, jsonify, current_app
 from sqlalchemy.exc import IntegrityError
-from PIL import Image
 from . import sale_bp
 from .. import db
-from ..models import MasterProduct
+from ..models import MasterProduct, Product, Event
+from ..sqlite_profile import write_transaction
+from ..static_files import path_for_static_url
+from .pagination import page_request, keyset_page, CursorError
+from .read_models import MasterProductDTO, master_product_query
+from .image_pipeline import save_product_upload, schedule_product_image, image_file_urls
+from .catalog_import import import_catalog, CatalogImportError
 
 # --- 配置 ---
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
@@ -22,65 +26,55 @@ def delete_file(file_url):
     if not file_url:
         return
     try:
-        # 将 URL (/static/uploads/...) 转换为文件系统路径 (app/static/uploads/...)
-        # 使用 file_url[1:] 或 lstrip('/') 来移除开头的斜杠
-        file_path = os.path.join(current_app.root_path, 'static', file_url.split('/static/')[-1])
+        # 将 URL (/static/uploads/...?v=摘要) 转换为文件系统路径 (STATIC_FOLDER/uploads/...)
+        file_path = path_for_static_url(file_url)
         if os.path.exists(file_path):
             os.remove(file_path)
             print(f"Successfully deleted file: {file_path}")
     except Exception as e:
         print(f"Error deleting file {file_url}: {e}")
 
-def process_and_save_image(file_stream, file_type='product'):
-    """处理图片：压缩、转换为 WebP 并保存到对应目录"""
-    try:
-        img = Image.open(file_stream).convert("RGB")
-        timestamp = int(time.time() * 1000)
-        output_filename = f"{timestamp}.webp"
-        
-        # 根据文件类型选择保存目录
-        if file_type == 'product':
-            save_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'products')
-        elif file_type == 'qrcode':
-            save_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'qrcodes')
-        elif file_type == 'event':
-            save_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'events')
-        else:
-            save_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'temp')
-        
-        # 确保目录存在
-        os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, output_filename)
-        
-        # 保存图片
-        img.save(save_path, 'webp', quality=60)
-        
-        # 返回相对路径
-        relative_path = os.path.relpath(save_path, current_app.config['STATIC_FOLDER'])
-        return f"/static/{relative_path}"
-        
-    except Exception as e:
-        print(f"Image processing error: {e}")
-        return None
+def _bump_events_using(mp):
+    """主商品信息变化后，让所有上架了它的展会的缓存失效"""
+    event_ids = [event_id for (event_id,) in
+                 db.session.query(Product.event_id).filter_by(master_product_id=mp.id)]
+    Event.bump_data_version(*event_ids, lineup=True)
 
 # --- API 路由 ---
 
 @sale_bp.route('/api/master-products', methods=['GET'])
 def get_master_products():
     show_all = request.args.get('all', 'false').lower() == 'true'
-    query = MasterProduct.query
+    # 【修改】只查询需要的列，不加载 ORM 对象 (见 read_models.py)
+    query = master_product_query()
     if not show_all:
-        query = query.filter_by(is_active=True)
-    products = query.order_by(MasterProduct.product_code).all()
-    return jsonify([p.to_dict() for p in products])
+        query = query.filter(MasterProduct.is_active.is_(True))
+    # 【新增】带 limit/cursor 时按 (product_code, id) 分页，否则保持旧的一次返回全部
+    try:
+        page = page_request()
+    except CursorError as e:
+        return jsonify(error=f"Invalid pagination parameters: {e}"), 400
+    if page is None:
+        rows = query.order_by(MasterProduct.product_code, MasterProduct.id).all()
+        return jsonify([MasterProductDTO(row) for row in rows])
+    limit, cursor = page
+    try:
+        rows, next_cursor = keyset_page(
+            query, 'master_products', [MasterProduct.product_code, MasterProduct.id], [str, int], limit, cursor
+        )
+    except CursorError as e:
+        return jsonify(error=f"Invalid pagination parameters: {e}"), 400
+    return jsonify(items=[MasterProductDTO(row) for row in rows], next_cursor=next_cursor)
 
 @sale_bp.route('/api/master-products/<int:mp_id>/status', methods=['PUT'])
+@write_transaction
 def update_master_product_status(mp_id):
     mp = MasterProduct.query.get_or_404(mp_id)
     data = request.get_json()
     if 'is_active' not in data or not isinstance(data['is_active'], bool):
         return jsonify(error="Invalid request: 'is_active' (boolean) is required."), 400
     mp.is_active = data['is_active']
+    _bump_events_using(mp)
     db.session.commit()
     return jsonify(mp.to_dict()), 200
 
@@ -95,7 +89,8 @@ def create_master_product():
     if 'image' in request.files:
         file = request.files['image']
         if file and file.filename and allowed_file(file.filename):
-            image_url = process_and_save_image(file.stream)
+            # 【修改】请求内只保存原始文件，各尺寸的 WebP 由后台线程生成
+            image_url = save_product_upload(file.stream)
             if not image_url:
                 return jsonify(error="Image processing failed."), 500
     try:
@@ -108,6 +103,8 @@ def create_master_product():
         )
         db.session.add(new_mp)
         db.session.commit()
+        if image_url:
+            schedule_product_image(new_mp.id, image_url)
         return jsonify(new_mp.to_dict()), 201
     except IntegrityError:
         db.session.rollback()
@@ -118,11 +115,40 @@ def create_master_product():
         delete_file(image_url)
         return jsonify(error=str(e)), 500
 
+# 【新增】API: 批量导入主商品目录
+# multipart 表单: file=目录文件 (.csv / .xlsx)，images=图片 ZIP (可选)
+# 按编号新增或更新，响应为各结果的数量，以及有变化或失败的行 (最多 IMPORT_REPORT_MAX_ROWS 行)：
+# {"created": 3, "updated": 1, "unchanged": 795, "failed": 1,
+#  "rows": [{"line": 2, "product_code": "A01", "result": "created", "changes": [...]}, ...], "truncated": false}
+# 大文件也可以在服务器上用 flask import-catalog 导入
+@sale_bp.route('/api/master-products/import', methods=['POST'])
+def import_master_products():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify(error="Missing catalogue file."), 400
+    images = request.files.get('images')
+    images_stream = images.stream if images and images.filename else None
+
+    max_rows = current_app.config.get('IMPORT_REPORT_MAX_ROWS', 1000)
+    rows = []
+
+    def collect(entry):
+        if entry['result'] != 'unchanged' and len(rows) < max_rows:
+            rows.append(entry)
+
+    try:
+        summary = import_catalog(upload.stream, upload.filename, images_stream, on_row=collect)
+    except CatalogImportError as e:
+        return jsonify(error=str(e)), 400
+    changed = summary['created'] + summary['updated'] + summary['failed']
+    return jsonify(**summary, rows=rows, truncated=changed > len(rows)), 200
+
 # 【已修改】API: 更新一个主商品，支持图片移除和替换
 @sale_bp.route('/api/master-products/<int:mp_id>', methods=['POST', 'PUT'])
 def update_master_product(mp_id):
     mp = MasterProduct.query.get_or_404(mp_id)
     data = request.form
+    new_image_url = None
 
     try:
         # 1. 更新文本字段
@@ -137,22 +163,30 @@ def update_master_product(mp_id):
 
         # 2. 处理图片移除逻辑
         if data.get('remove_image') == 'true':
-            delete_file(mp.image_url)
+            for url in image_file_urls(mp):
+                delete_file(url)
             mp.image_url = None
+            mp.image_variants = None
         
         # 3. 处理新图片上传逻辑 (替换)
         if 'image' in request.files:
             print("DEBUG: Received image file for update")
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                # 先删除旧图片
-                delete_file(mp.image_url)
-                # 保存新图片并更新 URL
-                mp.image_url = process_and_save_image(file.stream)
+                # 先删除旧图片 (包括各尺寸)
+                for url in image_file_urls(mp):
+                    delete_file(url)
+                mp.image_variants = None
+                # 保存原始文件并更新 URL，提交后再交给后台生成各尺寸
+                new_image_url = mp.image_url = save_product_upload(file.stream)
                 if not mp.image_url:
                     return jsonify(error="Image processing failed during update."), 500
         
+        # 名称、编号、图片都会出现在各展会的商品和统计数据中
+        _bump_events_using(mp)
         db.session.commit()
+        if new_image_url:
+            schedule_product_image(mp.id, new_image_url)
         return jsonify(mp.to_dict()), 200
     except IntegrityError:
         db.session.rollback()
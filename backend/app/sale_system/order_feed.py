@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from .. import db
+from ..models import Event, Order, OrderChange, order_load_options
+from ..sqlite_profile import immediate_transactions
+
+# --- 订单变更推送 (SSE) ---
+# 写入端：订单创建/状态变更时调用 record_order_change，与订单在同一事务内提交。
+# 读取端：generate_order_stream 定期按自增 id 读取 OrderChange，推送给摊主页面。
+# 清理：订单自动取消的定时任务 (order_sweeper) 每一轮顺带调用 purge_order_changes，
+# 删除超过 ORDER_CHANGE_RETENTION 的变更 (按 id 从小到大删除，删掉的总是 id 最小的一段)；
+# 断线太久、Last-Event-ID 早于保留的最早一条时，推送 resync 事件让页面重新拉取完整列表。
+
+# 每次最多读取的变更条数，避免断线很久后重连时一次性加载过多订单
+STREAM_BATCH_SIZE = 100
+# 清理时每批删除的条数 (每批一个短事务，不长时间占用写锁)
+PURGE_BATCH_SIZE = 5000
+
+
+def record_order_change(order, kind):
+    """记录一次订单变更，kind 为 'order_created' 或 'order_status'"""
+    db.session.add(OrderChange(event_id=order.event_id, order=order, kind=kind))
+
+
+def latest_change_id(event_id):
+    """当前展会最新一条变更的 id，新连接从这里开始推送"""
+    return db.session.query(db.func.max(OrderChange.id))\
+        .filter(OrderChange.event_id == event_id).scalar() or 0
+
+
+def purge_order_changes(now=None):
+    """
+    删除早于 ORDER_CHANGE_RETENTION 秒的变更记录，返回删除的条数。
+    始终保留 id 最大的一条：SQLite 的整数主键在表被删空后会从 1 重新分配，
+    客户端手里的 Last-Event-ID 就会比新的 id 大，错过之后的变更。
+    """
+    from flask import current_app
+
+    retention = current_app.config.get('ORDER_CHANGE_RETENTION', 24 * 3600)
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=retention)
+    cutoff_id = db.session.query(db.func.max(OrderChange.id))\
+        .filter(OrderChange.timestamp < cutoff).scalar()
+    newest_id = db.session.query(db.func.max(OrderChange.id)).scalar()
+    db.session.rollback()
+    if cutoff_id is None:
+        return 0
+    cutoff_id = min(cutoff_id, newest_id - 1)
+
+    deleted = 0
+    while True:
+        with immediate_transactions():
+            batch_end = db.session.query(OrderChange.id).filter(OrderChange.id <= cutoff_id)\
+                .order_by(OrderChange.id).offset(PURGE_BATCH_SIZE - 1).limit(1).scalar()
+            count = db.session.query(OrderChange)\
+                .filter(OrderChange.id <= (cutoff_id if batch_end is None else batch_end))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+        deleted += count
+        if batch_end is None or count == 0:
+            return deleted
+
+
+def change_id_range():
+    """所有展会保留的变更中最小和最大的 id，没有任何变更时为 (None, None)"""
+    return db.session.query(db.func.min(OrderChange.id), db.func.max(OrderChange.id)).one()
+
+
+def orders_etag(event_id, query_string):
+    """
+    订单列表的强 ETag。订单的任何创建/状态变更都会写入 OrderChange；
+    订单项里的商品名称、价格、图片来自 Product/MasterProduct，这些变化会推进展会的 lineup_version。
+    所以 (展会, 商品阵容版本, 最新变更 id, 查询参数) 就能唯一确定列表内容，计算时不需要加载任何订单。
+    """
+    digest = hashlib.sha1(query_string).hexdigest()[:12]
+    lineup_version = db.session.query(Event.lineup_version).filter(Event.id == event_id).scalar() or 0
+    return f"orders-{event_id}-{lineup_version}-{latest_change_id(event_id)}-{digest}"
+
+
+def _format_sse(change_id, kind, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {change_id}\nevent: {kind}\ndata: {data}\n\n"
+
+
+def _read_changes(event_id, last_id):
+    """读取 last_id 之后的变更，返回 (新的 last_id, SSE 文本块列表, 是否还有未读完的变更)"""
+    changes = OrderChange.query\
+        .filter(OrderChange.event_id == event_id, OrderChange.id > last_id)\
+        .order_by(OrderChange.id)\
+        .limit(STREAM_BATCH_SIZE)\
+        .all()
+    if not changes:
+        return last_id, [], False
+
+    order_ids = {c.order_id for c in changes}
+    orders = Order.query.options(*order_load_options()).filter(Order.id.in_(order_ids)).all()
+    # 同一订单在一批中多次变更时只序列化一次 (推送的是订单的最新状态)
+    payloads = {o.id: o.to_dict() for o in orders}
+
+    chunks = [
+        _format_sse(c.id, c.kind, payloads[c.order_id])
+        for c in changes if c.order_id in payloads
+    ]
+    return changes[-1].id, chunks, len(changes) == STREAM_BATCH_SIZE
+
+
+def generate_order_stream(app, event_id, last_id):
+    """
+    SSE 响应体生成器。每次检查变更都单独开启应用上下文，
+    空闲时不占用数据库连接；超过 ORDER_STREAM_MAX_AGE 后主动结束，由浏览器自动重连。
+    """
+    poll_interval = app.config['ORDER_STREAM_POLL_INTERVAL']
+    heartbeat = app.config['ORDER_STREAM_HEARTBEAT']
+    max_age = app.config['ORDER_STREAM_MAX_AGE']
+
+    # 告诉浏览器断线后 3 秒重连
+    yield "retry: 3000\n\n"
+    with app.app_context():
+        oldest_id, newest_id = change_id_range()
+    if oldest_id is not None and last_id < oldest_id - 1:
+        # 断点之后的变更已被清理，无法补齐：让页面重新拉取完整列表，从最新的一条变更之后继续推送
+        # (用所有展会中最大的 id，本展会没有保留的变更时重连也不会再次触发)
+        last_id = newest_id
+        yield _format_sse(last_id, 'resync', {'reason': 'expired'})
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < max_age:
+        with app.app_context():
+            last_id, chunks, has_more = _read_changes(event_id, last_id)
+        now = time.monotonic()
+        if chunks:
+            yield ''.join(chunks)
+            last_sent = now
+            # 还有没读完的变更，立即继续读取
+            if has_more:
+                continue
+        elif now - last_sent >= heartbeat:
+            # 注释行作为心跳，防止代理因连接空闲而断开
+            yield ": heartbeat\n\n"
+            last_sent = now
+        time.sleep(poll_interval)
@@ -1,11 +1,24 @@
-from flask import request, jsonify, send_file
+from flask import request, jsonify, send_file, current_app, Response
 from . import sale_bp
-from .. import db
-from ..models import Order, OrderItem, Product, Event, MasterProduct
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-import pandas as pd
-import io
+from .. import db, snapshot_cache
+from ..models import Order, OrderItem, Product, Event, order_load_options
+from ..sqlite_profile import write_transaction, is_lock_error
+from .inventory import reserve_stock, apply_order_status_change, apply_batch_status_changes
+from .stats import build_sales_summary
+from .excel_export import get_sales_summary_workbook, XLSX_MIMETYPE
+from .bulk_export import select_events, generate_bulk_export
+from .event_routes import VALID_STATUSES as VALID_EVENT_STATUSES
+from .pagination import page_request, keyset_page, CursorError
+from .read_models import order_query, load_orders
+from .order_feed import record_order_change, change_id_range, generate_order_stream, orders_etag
+from .idempotency import (
+    key_from_request, request_fingerprint, find_response, store_response, purge_expired,
+    IdempotencyError, IdempotencyConflict,
+)
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+from urllib.parse import quote
 VALID_ORDER_STATUSES = ['pending', 'completed', 'cancelled']
 
 
@@ -13,19 +26,90 @@ VALID_ORDER_STATUSES = ['pending', 'completed', 'cancelled']
 
 # API: 获取指定展会的订单列表
 # 路径: GET /sale/api/events/<int:event_id>/orders?status=pending
+# 【新增】增量拉取参数 (可选)：
+#   since_id=<订单id>            只返回 id 更大的订单 (新订单)
+#   updated_since=<ISO 时间>      只返回在此时间及之后创建或修改过的订单 (客户端按 id 去重)
+# 增量同步时不要同时带 status，否则看不到离开该状态的订单。
+# 【新增】分页参数 (可选)：limit=<每页条数>&cursor=<上一页返回的 next_cursor>，
+#   带上任意一个时响应为 {"items": [...], "next_cursor": ...}，按下单时间倒序
+# 响应带有强 ETag，列表没有变化时带 If-None-Match 的请求直接得到 304。
 @sale_bp.route('/api/events/<int:event_id>/orders', methods=['GET'])
 def get_orders_for_event(event_id):
+    # 先比较 ETag，未变化时不查询任何订单
+    etag = orders_etag(event_id, request.query_string)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
     Event.query.get_or_404(event_id)
     status_filter = request.args.get('status')
-    query = Order.query.filter_by(event_id=event_id)
+    # 【修改】只查询需要的列，不加载 ORM 对象 (见 read_models.py)
+    query = order_query().filter(Order.event_id == event_id)
     if status_filter in VALID_ORDER_STATUSES:
-        query = query.filter_by(status=status_filter)
-    orders = query.order_by(Order.timestamp.desc()).all()
-    return jsonify([o.to_dict() for o in orders])
+        query = query.filter(Order.status == status_filter)
+
+    since_id = request.args.get('since_id', type=int)
+    if since_id is not None:
+        query = query.filter(Order.id > since_id)
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            return jsonify(error="Invalid updated_since, expected ISO 8601 datetime."), 400
+        # 旧数据的 updated_at 可能为空，此时以创建时间为准
+        query = query.filter(or_(
+            Order.updated_at >= since,
+            and_(Order.updated_at.is_(None), Order.timestamp >= since)
+        ))
+
+    # 【新增】带 limit/cursor 时按 (timestamp, id) 倒序分页，否则保持旧的一次返回全部
+    try:
+        page = page_request()
+        if page is None:
+            rows = query.order_by(Order.timestamp.desc(), Order.id.desc()).all()
+            response = jsonify(load_orders(rows))
+        else:
+            limit, cursor = page
+            rows, next_cursor = keyset_page(
+                query, 'orders', [Order.timestamp, Order.id], [datetime, int], limit, cursor, descending=True
+            )
+            response = jsonify(items=load_orders(rows), next_cursor=next_cursor)
+    except CursorError as e:
+        return jsonify(error=f"Invalid pagination parameters: {e}"), 400
+    response.set_etag(etag)
+    # 要求浏览器每次都带 ETag 重新验证，而不是直接使用本地缓存
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# 【新增】API: 订单变更推送 (Server-Sent Events)，替代摊主页面的轮询
+# 路径: GET /sale/api/events/<int:event_id>/orders/stream
+# 事件类型: order_created / order_status，data 为订单的最新 to_dict()
+# 断线重连时浏览器会带上 Last-Event-ID 头，从断点继续推送
+@sale_bp.route('/api/events/<int:event_id>/orders/stream', methods=['GET'])
+def stream_orders_for_event(event_id):
+    Event.query.get_or_404(event_id)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id)
+    except (TypeError, ValueError):
+        # 新连接从所有展会最新的一条变更之后开始 (本展会还没有变更时也不会被当作断点过早)
+        last_id = change_id_range()[1] or 0
+    # 生成器在请求结束后才运行，这里先释放本次请求的数据库会话
+    db.session.remove()
+
+    app = current_app._get_current_object()
+    response = Response(generate_order_stream(app, event_id, last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 让 nginx 不缓冲这个响应，事件才能立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # API: 更新订单状态 (摊主操作)
 # 【核心改动】API: 更新指定展会下的特定订单状态
 @sale_bp.route('/api/events/<int:event_id>/orders/<int:order_id>/status', methods=['PUT'])
+@write_transaction
 def update_order_status_for_event(event_id, order_id):
     data = request.get_json()
     new_status = data.get('status')
@@ -34,19 +118,60 @@ def update_order_status_for_event(event_id, order_id):
         return jsonify(error=f"Invalid status."), 400
 
     # 查询订单时，确保它同时匹配 order_id 和 event_id
-    order = Order.query.filter_by(id=order_id, event_id=event_id).first_or_404()
+    order = Order.query.options(*order_load_options())\
+        .filter_by(id=order_id, event_id=event_id).first_or_404()
     
-    order.status = new_status
+    # 状态变更与商品的已售/预留计数器在同一事务内提交
+    if order.status != new_status:
+        apply_order_status_change(order, new_status)
+        record_order_change(order, 'order_status')
     db.session.commit()
     
     return jsonify(order.to_dict())
+
+# 【新增】API: 批量修改订单状态 (高峰期连续确认/取消多个订单时只需一次请求、一次提交)
+# 请求体: {"transitions": [{"order_id": 1, "status": "completed"}, ...]}
+# 响应: {"results": [{"order_id": 1, "status": "completed", "result": "updated"}, ...]}
+#   result 为 updated (已修改)、unchanged (本来就是该状态) 或 not_found (订单不存在或不属于该展会)
+# 任何一项的状态不合法、或同一订单出现多次时整个请求返回 400，不做任何修改。
+@sale_bp.route('/api/events/<int:event_id>/orders/status', methods=['PATCH'])
+@write_transaction
+def update_order_statuses_for_event(event_id):
+    data = request.get_json(silent=True) or {}
+    entries = data.get('transitions')
+    if not isinstance(entries, list) or not entries:
+        return jsonify(error="'transitions' must be a non-empty list."), 400
+    max_size = current_app.config.get('ORDER_BATCH_MAX_SIZE', 200)
+    if len(entries) > max_size:
+        return jsonify(error=f"At most {max_size} transitions per request."), 400
+
+    transitions = {}
+    for entry in entries:
+        order_id = entry.get('order_id') if isinstance(entry, dict) else None
+        new_status = entry.get('status') if isinstance(entry, dict) else None
+        if type(order_id) is not int or new_status not in VALID_ORDER_STATUSES:
+            return jsonify(error=f"Invalid transition: {entry}"), 400
+        if order_id in transitions:
+            return jsonify(error=f"Order {order_id} appears more than once."), 400
+        transitions[order_id] = new_status
+
+    Event.query.get_or_404(event_id)
+    results = apply_batch_status_changes(event_id, transitions)
+    db.session.commit()
+
+    return jsonify(results=[
+        {'order_id': order_id, 'status': new_status, 'result': results[order_id]}
+        for order_id, new_status in transitions.items()
+    ])
+
 # 【新增】API: 顾客创建新订单 (替代 WebSocket)
 @sale_bp.route('/api/events/<int:event_id>/orders', methods=['POST'])
 def create_order(event_id):
     """
     顾客创建新订单。
     包含了健壮的库存检查，会同时考虑 'pending' 和 'completed' 的订单，
-    以防止并发下单时造成的超卖问题。
+    并通过一条带条件的 UPDATE 原子地预留库存，以防止并发下单时造成的超卖问题。
+    【新增】带 Idempotency-Key 请求头的重试直接返回第一次成功的响应 (见 idempotency.py)。
     """
     data = request.get_json()
     items = data.get('items')
@@ -54,9 +179,37 @@ def create_order(event_id):
     if not isinstance(items, list) or not items:
         return jsonify(error="Invalid order data: Missing or empty items."), 400
 
+    # 幂等键命中时在只读事务里直接返回，不进入写事务 (不拿写锁、不检查库存)
+    fingerprint = None
+    try:
+        idempotency_key = key_from_request()
+        if idempotency_key is not None:
+            fingerprint = request_fingerprint(data)
+            replay = find_response(event_id, idempotency_key, fingerprint)
+            if replay is not None:
+                return replay
+            db.session.rollback()  # 结束只读事务，下面的写事务才会以 BEGIN IMMEDIATE 开始
+    except IdempotencyConflict as e:
+        return jsonify(error=str(e)), 422
+    except IdempotencyError as e:
+        return jsonify(error=str(e)), 400
+
+    return _create_order(event_id, items, idempotency_key, fingerprint)
+
+
+@write_transaction
+def _create_order(event_id, items, idempotency_key=None, fingerprint=None):
     # 开启一个数据库事务，确保库存检查和订单创建的原子性
     try:
-        # 在提交数据库前，先对所有请求的商品做一次完整的库存检查
+        # 0. 同一个 key 的并发重试：拿到写锁后再查一次，前一个请求已经提交时在这里命中
+        if idempotency_key is not None:
+            replay = find_response(event_id, idempotency_key, fingerprint)
+            if replay is not None:
+                db.session.rollback()
+                return replay
+
+        # 1. 校验请求数据，并把同一商品的多行合并 (否则每行单独检查会超卖)
+        quantities = {}
         for item in items:
             product_id = item.get('product_id')
             requested_quantity = item.get('quantity')
@@ -64,244 +217,131 @@ def create_order(event_id):
             if not product_id or not requested_quantity or requested_quantity <= 0:
                 
                 return jsonify(error="Invalid item data in request."), 400
-
-            product = Product.query.get(product_id)
+            quantities[product_id] = quantities.get(product_id, 0) + requested_quantity
+
+        # 2. 一次查询取出所有涉及的商品 (连同主商品信息，用于报错信息和价格)
+        products_in_order = Product.query.options(joinedload(Product.master_product))\
+            .filter(Product.id.in_(list(quantities))).all()
+        products_by_id = {p.id: p for p in products_in_order}
+        for product_id in quantities:
+            product = products_by_id.get(product_id)
             if not product or product.event_id != int(event_id):
                  return jsonify(error=f"Product with ID {product_id} is invalid for this event."), 400
 
-            # 【至关重要的修改】
-            # 计算所有已“承诺售出”的库存，包括已完成(completed)和待处理(pending)的。
-            # 这可以防止新的订单超卖已经被其他待处理订单“预定”的库存。
-            committed_quantity = db.session.query(func.sum(OrderItem.quantity))\
-                .join(Order)\
-                .filter(OrderItem.product_id == product_id)\
-                .filter(Order.status.in_(['pending', 'completed']))\
-                .scalar() or 0
-
-            # 计算真正的可用库存
-            available_stock = product.initial_stock - committed_quantity
-            
-            # 检查库存是否充足
-            if available_stock < requested_quantity:
-                
-                return jsonify(
-                    error=f"'{product.name}'现在库存不足.",
-                    detail=f"Requested: {requested_quantity}, Available: {available_stock}"
-                ), 406 # 使用 406 Not Acceptable 表示库存不足
-
-        # --- 库存检查全部通过，现在可以安全地创建订单 ---
-        
-        # 为了效率，一次性获取所有涉及商品的价格
-        product_ids = [i['product_id'] for i in items]
-        products_in_order = Product.query.filter(Product.id.in_(product_ids)).all()
-        product_prices = {p.id: p.price for p in products_in_order}
-
+        # 3. 【至关重要的修改】
+        # 用一条带条件的 UPDATE 同时检查并预留所有商品的库存。
+        # 可用库存 = 初始库存 - 已完成(completed) - 待处理(pending)，两者都由 Product 上的计数器维护。
+        # 检查与预留在同一条语句中完成，多个 worker 并发下单也不会超卖。
+        shortages = reserve_stock(event_id, quantities)
+        if shortages:
+            product_id = next(pid for pid in quantities if pid in shortages)
+            return jsonify(
+                error=f"'{products_by_id[product_id].name}'现在库存不足.",
+                detail=f"Requested: {quantities[product_id]}, Available: {shortages[product_id]}"
+            ), 406 # 使用 406 Not Acceptable 表示库存不足
+
+        # --- 库存已预留，现在可以安全地创建订单 ---
         total_amount = 0
-        for item in items:
-            total_amount += product_prices[item.get('product_id')] * item.get('quantity')
+        for product_id, quantity in quantities.items():
+            total_amount += products_by_id[product_id].price * quantity
 
         new_order = Order(event_id=event_id, total_amount=round(total_amount, 2), status='pending')
+        for product_id, quantity in quantities.items():
+            # 创建 OrderItem，随订单一起写入
+            new_order.items.append(OrderItem(
+                product_id=product_id,
+                quantity=quantity,
+                product=products_by_id[product_id]
+            ))
         db.session.add(new_order)
-        db.session.flush() # flush来获取new_order.id，以便OrderItem使用
-
-        for item in items:
-            # 创建 OrderItem 并添加到会话
-            order_item = OrderItem(
-                order_id=new_order.id, 
-                product_id=item.get('product_id'), 
-                quantity=item.get('quantity'),
-                product=Product.query.get(item.get('product_id'))
-            )
-            db.session.add(order_item)
-        
-        db.session.commit() # 提交整个事务
-        return jsonify(new_order.to_dict()), 201
-
+        # 写入变更流水，推送给正在监听的摊主页面
+        record_order_change(new_order, 'order_created')
+        Event.bump_data_version(event_id)
+        purge_expired()  # 顺带清理过期的幂等记录 (每个进程至多每 IDEMPOTENCY_PURGE_INTERVAL 秒一次)
+        if idempotency_key is None:
+            db.session.commit() # 提交整个事务
+            return jsonify(new_order.to_dict()), 201
+
+        # 响应与订单在同一个事务里保存
+        db.session.flush()
+        response = jsonify(new_order.to_dict())
+        response.status_code = 201
+        store_response(event_id, idempotency_key, fingerprint, response)
+        db.session.commit()
+        return response
+
+    except IdempotencyConflict as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 422
     except Exception as e:
         db.session.rollback() # 如果发生任何错误，回滚事务
+        if is_lock_error(e):
+            raise # 锁冲突交给 @write_transaction 重试
         print(f"Order creation error: {e}")
         return jsonify(error="An internal server error occurred."), 500
 # --- 销售总结 API (新增功能) ---
-from sqlalchemy import func
-def _get_sales_summary_data(event_id):
-    """
-    内部辅助函数，负责查询数据库并生成销售总结的原始数据。
-    【已更新】此函数现在会通过 Product JOIN MasterProduct 来获取核心商品信息。
-    """
-    event = Event.query.get(event_id)
-    if not event:
-        return None
-
-    # 1. 【核心修改】重写数据库查询以 JOIN MasterProduct
-    # 我们现在需要从 OrderItem -> Product -> MasterProduct 来获取所有信息
-    # 由于 product.current_stock 是一个计算属性（通常是 @property），不能直接在 SQL 查询中选出，
-    # 需要先查出 Product.id，然后在循环中用 ORM 实例获取 current_stock。
-    sales_details_query = db.session.query(
-        MasterProduct.product_code,  # <--- 从 MasterProduct 获取
-        MasterProduct.name,          # <--- 从 MasterProduct 获取
-        Product.price,               # <--- 价格仍然是展会特定的
-        Product.initial_stock,       # <--- 初始库存
-        func.sum(OrderItem.quantity).label('total_quantity'),
-        Product.id                   # <--- 加入 Product.id 以便后续查 current_stock
-    ).join(Order, OrderItem.order_id == Order.id)\
-     .join(Product, OrderItem.product_id == Product.id)\
-     .join(MasterProduct, Product.master_product_id == MasterProduct.id) \
-     .filter(Order.event_id == event_id)\
-     .filter(Order.status == 'completed')\
-     .group_by(MasterProduct.product_code, MasterProduct.name, Product.price, Product.initial_stock, Product.id)\
-     .order_by(MasterProduct.name)\
-     .all()
-
-    # 2. 将查询结果处理成结构化的字典列表（去重，只添加一次）
-    summary_list = []
-    for code, name, price, initial_stock, quantity, product_id in sales_details_query:
-        product = Product.query.get(product_id)
-        current_stock = product.current_stock if product else None
-        summary_list.append({
-            "product_code": code,
-            "product_name": name,
-            "unit_price": float(price),
-            "initial_stock": int(initial_stock),
-            "total_quantity": int(quantity),
-            "total_revenue_per_item": round(float(price) * int(quantity), 2),
-            "current_stock": current_stock
-        })
-
-    # 3. 计算总销售额
-    total_revenue = sum(item['total_revenue_per_item'] for item in summary_list)
-
-    # 4. 构造并返回最终的数据字典
-    return {
-        "event_id": event.id,
-        "event_name": event.name,
-        "total_revenue": round(total_revenue, 2),
-        "summary": summary_list
-    }
-
+# 销售总结的查询逻辑已移到 stats.py，与统计页面共用
 
 @sale_bp.route('/api/events/<int:event_id>/sales_summary', methods=['GET'])
 def get_sales_summary(event_id):
-    sales_data = _get_sales_summary_data(event_id)
-    if sales_data is None:
+    event = db.session.get(Event, event_id)
+    if event is None:
         return jsonify(error="Event not found."), 404
-    return jsonify(sales_data)
+    # 展会数据版本未变化时直接返回缓存的快照
+    return snapshot_cache.json_response(
+        'sales_summary', event.id, event.data_version, lambda: build_sales_summary(event)
+    )
 
-# 【重构】API: 下载格式精美的销售总结 Excel 文件 (现在调用辅助函数)
+# 【重构】API: 下载格式精美的销售总结 Excel 文件
+# 由 excel_export.py 以 write-only 模式生成，并按展会数据版本缓存在磁盘上
 @sale_bp.route('/api/events/<int:event_id>/sales_summary/download', methods=['GET'])
 def download_sales_summary_excel(event_id):
     """
-    【已修复】
     生成并提供一份与“境界景观学会出摊标准记录”模板高度相似的 Excel 报告。
+    数据没有变化时直接返回缓存的文件，文件从磁盘流式发送。
     """
-    sales_data = _get_sales_summary_data(event_id)
-
-    if sales_data is None: return "Event not found.", 404
-
-    # --- 数据准备部分 ---
-    df = pd.DataFrame(sales_data['summary'])
-    if df.empty:
-        df['ending_stock'] = pd.Series(dtype='object')
-    else:
-        # 让 ending_stock 列什么也不填（全为空）
-        df['ending_stock'] = None
-
-    column_map = {
-        'product_code': '制品编号', 'product_name': '制品名', 'initial_stock': '初始数量',
-        'ending_stock': '结束数量', 'unit_price': '单价', 'total_quantity': '销量',
-        'total_revenue_per_item': '销售额'
-    }
-    df = df.rename(columns=column_map)
-    df = df[list(column_map.values())]
-
-    # --- Excel 样式定义部分保持不变 ---
-    header_font = Font(name='微软雅黑', size=11, bold=True)
-    body_font = Font(name='微软雅黑', size=10)
-    title_font = Font(name='微软雅黑', size=16, bold=True)
-    light_blue_fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-    thin_border_side = Side(style='thin', color='000000')
-    thin_border = Border(left=thin_border_side, right=thin_border_side, top=thin_border_side, bottom=thin_border_side)
-    center_align = Alignment(horizontal='center', vertical='center')
-
-    # --- 创建并写入 Excel 部分 ---
-    output_buffer = io.BytesIO()
-    with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='出摊记录', index=False, header=False, startrow=2)
-        ws = writer.sheets['出摊记录']
-
-        # --- 写入和设置标题 ---
-        ws.merge_cells('A1:F1')
-        title_cell = ws['A1']
-        title_cell.value = f"境界景观学会出摊标准记录 {pd.Timestamp.now().strftime('%Y年%m月')}版"
-        title_cell.font = title_font
-        title_cell.alignment = center_align
-        ws['G1'].value = "摊位号"
-        ws['G1'].font = body_font
-        ws.row_dimensions[1].height = 60
-
-        # --- 写入和设置表头 ---
-        headers = list(column_map.values())
-        for i, header in enumerate(headers, 1):
-            cell = ws.cell(row=2, column=i, value=header)
-            cell.font = header_font
-            cell.alignment = center_align
-            cell.border = thin_border
-        ws.row_dimensions[2].height = 30
-
-        for row_idx in range(3, ws.max_row + 1):
-            ws.row_dimensions[row_idx].height = 30
-            if (row_idx % 2) == 0:
-                for cell in ws[row_idx]:
-                    cell.fill = light_blue_fill
-            for cell in ws[row_idx]:
-                cell.border = thin_border
-                cell.font = body_font
-                cell.alignment = center_align
-            ws[f'E{row_idx}'].number_format = '¥#,##0.00'
-            ws[f'G{row_idx}'].number_format = '¥#,##0.00'
-
-        # --- 写入底部信息区域部分保持不变 ---
-        bottom_start_row = ws.max_row + 2
-        bottom_labels = {
-            f'A{bottom_start_row}': "出席人\n与其联系方式", f'A{bottom_start_row+2}': "特殊情况\n备注",
-            f'A{bottom_start_row+3}': "快递信息", f'C{bottom_start_row}': "日期",
-            f'A{bottom_start_row+1}': "活动名", f'E{bottom_start_row+1}': "总销售额"
-        }
-        for cell_ref, label in bottom_labels.items():
-            cell = ws[cell_ref]
-            cell.value = label
-            cell.font = body_font
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        ws[f'B{bottom_start_row+1}'].value = sales_data['event_name']
-        ws.merge_cells(f'B{bottom_start_row+3}:G{bottom_start_row+3}')
-        ws.merge_cells(f'B{bottom_start_row+2}:G{bottom_start_row+2}')
-        ws.merge_cells(f'B{bottom_start_row+1}:D{bottom_start_row+1}')
-        ws.row_dimensions[bottom_start_row+2].height = 30
-        ws.row_dimensions[bottom_start_row+3].height = 30
-        ws.row_dimensions[bottom_start_row+1].height = 30
-        total_rev_cell = ws[f'F{bottom_start_row+1}']
-        total_rev_cell.value = sales_data['total_revenue']
-        total_rev_cell.number_format = '¥#,##0.00'
-        total_rev_cell.font = Font(name='微软雅黑', size=12, bold=True)
-
-        # 【核心修正】为底部区域绘制边框的逻辑
-        bottom_area = f'A{bottom_start_row}:G{bottom_start_row+3}'
-        for row in ws[bottom_area]:
-            for cell in row:
-                cell.border = thin_border
-
-        # --- 设置固定列宽 ---
-        fixed_width = 16
-        for col in ws.columns:
-            column = get_column_letter(col[0].column)
-            ws.column_dimensions[column].width = fixed_width
-
-    # --- 准备并发送文件部分保持不变 ---
-    output_buffer.seek(0)
-    filename = f"{sales_data['event_name']}_出摊记录_{pd.Timestamp.now().strftime('%Y%m%d')}.xlsx"
+    event = db.session.get(Event, event_id)
+    if event is None: return "Event not found.", 404
 
+    path = get_sales_summary_workbook(event)
+    filename = f"{event.name}_出摊记录_{datetime.now().strftime('%Y%m%d')}.xlsx"
     return send_file(
-        output_buffer,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        path,
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
         download_name=filename
     )
+
+
+# 【新增】API: 批量导出多个展会 (ZIP)
+# 路径: GET /sale/api/events/sales_summary/export?status=已结束&date_from=2024-01-01&date_to=2024-12-31
+# 三个筛选参数都是可选的，日期范围包含两端。
+# 压缩包内容：每个展会一份出摊记录 Excel、全部展会汇总表、orders.csv、order_items.csv，边生成边发送。
+@sale_bp.route('/api/events/sales_summary/export', methods=['GET'])
+def export_events_archive():
+    status = request.args.get('status')
+    if status and status not in VALID_EVENT_STATUSES:
+        return jsonify(error=f"Invalid status. Must be one of: {', '.join(VALID_EVENT_STATUSES)}"), 400
+    try:
+        date_from, date_to = (
+            datetime.strptime(request.args[key], '%Y-%m-%d').date() if request.args.get(key) else None
+            for key in ('date_from', 'date_to')
+        )
+    except ValueError:
+        return jsonify(error="Invalid date. Use YYYY-MM-DD"), 400
+
+    event_ids = [event.id for event in select_events(status, date_from, date_to)]
+    if not event_ids:
+        return jsonify(error="No events match the given filters"), 404
+
+    app = current_app._get_current_object()
+    # 生成器使用自己的应用上下文，先释放请求的数据库会话
+    db.session.remove()
+    today = datetime.now().strftime('%Y%m%d')
+    response = Response(generate_bulk_export(app, event_ids), mimetype='application/zip')
+    # 中文文件名用 RFC 5987 的 filename*，旧浏览器退回到 ASCII 文件名
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=events_{today}.zip; filename*=UTF-8''{quote(f'展会导出_{today}.zip')}"
+    )
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
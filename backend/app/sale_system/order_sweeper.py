@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from .. import db
+from ..models import Event, Order, OrderItem
+from ..sqlite_profile import immediate_transactions, is_lock_error, sqlite_side_path
+from .inventory import apply_batch_status_changes
+from .order_feed import purge_order_changes
+
+try:
+    import fcntl
+except ImportError:  # Windows：只能用命令行 (flask expire-orders) 定时执行
+    fcntl = None
+
+# --- 过期待处理订单的自动取消 ---
+# 下单时库存按 "已售 + 待处理" 预留，顾客放弃付款的订单如果没人处理会一直占着库存，
+# 摊主手机轮询的待处理列表也越来越长。这里定期取消下单时间早于展会保留时长的待处理订单：
+#   - 保留时长按展会设置 (Event.pending_order_ttl_minutes)，为空时用 PENDING_ORDER_TTL_MINUTES (默认 0)，
+#     0 表示不取消；默认不取消任何订单，需要的展会单独设置保留时长
+#   - 只处理 "进行中" 的展会，已结束、未开始的展会里的待处理订单留给摊主处理
+#   - 每个展会按 (event_id, status, timestamp) 索引取出最早的一批，用 apply_batch_status_changes 批量取消：
+#     计数器合并成一条 UPDATE、写入订单变更记录 (SSE 推送给在线的摊主页面)、展会数据版本加一
+#   - 每批一个 BEGIN IMMEDIATE 事务，读状态与修改之间不会插入摊主的操作，不会取消刚被完成的订单
+#
+# 两种运行方式：
+#   1. 进程内：ORDER_SWEEPER_ENABLED=true 时，每个 worker 收到第一个请求后启动一个后台线程，
+#      每 ORDER_SWEEPER_INTERVAL 秒尝试获取数据库旁边的文件锁 (app.db-sweeper.lock)，
+#      拿到锁的 worker 才执行 (锁随进程退出自动释放，其他 worker 下一轮接手)
+#   2. 命令行 / cron：flask expire-orders
+# 进程内执行时每一轮也顺带清理过期的订单变更记录 (见 order_feed.purge_order_changes)。
+
+
+ACTIVE_EVENT_STATUS = '进行中'
+
+
+def _event_ttls(default_minutes):
+    """{event_id: 保留时长 (分钟)}，只包含进行中、有待处理订单且需要自动取消的展会"""
+    rows = db.session.query(Event.id, Event.pending_order_ttl_minutes)\
+        .filter(Event.status == ACTIVE_EVENT_STATUS)\
+        .filter(Event.id.in_(db.session.query(Order.event_id).filter(Order.status == 'pending')))
+    ttls = {}
+    for event_id, minutes in rows:
+        minutes = default_minutes if minutes is None else minutes
+        if minutes and minutes > 0:
+            ttls[event_id] = minutes
+    return ttls
+
+
+def _stale(event_id, cutoff):
+    return (Order.event_id == event_id, Order.status == 'pending', Order.timestamp < cutoff)
+
+
+def expire_stale_orders(now=None, batch_size=None, dry_run=False):
+    """
+    取消超过保留时长的待处理订单，每批单独提交。
+    返回 {'orders': 取消的订单数, 'units': 释放的库存件数, 'events': {event_id: 订单数}}。
+    dry_run=True 时只统计，不修改。
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    batch_size = batch_size or config.get('ORDER_SWEEPER_BATCH_SIZE', 200)
+    ttls = _event_ttls(config.get('PENDING_ORDER_TTL_MINUTES', 0))
+    db.session.rollback()  # 结束上面的只读事务，下面每批以 BEGIN IMMEDIATE 开始
+
+    report = {'orders': 0, 'units': 0, 'events': {}}
+    for event_id, minutes in ttls.items():
+        cutoff = now - timedelta(minutes=minutes)
+        if dry_run:
+            orders = db.session.query(func.count(Order.id)).filter(*_stale(event_id, cutoff)).scalar()
+            units = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))\
+                .join(Order, Order.id == OrderItem.order_id).filter(*_stale(event_id, cutoff)).scalar()
+            db.session.rollback()
+            if orders:
+                report['orders'] += orders
+                report['units'] += units
+                report['events'][event_id] = orders
+            continue
+
+        while True:
+            with immediate_transactions():
+                order_ids = [row.id for row in db.session.query(Order.id).filter(*_stale(event_id, cutoff))
+                             .order_by(Order.timestamp).limit(batch_size)]
+                if not order_ids:
+                    db.session.rollback()
+                    break
+                units = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))\
+                    .filter(OrderItem.order_id.in_(order_ids)).scalar()
+                apply_batch_status_changes(event_id, {order_id: 'cancelled' for order_id in order_ids})
+                db.session.commit()
+            report['orders'] += len(order_ids)
+            report['units'] += units
+            report['events'][event_id] = report['events'].get(event_id, 0) + len(order_ids)
+            if len(order_ids) < batch_size:
+                break
+    return report
+
+
+class OrderSweeper:
+    """进程内的定时执行器，同一台机器上的多个 worker 通过文件锁选出一个执行"""
+
+    def __init__(self):
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._lock_file = None
+
+    def init_app(self, app):
+        app.extensions['order_sweeper'] = self
+        app.before_request(lambda: self._ensure_started(app))
+
+    def _ensure_started(self, app):
+        # 在第一个请求时才启动，flask 命令行、脚本创建 app 时不会启动后台线程
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            if not app.config.get('ORDER_SWEEPER_ENABLED', True):
+                return
+            if fcntl is None:
+                app.logger.warning('order sweeper: file locks unavailable, use `flask expire-orders` instead')
+                return
+            thread = threading.Thread(target=self._run, args=(app,), name='order-sweeper', daemon=True)
+            thread.start()
+
+    def lock_path(self, app):
+        return sqlite_side_path(app, '-sweeper.lock', 'sweeper.lock')
+
+    def _is_leader(self, app):
+        if self._lock_file is not None:
+            return True
+        path = self.lock_path(app)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # 一直持有到进程退出
+        return True
+
+    def _run(self, app):
+        interval = app.config.get('ORDER_SWEEPER_INTERVAL', 60)
+        while True:
+            time.sleep(interval)
+            try:
+                if not self._is_leader(app):
+                    continue
+                with app.app_context():
+                    report = expire_stale_orders()
+                    purged = purge_order_changes()
+                if purged:
+                    app.logger.info(f"order sweeper: purged {purged} expired order change records")
+                if report['orders']:
+                    app.logger.info(
+                        f"order sweeper: cancelled {report['orders']} stale pending orders, "
+                        f"released {report['units']} units ({report['events']})"
+                    )
+            except Exception as e:
+                # 锁冲突等错误下一轮再试，不让线程退出
+                if not is_lock_error(e):
+                    app.logger.exception('order sweeper failed')
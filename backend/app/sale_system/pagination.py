@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, current_app
+from sqlalchemy import tuple_
+
+# --- 列表接口的游标 (keyset) 分页 ---
+# 游标记录上一页最后一行的排序键，例如订单的 (timestamp, id)，下一页用
+# WHERE (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT n
+# 直接从索引中定位，翻到多深都只读取 n 行，不像 OFFSET 那样越往后越慢。
+# 游标对客户端是不透明的字符串 (base64 编码的 JSON)，只能原样传回。
+#
+# 请求带 limit 或 cursor 参数时返回 {"items": [...], "next_cursor": "..."}，没有下一页时 next_cursor 为 null；
+# 两个参数都不带时保持旧的行为 (一次返回全部数据的数组)，供旧版客户端使用，
+# 配置 LEGACY_UNPAGINATED_LISTS=false 后改为返回第一页。
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(kind, values):
+    payload = json.dumps([kind, [v.isoformat() if isinstance(v, datetime) else v for v in values]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(kind, token, types):
+    """解析游标并按 types 转换每个值；游标无效或属于其他列表时抛出 CursorError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_kind, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_kind != kind or len(values) != len(types):
+            raise CursorError('cursor does not belong to this listing')
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(values, types)]
+    except CursorError:
+        raise
+    except (ValueError, TypeError):
+        raise CursorError('malformed cursor')
+
+
+def page_request():
+    """
+    读取分页参数。返回 None 表示使用旧的不分页行为，否则返回 (limit, cursor)。
+    limit 不是正整数时抛出 CursorError。
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None and current_app.config.get('LEGACY_UNPAGINATED_LISTS', True):
+        return None
+    max_limit = current_app.config.get('PAGE_SIZE_MAX', 200)
+    if limit is None:
+        limit = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise CursorError('limit must be an integer')
+    if limit <= 0:
+        raise CursorError('limit must be positive')
+    return min(limit, max_limit), cursor
+
+
+def keyset_page(query, kind, key_columns, key_types, limit, cursor, descending=False):
+    """
+    对已经加好筛选条件的 query 按 key_columns 排序并取一页。
+    返回 (本页的行, next_cursor)；key_columns 必须能唯一确定一行 (最后一列通常是 id)。
+    """
+    if cursor:
+        after = decode_cursor(kind, cursor, key_types)
+        keys = tuple_(*key_columns)
+        query = query.filter(keys < tuple(after) if descending else keys > tuple(after))
+    order = [column.desc() if descending else column.asc() for column in key_columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(kind, [getattr(last, column.key) for column in key_columns])
+    return rows, next_cursor
@@ -1,18 +1,61 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from sqlalchemy.exc import IntegrityError
 from . import sale_bp
-from .. import db
-from ..models import Product, Event, MasterProduct
+from .. import db, snapshot_cache
+from ..models import Product, Event, MasterProduct, product_load_options
+from ..sqlite_profile import write_transaction
+from .read_models import ProductDTO, product_query
 from werkzeug.utils import secure_filename
-# ... get_products_for_event 函数保持不变，但其内部 to_dict() 的行为已改变 ...
+def _serialize_menu(event_id):
+    # 【修改】商品与主商品信息一次查询取出需要的列，不加载 ORM 对象 (见 read_models.py)
+    rows = product_query().filter(Product.event_id == event_id).order_by(Product.id).all()
+    return [ProductDTO(row) for row in rows]
+
+
+def _menu_delta(event, since_version):
+    """
+    库存增量：只返回 since_version 之后 current_stock 变化过的商品 {id, current_stock}。
+    如果这期间商品阵容变了 (增删商品、改价等)，增量无法表达，返回完整菜单 (full=True)。
+    """
+    if since_version < event.lineup_version or since_version > event.menu_version:
+        return jsonify(version=event.menu_version, full=True, products=_serialize_menu(event.id))
+
+    rows = db.session.query(Product.id, Product.initial_stock, Product.sold_quantity)\
+        .filter(Product.event_id == event.id, Product.stock_version > since_version)\
+        .order_by(Product.id).all()
+    return jsonify(
+        version=event.menu_version,
+        full=False,
+        products=[{'id': pid, 'current_stock': initial - sold} for pid, initial, sold in rows]
+    )
+
+
+# API: 获取展会的商品列表 (顾客菜单)
+# 路径: GET /sale/api/events/<int:event_id>/products
+# 【新增】完整列表按菜单版本缓存并带 ETag，版本号在 X-Menu-Version 响应头中；
+# 带 ?since_version=<版本号> 时只返回之后库存变化过的商品，用于刷新售罄状态
 @sale_bp.route('/api/events/<int:event_id>/products', methods=['GET'])
 def get_products_for_event(event_id):
     event = Event.query.get_or_404(event_id)
-    products = event.products
-    return jsonify([product.to_dict() for product in products]), 200
+    since_version = request.args.get('since_version', type=int)
+    if since_version is not None:
+        return _menu_delta(event, since_version), 200
+
+    etag = f"menu-{event.id}-{event.menu_version}"
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = snapshot_cache.json_response(
+            'event_menu', event.id, event.menu_version, lambda: _serialize_menu(event.id)
+        )
+    response.set_etag(etag)
+    response.headers['X-Menu-Version'] = str(event.menu_version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # API: 通过编号为展会添加商品 (逻辑完全重写)
 @sale_bp.route('/api/events/<int:event_id>/products', methods=['POST'])
+@write_transaction
 def add_product_to_event(event_id):
     event = Event.query.get_or_404(event_id)
     data = request.get_json()
@@ -38,6 +81,7 @@ def add_product_to_event(event_id):
             price=float(data.get('price', master_product.default_price))
         )
         db.session.add(new_product)
+        Event.bump_data_version(event.id, lineup=True)
         db.session.commit()
         return jsonify(new_product.to_dict()), 201
     except IntegrityError:
@@ -46,16 +90,152 @@ def add_product_to_event(event_id):
     except (ValueError, TypeError):
         return jsonify(error="Invalid data type for price or initial_stock."), 400
 
+# 【新增】批量上架：一次请求添加多个商品，或从其他展会复制商品阵容
+BULK_ADD_MAX_ROWS = 1000
+
+
+def _bulk_add_products(event, rows):
+    """
+    把 rows ([{product_code, initial_stock, price(可选)}]) 添加到展会，在当前事务内完成，调用方负责 commit。
+    所有编号用一次查询解析，该展会已有的商品用一次查询读出，新商品用一条批量 INSERT 写入；
+    有问题的行记入 conflicts 并跳过，不影响其他行。
+    返回 (新增的商品 id 列表, conflicts)，conflicts 中 reason 为
+    invalid (字段缺失或类型错误) / not_found / inactive / duplicate (本次请求中重复) / already_added。
+    """
+    codes = {
+        row.get('product_code') for row in rows
+        if isinstance(row, dict) and isinstance(row.get('product_code'), str)
+    }
+    masters = {
+        mp.product_code: mp
+        for mp in MasterProduct.query.filter(MasterProduct.product_code.in_(codes))
+    } if codes else {}
+    existing = {
+        master_product_id for (master_product_id,) in
+        db.session.query(Product.master_product_id).filter(Product.event_id == event.id)
+    }
+
+    conflicts = []
+    new_rows = []
+    seen = set()
+    for index, row in enumerate(rows):
+        code = row.get('product_code') if isinstance(row, dict) else None
+        reason = None
+        if not isinstance(code, str) or 'initial_stock' not in row:
+            reason = 'invalid'
+        elif code not in masters:
+            reason = 'not_found'
+        elif not masters[code].is_active:
+            reason = 'inactive'
+        elif code in seen:
+            reason = 'duplicate'
+        elif masters[code].id in existing:
+            reason = 'already_added'
+        else:
+            master_product = masters[code]
+            try:
+                values = {
+                    'event_id': event.id,
+                    'master_product_id': master_product.id,
+                    'initial_stock': int(row['initial_stock']),
+                    'price': float(row['price'] if row.get('price') is not None else master_product.default_price),
+                }
+            except (ValueError, TypeError):
+                reason = 'invalid'
+        if reason:
+            conflicts.append({
+                'index': index, 'product_code': code if isinstance(code, str) else None, 'reason': reason
+            })
+            continue
+        seen.add(code)
+        new_rows.append(values)
+
+    if not new_rows:
+        return [], conflicts
+    db.session.execute(db.insert(Product), new_rows)
+    Event.bump_data_version(event.id, lineup=True)
+    added_ids = [
+        product_id for (product_id,) in db.session.query(Product.id).filter(
+            Product.event_id == event.id,
+            Product.master_product_id.in_([values['master_product_id'] for values in new_rows])
+        ).order_by(Product.id)
+    ]
+    return added_ids, conflicts
+
+
+def _bulk_add_response(event, rows):
+    try:
+        added_ids, conflicts = _bulk_add_products(event, rows)
+        db.session.commit()
+    except IntegrityError:
+        # 正常情况下已在 _bulk_add_products 中排除，只有非 SQLite 数据库下的并发添加才会走到这里
+        db.session.rollback()
+        return jsonify(error="Some products were added to this event concurrently, please retry."), 409
+    products = Product.query.options(*product_load_options())\
+        .filter(Product.id.in_(added_ids)).order_by(Product.id).all() if added_ids else []
+    return jsonify(added=[p.to_dict() for p in products], conflicts=conflicts), 201 if products else 200
+
+
+# API: 批量为展会添加商品 (一次请求、一次提交)
+# 请求体: {"products": [{"product_code": "A01", "initial_stock": 10, "price": 500}, ...]}，price 可省略 (使用默认价格)
+# 响应: {"added": [展会商品...], "conflicts": [{"index": 行号, "product_code": ..., "reason": ...}]}
+@sale_bp.route('/api/events/<int:event_id>/products/bulk', methods=['POST'])
+@write_transaction
+def bulk_add_products_to_event(event_id):
+    event = Event.query.get_or_404(event_id)
+    data = request.get_json(silent=True) or {}
+    rows = data.get('products')
+    if not isinstance(rows, list) or not rows:
+        return jsonify(error="'products' must be a non-empty list."), 400
+    if len(rows) > BULK_ADD_MAX_ROWS:
+        return jsonify(error=f"At most {BULK_ADD_MAX_ROWS} products per request."), 400
+    return _bulk_add_response(event, rows)
+
+
+# API: 从其他展会复制商品阵容 (价格与初始库存沿用来源展会)
+# 请求体: {"source_event_id": 3, "stock_overrides": {"A01": 20, ...}}，stock_overrides 可省略
+# 响应与批量添加相同；本展会已有或已下架的商品记入 conflicts
+@sale_bp.route('/api/events/<int:event_id>/products/clone', methods=['POST'])
+@write_transaction
+def clone_products_from_event(event_id):
+    event = Event.query.get_or_404(event_id)
+    data = request.get_json(silent=True) or {}
+    source_event_id = data.get('source_event_id')
+    overrides = data.get('stock_overrides') or {}
+    if type(source_event_id) is not int or not isinstance(overrides, dict):
+        return jsonify(error="'source_event_id' must be an integer and 'stock_overrides' an object."), 400
+    if source_event_id == event.id:
+        return jsonify(error="Cannot clone an event's products into itself."), 400
+    Event.query.get_or_404(source_event_id)
+
+    lineup = db.session.query(MasterProduct.product_code, Product.initial_stock, Product.price)\
+        .join(Product, Product.master_product_id == MasterProduct.id)\
+        .filter(Product.event_id == source_event_id)\
+        .order_by(Product.id).all()
+    rows = [
+        {'product_code': code, 'initial_stock': overrides.get(code, initial_stock), 'price': price}
+        for code, initial_stock, price in lineup
+    ]
+    if not rows:
+        return jsonify(added=[], conflicts=[]), 200
+    return _bulk_add_response(event, rows)
+
 # API: 更新展会商品的库存或价格 (逻辑简化)
 @sale_bp.route('/api/products/<int:product_id>', methods=['PUT'])
+@write_transaction
 def update_product(product_id):
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
     try:
+        # 先递增展会版本，下面的 stock_version 才能取到新版本号
+        # 改价属于商品阵容变化，顾客端需要重新拉取完整菜单
+        Event.bump_data_version(product.event_id, menu=True, lineup='price' in data)
         if 'price' in data:
             product.price = float(data['price'])
         if 'initial_stock' in data:
             product.initial_stock = int(data['initial_stock'])
+            # 初始库存变化会改变 current_stock，记录到库存增量里
+            product.stock_version = Product.event_data_version()
         db.session.commit()
         return jsonify(product.to_dict()), 200
     except (ValueError, TypeError):
@@ -63,8 +243,10 @@ def update_product(product_id):
 
 # ... delete_product 函数保持不变 ...
 @sale_bp.route('/api/products/<int:product_id>', methods=['DELETE'])
+@write_transaction
 def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
+    Event.bump_data_version(product.event_id, lineup=True)
     db.session.commit()
     return '', 204
\ No newline at end of file
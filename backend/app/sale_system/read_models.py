@@ -0,0 +1,159 @@
+from collections import defaultdict
+from .. import db
+from ..models import Event, MasterProduct, Product, Order, OrderItem
+
+# --- 只读列表接口的轻量 DTO ---
+# 订单、商品、主商品、展会列表原来加载完整的 ORM 对象，只为了调用 to_dict()：
+# 每一行都要进 identity map、建立属性追踪，数据量大时这部分占了大部分 CPU。
+# 这里只查询需要的列 (结果是元组形式的 Row)，装进带 __slots__ 的小对象，
+# 由 FastJSONProvider 直接编码 (见 app/json_provider.py)。
+# 每个 DTO 的 to_dict() 与对应模型的 to_dict() 输出相同，改动模型的 to_dict() 时这里要一起改。
+# 写接口仍然使用 ORM 对象。
+
+IN_CHUNK_SIZE = 500  # 与 selectinload 相同，避免超过 SQLite 的参数个数上限
+
+
+class EventDTO:
+    __slots__ = ('id', 'name', 'date', 'location', 'status', 'qrcode_url', 'pending_order_ttl_minutes')
+    columns = (Event.id, Event.name, Event.date, Event.location, Event.status, Event.qrcode_url,
+               Event.pending_order_ttl_minutes)
+
+    def __init__(self, row):
+        (self.id, self.name, self.date, self.location, self.status, self.qrcode_url,
+         self.pending_order_ttl_minutes) = row
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'date': self.date.isoformat(),
+            'location': self.location,
+            'status': self.status,
+            'qrcode_url': self.qrcode_url,
+            'pending_order_ttl_minutes': self.pending_order_ttl_minutes
+        }
+
+
+class MasterProductDTO:
+    __slots__ = ('id', 'product_code', 'name', 'default_price', 'image_url', 'image_variants', 'is_active', 'category')
+    columns = (MasterProduct.id, MasterProduct.product_code, MasterProduct.name, MasterProduct.default_price,
+               MasterProduct.image_url, MasterProduct.image_variants, MasterProduct.is_active, MasterProduct.category)
+
+    def __init__(self, row):
+        (self.id, self.product_code, self.name, self.default_price, self.image_url, self.image_variants,
+         self.is_active, self.category) = row
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_code': self.product_code,
+            'name': self.name,
+            'default_price': self.default_price,
+            'image_url': self.image_url,
+            'image_variants': self.image_variants or {},
+            'is_active': self.is_active,
+            'category': self.category
+        }
+
+
+class ProductDTO:
+    __slots__ = ('id', 'master_product_id', 'product_code', 'name', 'price', 'initial_stock', 'sold_quantity',
+                 'image_url', 'image_variants', 'event_id', 'category')
+    columns = (Product.id, Product.master_product_id, MasterProduct.product_code, MasterProduct.name, Product.price,
+               Product.initial_stock, Product.sold_quantity, MasterProduct.image_url, MasterProduct.image_variants,
+               Product.event_id, MasterProduct.category)
+
+    def __init__(self, row):
+        (self.id, self.master_product_id, self.product_code, self.name, self.price, self.initial_stock,
+         self.sold_quantity, self.image_url, self.image_variants, self.event_id, self.category) = row
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'master_product_id': self.master_product_id,
+            'product_code': self.product_code,
+            'name': self.name,
+            'price': self.price,
+            'initial_stock': self.initial_stock,
+            'current_stock': self.initial_stock - (self.sold_quantity or 0),
+            'image_url': self.image_url,
+            'image_variants': self.image_variants or {},
+            'event_id': self.event_id,
+            'category': self.category
+        }
+
+
+class OrderItemDTO:
+    __slots__ = ('id', 'quantity', 'product_id', 'product_name', 'product_price', 'product_image_url')
+
+    def __init__(self, row):
+        (self.id, self.quantity, self.product_id, self.product_name, self.product_price,
+         self.product_image_url) = row
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'quantity': self.quantity,
+            'product_id': self.product_id,
+            'product_name': self.product_name,
+            'product_price': self.product_price,
+            'product_image_url': self.product_image_url
+        }
+
+
+class OrderDTO:
+    __slots__ = ('id', 'timestamp', 'updated_at', 'status', 'total_amount', 'event_id', 'items')
+    columns = (Order.id, Order.timestamp, Order.updated_at, Order.status, Order.total_amount, Order.event_id)
+
+    def __init__(self, row, items):
+        self.id, self.timestamp, self.updated_at, self.status, self.total_amount, self.event_id = row
+        self.items = items
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(),
+            'updated_at': (self.updated_at or self.timestamp).isoformat(),
+            'status': self.status,
+            'total_amount': self.total_amount,
+            'event_id': self.event_id,
+            'items': [item.to_dict() for item in self.items]
+        }
+
+
+def event_query():
+    return db.session.query(*EventDTO.columns)
+
+
+def master_product_query():
+    return db.session.query(*MasterProductDTO.columns)
+
+
+def product_query():
+    return db.session.query(*ProductDTO.columns)\
+        .join(MasterProduct, Product.master_product_id == MasterProduct.id)
+
+
+def order_query():
+    """订单列的查询 (Row 带 timestamp/id 属性，可以直接交给 keyset_page)，用 load_orders 转成 DTO"""
+    return db.session.query(*OrderDTO.columns)
+
+
+def load_orders(rows):
+    """
+    给订单行加上订单项 (每 IN_CHUNK_SIZE 个订单一条查询)，返回 OrderDTO 列表，订单顺序不变。
+    订单项按商品 id 排列，与 selectinload 走 (order_id, product_id, quantity) 覆盖索引得到的顺序一致。
+    """
+    items_by_order = defaultdict(list)
+    order_ids = [row.id for row in rows]
+    for start in range(0, len(order_ids), IN_CHUNK_SIZE):
+        item_rows = db.session.query(
+            OrderItem.order_id, OrderItem.id, OrderItem.quantity, OrderItem.product_id,
+            MasterProduct.name, Product.price, MasterProduct.image_url,
+        ).join(Product, OrderItem.product_id == Product.id)\
+         .join(MasterProduct, Product.master_product_id == MasterProduct.id)\
+         .filter(OrderItem.order_id.in_(order_ids[start:start + IN_CHUNK_SIZE]))\
+         .order_by(OrderItem.order_id, OrderItem.product_id)
+        for row in item_rows:
+            items_by_order[row[0]].append(OrderItemDTO(row[1:]))
+    return [OrderDTO(row, items_by_order.get(row.id, [])) for row in rows]
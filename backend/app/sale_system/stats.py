@@ -0,0 +1,88 @@
+from sqlalchemy import func, case
+from .. import db
+from ..models import Order, Product, MasterProduct
+
+# --- 统计数据计算 ---
+# 统计页面 (get_event_stats)、销售总结 (sales_summary) 和 Excel 导出共用这里的查询。
+# 每个商品的已售数量直接读取 Product.sold_quantity 计数器，
+# 所以无论订单有多少，一个展会的统计只需要两条 SQL：商品明细一条、订单汇总一条。
+
+
+def query_product_sales(event_id):
+    """展会所有商品的销售明细 (包括还没有卖出的商品)，按商品 id 排序"""
+    rows = db.session.query(
+        Product.id,
+        MasterProduct.product_code,
+        MasterProduct.name,
+        Product.price,
+        Product.initial_stock,
+        Product.sold_quantity,
+    ).join(MasterProduct, Product.master_product_id == MasterProduct.id)\
+     .filter(Product.event_id == event_id)\
+     .order_by(Product.id)\
+     .all()
+
+    return [
+        {
+            "product_id": product_id,
+            "product_code": code,
+            "name": name,
+            "price": price,
+            "initial_stock": initial_stock,
+            "sold_count": sold or 0,
+            "current_stock": initial_stock - (sold or 0),
+            "revenue": round((sold or 0) * price, 2),
+        }
+        for product_id, code, name, price, initial_stock, sold in rows
+    ]
+
+
+def query_order_summary(event_id):
+    """已完成订单的总营业额和订单数 (一条条件聚合查询)"""
+    completed = Order.status == 'completed'
+    total_revenue, completed_orders_count = db.session.query(
+        func.sum(case((completed, Order.total_amount), else_=0)),
+        func.count(case((completed, Order.id))),
+    ).filter(Order.event_id == event_id).one()
+    return float(total_revenue or 0.0), int(completed_orders_count or 0)
+
+
+def build_event_stats(event):
+    """组装 GET /events/<id>/stats 的响应数据"""
+    product_details = query_product_sales(event.id)
+    total_revenue, completed_orders_count = query_order_summary(event.id)
+    return {
+        "event_info": event.to_dict(),
+        "summary": {
+            "total_revenue": round(total_revenue, 2), # 保留两位小数
+            "completed_orders_count": completed_orders_count,
+            "total_items_sold": sum(p["sold_count"] for p in product_details)
+        },
+        "product_details": product_details
+    }
+
+
+def build_sales_summary(event):
+    """组装销售总结数据 (只包含有销量的商品，按商品名排序)，Excel 导出也使用它"""
+    summary_list = [
+        {
+            "product_code": p["product_code"],
+            "product_name": p["name"],
+            "unit_price": float(p["price"]),
+            "initial_stock": int(p["initial_stock"]),
+            "total_quantity": int(p["sold_count"]),
+            "total_revenue_per_item": p["revenue"],
+            "current_stock": p["current_stock"]
+        }
+        for p in query_product_sales(event.id) if p["sold_count"] > 0
+    ]
+    summary_list.sort(key=lambda item: item["product_name"])
+
+    total_revenue = sum(item['total_revenue_per_item'] for item in summary_list)
+    return {
+        "event_id": event.id,
+        "event_name": event.name,
+        "total_revenue": round(total_revenue, 2),
+        "summary": summary_list
+    }
+
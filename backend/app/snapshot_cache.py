@@ -0,0 +1,180 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import current_app, jsonify
+from .sqlite_profile import sqlite_side_path
+
+
+class SnapshotCache:
+    """
+    按 "数据版本" 缓存的响应快照，存放在一个独立的 SQLite 文件中，所有 gunicorn worker 共享。
+
+    每条缓存以 (namespace, key) 为主键，只保留最新的一个版本；读取时版本不一致即视为未命中。
+    超过 SNAPSHOT_CACHE_MAX_ENTRIES 条时按最近访问时间淘汰 (LRU)。
+    每个 namespace 的命中/未命中次数也记录在同一个文件里，可以用 `flask cache-stats` 查看。
+
+    命中时只读不写：访问时间和命中/未命中次数先记在进程内，
+    至多每 SNAPSHOT_CACHE_FLUSH_INTERVAL 秒合并写入一次 (与 /metrics 相同的做法)，
+    所以淘汰顺序和统计数字会有几秒的延迟。缓存文件出错 (锁等待超时、文件损坏等) 时按未命中处理。
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self.max_entries = 256
+        self.enabled = True
+        self.flush_interval = 5.0
+        self._accessed = {}  # {(namespace, key): 最近一次命中的时间}
+        self._counts = defaultdict(int)  # {(namespace, 'hits' | 'misses'): 次数}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SNAPSHOT_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('SNAPSHOT_CACHE_MAX_ENTRIES', 256)
+        self.flush_interval = app.config.get('SNAPSHOT_CACHE_FLUSH_INTERVAL', 5.0)
+        self.path = app.config.get('SNAPSHOT_CACHE_PATH') or sqlite_side_path(app, '-snapshots', 'snapshots.db')
+        app.extensions['snapshot_cache'] = self
+        atexit.register(self.flush)
+        if self.enabled:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS entries ('
+                    ' namespace TEXT NOT NULL, key TEXT NOT NULL, version INTEGER NOT NULL,'
+                    ' payload BLOB NOT NULL, last_access REAL NOT NULL,'
+                    ' PRIMARY KEY (namespace, key))'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS counters ('
+                    ' namespace TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0,'
+                    ' misses INTEGER NOT NULL DEFAULT 0)'
+                )
+
+    @contextmanager
+    def _connect(self):
+        """
+        本线程的缓存文件连接，块结束时提交 (出错时回滚)。
+        连接按线程复用，省去每次打开文件、解析表结构 (fork 之后或换了路径时重新打开)；出错时丢弃连接。
+        """
+        local = self._local
+        if getattr(local, 'conn', None) is None or local.key != (os.getpid(), self.path):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            local.conn = sqlite3.connect(self.path, timeout=5)
+            local.key = (os.getpid(), self.path)
+        conn = local.conn
+        try:
+            with conn:
+                yield conn
+        except sqlite3.Error:
+            local.conn = None
+            conn.close()
+            raise
+
+    def _record(self, namespace, key, hit):
+        with self._lock:
+            self._counts[(namespace, 'hits' if hit else 'misses')] += 1
+            if hit:
+                self._accessed[(namespace, key)] = time.time()
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把本进程累计的访问时间和命中/未命中次数写入缓存文件"""
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+            counts, self._counts = self._counts, defaultdict(int)
+            self._last_flush = time.monotonic()
+        if not self.enabled or not (accessed or counts):
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    'UPDATE entries SET last_access = max(last_access, ?) WHERE namespace = ? AND key = ?',
+                    [(accessed_at, namespace, key) for (namespace, key), accessed_at in accessed.items()]
+                )
+                for column in ('hits', 'misses'):
+                    conn.executemany(
+                        f'INSERT INTO counters (namespace, {column}) VALUES (?, ?) '
+                        f'ON CONFLICT(namespace) DO UPDATE SET {column} = {column} + excluded.{column}',
+                        [(namespace, n) for (namespace, name), n in counts.items() if name == column]
+                    )
+        except sqlite3.Error:
+            # 写入失败时放回去，下次再写
+            with self._lock:
+                for entry, accessed_at in accessed.items():
+                    self._accessed[entry] = max(accessed_at, self._accessed.get(entry, 0))
+                for entry, n in counts.items():
+                    self._counts[entry] += n
+
+    def get(self, namespace, key, version):
+        """返回缓存的 payload (bytes)；不存在或版本不一致时返回 None。只读，不修改缓存文件"""
+        if not self.enabled:
+            return None
+        key = str(key)
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT version, payload FROM entries WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+        hit = row is not None and row[0] == version
+        self._record(namespace, key, hit)
+        return bytes(row[1]) if hit else None
+
+    def put(self, namespace, key, version, payload):
+        """写入 (覆盖) 一条缓存，并淘汰超出上限的最久未访问条目"""
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, version, payload, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (namespace, str(key), version, payload, time.time())
+            )
+            conn.execute(
+                'DELETE FROM entries WHERE rowid IN ('
+                ' SELECT rowid FROM entries ORDER BY last_access ASC'
+                ' LIMIT max(0, (SELECT count(*) FROM entries) - ?))',
+                (self.max_entries,)
+            )
+
+    def json_response(self, namespace, key, version, build):
+        """
+        返回 JSON 响应：版本命中时直接返回缓存的字节，否则调用 build() 生成数据、缓存后返回。
+        缓存的是 jsonify 的输出，所以命中与未命中时的响应内容完全一致。
+        读写缓存文件出错时记录警告，直接返回 build() 的结果。
+        """
+        try:
+            payload = self.get(namespace, key, version)
+        except sqlite3.Error as e:
+            current_app.logger.warning(f"snapshot cache read failed ({namespace}/{key}): {e}")
+            payload = None
+        if payload is None:
+            payload = jsonify(build()).get_data()
+            try:
+                self.put(namespace, key, version, payload)
+            except sqlite3.Error as e:
+                current_app.logger.warning(f"snapshot cache write failed ({namespace}/{key}): {e}")
+        return current_app.response_class(payload, mimetype=current_app.json.mimetype)
+
+    def stats(self):
+        """各 namespace 的命中/未命中次数和当前条目数"""
+        if not self.enabled:
+            return {}
+        self.flush()
+        with self._connect() as conn:
+            result = {
+                namespace: {'hits': hits, 'misses': misses, 'entries': 0}
+                for namespace, hits, misses in conn.execute('SELECT namespace, hits, misses FROM counters')
+            }
+            for namespace, entries in conn.execute('SELECT namespace, count(*) FROM entries GROUP BY namespace'):
+                result.setdefault(namespace, {'hits': 0, 'misses': 0, 'entries': 0})['entries'] = entries
+        return result
@@ -0,0 +1,139 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app, jsonify
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# --- SQLite 生产配置 ---
+# 多个 gunicorn worker 共用一个 SQLite 文件，默认配置 (回滚日志 + 延迟事务) 下
+# 写请求之间、写请求与读请求之间都会互相阻塞，并发下单时出现 "database is locked"。
+# 这里在每个新连接上设置：
+#   journal_mode=WAL     读写互不阻塞 (读者读快照，写者追加日志)
+#   synchronous          WAL 模式下 NORMAL 即可保证一致性，只在检查点时 fsync
+#   busy_timeout         拿不到写锁时等待而不是立即报错
+#   cache_size/mmap_size 每个连接的页缓存与内存映射大小
+# 写接口用 @write_transaction 包装：事务以 BEGIN IMMEDIATE 开始，一开始就拿到写锁，
+# 避免 "先读后写" 的事务在升级写锁时因为快照过期直接失败 (这种失败 busy_timeout 也救不了)；
+# 仍然遇到锁冲突时回滚并有限次重试整个请求。
+
+LOCK_ERROR_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+_immediate_transaction = ContextVar('immediate_transaction', default=False)
+
+
+def configure_sqlite(app, engine):
+    """
+    给 SQLite 引擎注册连接钩子；其他数据库什么都不做。
+    事务由下面的 begin 钩子发出 BEGIN，这一点与 SQLITE_PROFILE_ENABLED 无关：
+    pysqlite 自己的隐式事务处理下，session.begin_nested() 的 SAVEPOINT 会自己开启事务，
+    RELEASE 时直接提交到磁盘，外层事务的回滚就撤销不了 (库存预留依赖 SAVEPOINT，见 inventory.reserve_stock)。
+    关闭 SQLITE_PROFILE_ENABLED 时只是不设置下面的 PRAGMA、写接口也不使用 BEGIN IMMEDIATE。
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    profile_enabled = app.config.get('SQLITE_PROFILE_ENABLED', True)
+    in_memory = engine.url.database in (None, '', ':memory:')
+    pragmas = {
+        'busy_timeout': app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'synchronous': app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': -int(app.config.get('SQLITE_CACHE_SIZE_KB', 20000)),  # 负数表示 KiB
+        'mmap_size': app.config.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        # 关闭 pysqlite 自己的隐式 BEGIN，改由下面的 begin 钩子发出，才能选择 BEGIN IMMEDIATE
+        dbapi_connection.isolation_level = None
+        if not profile_enabled:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            if not in_memory:
+                cursor.execute('PRAGMA journal_mode=WAL')
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(conn):
+        immediate = profile_enabled and _immediate_transaction.get()
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    # 提交之后 (例如序列化响应时重新加载属性) 开始的事务只读，不需要再占用写锁
+    _immediate_transaction.set(False)
+
+
+def sqlite_side_path(app, suffix, fallback_name):
+    """
+    与 SQLite 数据库文件放在一起的附属文件 (指标库、快照缓存、清理任务的锁文件) 的路径。
+    放在数据库文件旁边，这样不同数据库 (例如压测用的临时库) 不会共用；
+    非文件型数据库 (内存库或其他数据库) 退回到 instance 目录下的 fallback_name。
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:':
+        return uri[len('sqlite:///'):] + suffix
+    return os.path.join(app.instance_path, fallback_name)
+
+
+def is_lock_error(error):
+    """是否是 SQLite 的锁冲突错误 (可以重试)"""
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(error.orig if error.orig is not None else error).lower()
+    return any(text in message for text in LOCK_ERROR_MESSAGES)
+
+
+@contextmanager
+def immediate_transactions():
+    """
+    with 块内开始的事务以 BEGIN IMMEDIATE 开始 (每次提交后需要重新进入)。
+    用于不在请求内、或一个请求要分多次提交的批处理任务；普通写接口用 @write_transaction。
+    """
+    token = _immediate_transaction.set(True)
+    try:
+        yield
+    finally:
+        _immediate_transaction.reset(token)
+
+
+def write_transaction(view):
+    """
+    写接口装饰器：请求内的事务以 BEGIN IMMEDIATE 开始；遇到锁冲突时回滚，
+    等待一小段随机退避后重新执行整个视图函数，最多 SQLITE_WRITE_RETRIES 次，仍失败时返回 503。
+    被包装的视图在数据库之外不能有副作用 (例如写文件)，否则重试会重复执行。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from . import db
+
+        retries = current_app.config.get('SQLITE_WRITE_RETRIES', 3)
+        token = _immediate_transaction.set(True)
+        try:
+            for attempt in range(retries + 1):
+                _immediate_transaction.set(True)
+                try:
+                    return view(*args, **kwargs)
+                except OperationalError as e:
+                    db.session.rollback()
+                    if not is_lock_error(e):
+                        raise
+                    if attempt == retries:
+                        current_app.logger.warning(f"{view.__name__}: database still locked after {retries} retries")
+                        response = jsonify(error="The database is busy, please retry.")
+                        response.status_code = 503
+                        response.headers['Retry-After'] = '1'
+                        return response
+                    time.sleep(0.05 * (2 ** attempt) * (0.5 + random.random()))
+        finally:
+            _immediate_transaction.reset(token)
+    return wrapper
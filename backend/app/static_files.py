@@ -0,0 +1,76 @@
+import hashlib
+import mimetypes
+import os
+from functools import lru_cache
+from urllib.parse import urlsplit
+from flask import current_app, request, send_file, abort
+from werkzeug.security import safe_join
+
+# --- 上传文件的缓存友好服务 ---
+# 数据库中保存的上传文件地址带有内容摘要：/static/uploads/products/xxx.webp?v=<摘要>。
+# 文件内容变化时地址随之变化，所以带有正确摘要的请求可以被浏览器永久缓存 (Cache-Control: immutable)，
+# 平板刷新页面时不会再发出任何请求；不带摘要 (或摘要不匹配) 的旧地址每次用强 ETag 协商，未变化时返回 304。
+# 配置 STATIC_ACCEL_REDIRECT_PREFIX 后只返回 X-Accel-Redirect 头，由 nginx 发送文件内容。
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+DIGEST_LENGTH = 12
+
+
+@lru_cache(maxsize=4096)
+def _digest(path, mtime_ns, size):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(64 * 1024):
+            sha.update(chunk)
+    return sha.hexdigest()[:DIGEST_LENGTH]
+
+
+def file_digest(path):
+    """文件内容的短摘要；按 (路径, 修改时间, 大小) 缓存，文件不变时不会重复读取"""
+    stat = os.stat(path)
+    return _digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def path_for_static_url(url):
+    """把 /static/... 地址 (可以带 ?v=) 转换为 STATIC_FOLDER 下的文件路径"""
+    relative = urlsplit(url).path.split('/static/', 1)[-1]
+    return os.path.join(current_app.config['STATIC_FOLDER'], relative)
+
+
+def versioned_url(url):
+    """给 /static/... 地址加上 (或更新) 内容摘要参数；文件不存在时原样返回"""
+    if not url or not url.startswith('/static/'):
+        return url
+    path = path_for_static_url(url)
+    if not os.path.isfile(path):
+        return url
+    return f"{urlsplit(url).path}?v={file_digest(path)}"
+
+
+def serve_static(directory, filename):
+    """发送 directory 下的文件，按请求中的摘要决定缓存策略"""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    digest = file_digest(path)
+    etag = f'"{digest}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if request.args.get('v') == digest else REVALIDATE_CACHE_CONTROL
+
+    if request.if_none_match.contains(digest):
+        response = current_app.response_class(status=304)
+    elif current_app.config.get('STATIC_ACCEL_REDIRECT_PREFIX'):
+        # nginx 的 internal location 按这个路径找到同一个文件并发送，gunicorn 只返回响应头
+        relative = os.path.relpath(path, current_app.config['STATIC_FOLDER']).replace(os.sep, '/')
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = current_app.config['STATIC_ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + relative
+    else:
+        response = send_file(path, etag=False, conditional=True)
+
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    return response
+
@@ -0,0 +1,26 @@
+import importlib
+import time
+
+# 只在少数接口中使用、延迟导入的重量级依赖
+# (Excel 导出用 openpyxl，图片上传用 PIL)
+HEAVY_MODULES = (
+    'openpyxl',
+    'openpyxl.styles',
+    'openpyxl.utils',
+    'PIL.Image',
+)
+
+
+def preload_heavy_modules(app):
+    """
+    预先导入重量级依赖，避免第一次导出 Excel / 上传图片的请求变慢。
+    由 Config.PRELOAD_HEAVY_MODULES 控制，生产环境配合 gunicorn --preload 使用时，
+    这些模块只在 master 进程导入一次，各 worker fork 后共享。
+    """
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            app.logger.warning(f'Preload of {name} failed: {e}')
+    app.logger.info(f'Heavy modules preloaded in {(time.perf_counter() - started) * 1000:.0f} ms')
@@ -0,0 +1,358 @@
+"""
+接口基准测试：用 fixtures.py 按几种规模生成数据，通过 Flask test client 逐个请求 /sale/api 下的接口，
+记录每个接口的耗时 (p50 / p95 / 最小值)、执行的 SQL 语句数和 Python 内存分配峰值 (tracemalloc，不含 SQLite 自身)，
+结果保存为 JSON，可以与之前的结果对比，判断一次修改让哪些接口变快或变慢。
+
+  - 每个接口先请求一次预热 (不计入结果)，再重复 --repeat 次
+  - 统计快照缓存默认关闭，读接口的每次请求都落到数据库；--with-cache 打开
+  - 销售总结 Excel 每次请求前清空导出缓存，测量的是生成而不是读缓存
+  - 写接口需要的数据 (待处理订单、新展会等) 在计时之外准备
+  - 订单推送 (SSE 长连接) 不在测试范围内
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/endpoints.py --scales small,medium --output before.json
+    python benchmarks/endpoints.py --scales small,medium --output after.json --baseline before.json
+    python benchmarks/endpoints.py --compare before.json after.json    # 只对比两个结果文件
+    python benchmarks/endpoints.py --scales small --only orders          # 只测路径中包含 orders 的接口
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fixtures import generate  # noqa: E402
+
+# 每种规模：展会数 (第一个进行中，其余已结束)、每个展会的商品数和订单数、主商品数
+SCALES = {
+    'small': {'events': 3, 'products': 30, 'orders': 300, 'catalogue': 200},
+    'medium': {'events': 3, 'products': 150, 'orders': 3000, 'catalogue': 2000},
+    'large': {'events': 3, 'products': 300, 'orders': 20000, 'catalogue': 8000},
+}
+# 对比时 p50 变化超过这个比例、且绝对值超过 CHANGE_MIN_MS 才标记 (亚毫秒级的接口抖动很大)
+CHANGE_THRESHOLD = 0.2
+CHANGE_MIN_MS = 1.0
+
+
+class Context:
+    """一个规模下的测试环境，准备写接口需要的数据 (在计时之外调用)"""
+
+    def __init__(self, app, fixture, seed=0):
+        self.app = app
+        self.client = app.test_client()
+        self.event_id = fixture['event_ids'][0]
+        self.past_event_id = fixture['event_ids'][-1]
+        self.product_ids = fixture['product_ids'][self.event_id]
+        self.master_product_ids = fixture['master_product_ids']
+        self.rng = random.Random(seed)
+        self.counter = 0
+        # 重复下单会消耗库存，给当前展会的商品补足库存，保证下单接口不会因为售罄而失败
+        from app import db
+        from app.models import Product
+        with app.app_context():
+            Product.query.filter_by(event_id=self.event_id)\
+                .update({Product.initial_stock: Product.initial_stock + 100000}, synchronize_session=False)
+            db.session.commit()
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{os.getpid()}-{self.counter}'
+
+    def order_items(self):
+        return [{'product_id': pid, 'quantity': 1} for pid in self.rng.sample(self.product_ids, 2)]
+
+    def pending_orders(self, n):
+        ids = []
+        for _ in range(n):
+            response = self.client.post(f'/sale/api/events/{self.event_id}/orders', json={'items': self.order_items()})
+            ids.append(response.get_json()['id'])
+        return ids
+
+    def latest_order_id(self):
+        from app.models import Order
+        with self.app.app_context():
+            return Order.query.filter_by(event_id=self.event_id).order_by(Order.id.desc()).first().id
+
+    def empty_event(self):
+        response = self.client.post('/sale/api/events', data={'name': self.unique('bench'), 'date': date.today().isoformat()})
+        return response.get_json()['id']
+
+    def master_codes(self, n, in_event=False):
+        """n 个已上架的主商品编号；in_event=False 时只选当前展会还没有上架的"""
+        from app import db
+        from app.models import MasterProduct, Product
+        with self.app.app_context():
+            used = db.session.query(Product.master_product_id).filter(Product.event_id == self.event_id)
+            query = db.session.query(MasterProduct.product_code).filter(MasterProduct.is_active.is_(True))
+            query = query.filter(MasterProduct.id.in_(used) if in_event else MasterProduct.id.notin_(used))
+            codes = [code for (code,) in query.limit(n)]
+            db.session.remove()
+        return codes
+
+    def new_product(self):
+        code = self.master_codes(1)[0]
+        response = self.client.post(f'/sale/api/events/{self.event_id}/products', json={'product_code': code, 'initial_stock': 10})
+        return response.get_json()['id']
+
+    def used_master_id(self):
+        from app import db
+        from app.models import Product
+        with self.app.app_context():
+            return db.session.get(Product, self.product_ids[0]).master_product_id
+
+    def menu_version(self):
+        return int(self.client.get(f'/sale/api/events/{self.event_id}/products').headers['X-Menu-Version'])
+
+    def clear_export_cache(self):
+        shutil.rmtree(self.app.config['EXPORT_CACHE_FOLDER'], ignore_errors=True)
+
+    def catalogue_csv(self, n):
+        codes = self.master_codes(n // 2, in_event=True)
+        lines = ['product_code,name,default_price']
+        lines += [f'{code},改名{self.counter},{500 + self.counter % 7}' for code in codes]
+        lines += [f'{self.unique("IMPORT")},导入商品,800' for _ in range(n - len(codes))]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# (方法, 路径模板, 准备函数)。准备函数在计时之外调用，返回 (路径参数, 请求参数)
+def _none(ctx):
+    return {}, {}
+
+
+def _without_export_cache(ctx):
+    ctx.clear_export_cache()
+    return {}, {}
+
+
+CASES = [
+    ('POST', '/sale/api/auth/login', lambda ctx: ({}, {'json': {'role': 'admin', 'password': ctx.app.config['ADMIN_PASSWORD']}})),
+    ('GET', '/sale/api/events', _none),
+    ('GET', '/sale/api/events/{event_id}', _none),
+    ('POST', '/sale/api/events', lambda ctx: ({}, {'data': {'name': ctx.unique('event'), 'date': date.today().isoformat()}})),
+    ('PUT', '/sale/api/events/{event_id}/status', lambda ctx: ({}, {'json': {'status': '进行中'}})),
+    ('PUT', '/sale/api/events/{event_id}', lambda ctx: ({}, {'data': {'location': ctx.unique('hall')}})),
+    ('GET', '/sale/api/master-products?all=true', _none),
+    ('GET', '/sale/api/master-products?limit=50', _none),
+    ('POST', '/sale/api/master-products', lambda ctx: ({}, {'data': {
+        'product_code': ctx.unique('MP'), 'name': '基准商品', 'default_price': '500', 'category': '徽章'}})),
+    ('PUT', '/sale/api/master-products/{mp_id}', lambda ctx: ({'mp_id': ctx.used_master_id()}, {'data': {'name': ctx.unique('name')}})),
+    ('PUT', '/sale/api/master-products/{mp_id}/status', lambda ctx: ({'mp_id': ctx.used_master_id()}, {'json': {'is_active': True}})),
+    ('POST', '/sale/api/master-products/import', lambda ctx: ({}, {'data': {
+        'file': (io.BytesIO(ctx.catalogue_csv(100)), 'catalogue.csv')}})),
+    ('GET', '/sale/api/events/{event_id}/orders', _none),
+    ('GET', '/sale/api/events/{event_id}/orders?status=pending', _none),
+    ('GET', '/sale/api/events/{event_id}/orders?limit=50', _none),
+    ('GET', '/sale/api/events/{event_id}/orders?since_id={since_id}', lambda ctx: ({'since_id': ctx.latest_order_id() - 20}, {})),
+    ('POST', '/sale/api/events/{event_id}/orders', lambda ctx: ({}, {'json': {'items': ctx.order_items()}})),
+    ('PUT', '/sale/api/events/{event_id}/orders/{order_id}/status', lambda ctx: (
+        {'order_id': ctx.pending_orders(1)[0]}, {'json': {'status': 'completed'}})),
+    ('PATCH', '/sale/api/events/{event_id}/orders/status', lambda ctx: ({}, {'json': {'transitions': [
+        {'order_id': order_id, 'status': 'completed'} for order_id in ctx.pending_orders(20)]}})),
+    ('GET', '/sale/api/events/{event_id}/sales_summary', _none),
+    ('GET', '/sale/api/events/{event_id}/sales_summary/download', _without_export_cache),
+    ('GET', '/sale/api/events/sales_summary/export?status=已结束', _without_export_cache),
+    ('GET', '/sale/api/events/{event_id}/products', _none),
+    ('GET', '/sale/api/events/{event_id}/products?since_version={version}', lambda ctx: ({'version': ctx.menu_version() - 1}, {})),
+    ('POST', '/sale/api/events/{event_id}/products', lambda ctx: ({}, {'json': {
+        'product_code': ctx.master_codes(1)[0], 'initial_stock': 10}})),
+    ('POST', '/sale/api/events/{target_id}/products/bulk', lambda ctx: ({'target_id': ctx.empty_event()}, {'json': {'products': [
+        {'product_code': code, 'initial_stock': 20} for code in ctx.master_codes(50, in_event=True)]}})),
+    ('POST', '/sale/api/events/{target_id}/products/clone', lambda ctx: (
+        {'target_id': ctx.empty_event()}, {'json': {'source_event_id': ctx.event_id}})),
+    ('PUT', '/sale/api/products/{product_id}', lambda ctx: ({'product_id': ctx.product_ids[0]}, {'json': {'price': 500}})),
+    ('DELETE', '/sale/api/products/{product_id}', lambda ctx: ({'product_id': ctx.new_product()}, {})),
+    ('GET', '/sale/api/events/{event_id}/stats', _none),
+]
+
+
+def _make_app(workdir, with_cache):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        DEBUG = True  # 不写 app/logs
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        STATIC_FOLDER = os.path.join(workdir, 'static')
+        UPLOAD_FOLDER = os.path.join(workdir, 'static', 'uploads')
+        EXPORT_CACHE_FOLDER = os.path.join(workdir, 'exports')
+        SNAPSHOT_CACHE_ENABLED = with_cache
+        SNAPSHOT_CACHE_PATH = os.path.join(workdir, 'snapshots')
+        IMPORT_IMAGE_WORKERS = 0
+        ORDER_SWEEPER_ENABLED = False  # 合成数据的待处理订单都是 "过期" 的
+
+    app = create_app(BenchConfig)
+    app.logger.disabled = True
+    return app
+
+
+def _run_case(ctx, engine, method, path, prepare, repeat):
+    """预热一次后重复 repeat 次，再在 tracemalloc 下执行一次测量内存峰值"""
+    statements = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    def request_once():
+        path_args, kwargs = prepare(ctx)
+        url = path.format(event_id=ctx.event_id, **path_args)
+        statements[0] = 0
+        started = time.perf_counter()
+        response = ctx.client.open(url, method=method, **kwargs)
+        body = response.get_data()  # 流式响应在读取时才真正生成
+        elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code, elapsed, statements[0], len(body)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        request_once()
+        runs = [request_once() for _ in range(repeat)]
+        tracemalloc.start()
+        try:
+            request_once()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    latencies = sorted(run[1] for run in runs)
+    return {
+        'status': runs[-1][0],
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[max(0, int(len(latencies) * 0.95 + 0.5) - 1)], 2),
+        'min_ms': round(latencies[0], 2),
+        'statements': int(statistics.median(run[2] for run in runs)),
+        'response_bytes': runs[-1][3],
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_scale(name, repeat, with_cache, only):
+    from app import db
+
+    workdir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+    try:
+        app = _make_app(workdir, with_cache)
+        started = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+            fixture = generate(db, **SCALES[name])
+            engine = db.engine
+        print(f"[{name}] 生成数据 {time.perf_counter() - started:.1f}s: {SCALES[name]}", file=sys.stderr)
+
+        ctx = Context(app, fixture)
+        results = {}
+        for method, path, prepare in CASES:
+            key = f'{method} {path}'
+            if only and only not in path:
+                continue
+            results[key] = _run_case(ctx, engine, method, path, prepare, repeat)
+            r = results[key]
+            print(f"[{name}] {key:<70}{r['p50_ms']:>9.1f} ms {r['statements']:>5} SQL  {r['status']}", file=sys.stderr)
+        return {'params': SCALES[name], 'endpoints': results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _metadata(repeat, with_cache):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'snapshot_cache': with_cache,
+    }
+
+
+def compare(base, current):
+    """打印两次结果中共同的规模和接口：p50 耗时、SQL 语句数、内存峰值的变化"""
+    print(f"基准: {base['meta'].get('git_commit')} ({base['meta']['created_at']})  "
+          f"当前: {current['meta'].get('git_commit')} ({current['meta']['created_at']})")
+    print(f"{'规模':<8}{'接口':<70}{'p50 ms':>18}{'SQL':>12}{'峰值 KB':>20}")
+    for scale, data in current['scales'].items():
+        base_endpoints = base['scales'].get(scale, {}).get('endpoints', {})
+        for key, r in data['endpoints'].items():
+            b = base_endpoints.get(key)
+            if not b:
+                continue
+            ratio = r['p50_ms'] / b['p50_ms'] if b['p50_ms'] else 1
+            mark = ''
+            if abs(r['p50_ms'] - b['p50_ms']) < CHANGE_MIN_MS:
+                pass
+            elif ratio > 1 + CHANGE_THRESHOLD:
+                mark = '  变慢'
+            elif ratio < 1 - CHANGE_THRESHOLD:
+                mark = '  变快'
+            if r['statements'] != b['statements']:
+                mark += '  SQL 数变化'
+            print(f"{scale:<8}{key:<70}{b['p50_ms']:>8.1f} -> {r['p50_ms']:<7.1f}"
+                  f"{b['statements']:>5} -> {r['statements']:<4}{b['peak_kb']:>9.0f} -> {r['peak_kb']:<8.0f}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='small,medium', help=f"逗号分隔的规模: {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=5, help='每个接口计时的次数 (不含预热)')
+    parser.add_argument('--with-cache', action='store_true', help='打开统计快照缓存')
+    parser.add_argument('--only', default=None, help='只测路径中包含该字符串的接口')
+    parser.add_argument('--output', default=None, help='把结果写入 JSON 文件')
+    parser.add_argument('--baseline', default=None, help='与之前保存的 JSON 结果对比')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'CURRENT'), help='只对比两个结果文件，不运行测试')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_base, open(args.compare[1]) as f_current:
+            compare(json.load(f_base), json.load(f_current))
+        return
+
+    scales = [name.strip() for name in args.scales.split(',') if name.strip()]
+    unknown = [name for name in scales if name not in SCALES]
+    if unknown:
+        parser.error(f"未知的规模: {', '.join(unknown)}")
+
+    report = {
+        'meta': _metadata(args.repeat, args.with_cache),
+        'scales': {name: run_scale(name, args.repeat, args.with_cache, args.only) for name in scales},
+    }
+    failed = [
+        f'{scale} {key}: {r["status"]}'
+        for scale, data in report['scales'].items() for key, r in data['endpoints'].items() if r['status'] >= 400
+    ]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'结果已写入 {args.output}', file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+    for failure in failed:
+        print(f'接口返回错误: {failure}', file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+列表接口 SQL 查询次数检查：在两种数据规模下请求每个列表接口，统计执行的 SQL 语句数。
+如果某个接口的语句数随数据行数增长 (说明 to_dict() 中出现了逐行懒加载，即 N+1 查询)，以非零状态退出。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/query_counts.py
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 需要检查的列表接口 ({event_id} 会被替换)
+ENDPOINTS = [
+    '/sale/api/events',
+    '/sale/api/events/{event_id}/orders',
+    '/sale/api/events/{event_id}/orders?status=pending',
+    '/sale/api/events/{event_id}/products',
+    '/sale/api/events/{event_id}/stats',
+    '/sale/api/events/{event_id}/sales_summary',
+    '/sale/api/master-products?all=true',
+]
+
+
+@contextmanager
+def count_statements(engine):
+    """统计 with 块内执行的 SQL 语句数，结果放在返回的列表的第一个元素里"""
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _seed(db, rows):
+    from app.models import Event, MasterProduct, Product, Order, OrderItem
+
+    event_ = Event(name=f'query-count-{rows}', date=date.today(), status='进行中')
+    db.session.add(event_)
+    db.session.flush()
+    products = []
+    for i in range(rows):
+        mp = MasterProduct(product_code=f'QC-{rows}-{i:04d}', name=f'商品{i}', default_price=10)
+        db.session.add(mp)
+        db.session.flush()
+        product = Product(event_id=event_.id, master_product_id=mp.id, price=10, initial_stock=1000)
+        db.session.add(product)
+        products.append(product)
+    db.session.flush()
+    for i in range(rows):
+        order = Order(event_id=event_.id, total_amount=20, status=('pending', 'completed', 'cancelled')[i % 3])
+        order.items.append(OrderItem(product_id=products[i].id, quantity=1))
+        order.items.append(OrderItem(product_id=products[(i + 1) % rows].id, quantity=1))
+        db.session.add(order)
+    db.session.commit()
+    return event_.id
+
+
+def measure(rows):
+    """返回 {接口: 语句数}，每个规模使用独立的临时数据库"""
+    from app import create_app, db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        event_id = _seed(db, rows)
+        engine = db.engine
+
+    client = app.test_client()
+    counts = {}
+    for endpoint in ENDPOINTS:
+        url = endpoint.format(event_id=event_id)
+        with count_statements(engine) as counter:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} 返回 {response.status_code}')
+        counts[endpoint] = counter[0]
+    return counts
+
+
+def main():
+    db_path = tempfile.mktemp(suffix='.db', prefix='query_counts_')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    try:
+        # 两个规模放在同一个数据库里，master-products 列表的行数也随之增加
+        small = measure(10)
+        large = measure(50)
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    failed = []
+    print(f"{'接口':<55}{'10 行':>8}{'50 行':>8}")
+    for endpoint in ENDPOINTS:
+        grows = large[endpoint] > small[endpoint]
+        if grows:
+            failed.append(endpoint)
+        print(f"{endpoint:<55}{small[endpoint]:>8}{large[endpoint]:>8}{'  <-- 随行数增长' if grows else ''}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+热点查询执行计划检查：请求 order_routes.py / stats_routes.py 中的热点接口 (以及订单、主商品列表的分页)，记录它们执行的每条 SQL，
+再对每条语句执行 EXPLAIN QUERY PLAN。任何一条语句出现对表的全表扫描 (SCAN <表>) 时以非零状态退出，
+用来防止删掉索引或改写查询后悄悄退化成全表扫描。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/query_plans.py            # 只输出有问题的语句
+    python benchmarks/query_plans.py --verbose  # 输出所有语句的执行计划
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from query_counts import _seed  # noqa: E402  (与查询次数检查使用同一份测试数据)
+
+SEED_ROWS = 50
+# SCAN <表> (可能带 USING INDEX) 表示逐行扫描整张表或整个索引；SEARCH 才是按索引定位
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+
+
+def _requests(event_id, product_id):
+    """(方法, 路径, JSON) 列表；订单相关的接口会先下单，保证后面的接口有数据可查"""
+    since = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+    return [
+        ('POST', f'/sale/api/events/{event_id}/orders', {'items': [{'product_id': product_id, 'quantity': 1}]}),
+        ('PUT', f'/sale/api/events/{event_id}/orders/{{order_id}}/status', {'status': 'completed'}),
+        ('PATCH', f'/sale/api/events/{event_id}/orders/status', {'transitions': [
+            {'order_id': 1, 'status': 'completed'}, {'order_id': 2, 'status': 'cancelled'},
+        ]}),
+        ('GET', f'/sale/api/events/{event_id}/orders', None),
+        ('GET', f'/sale/api/events/{event_id}/orders?status=pending', None),
+        ('GET', f'/sale/api/events/{event_id}/orders?since_id=1', None),
+        ('GET', f'/sale/api/events/{event_id}/orders?updated_since={since}', None),
+        ('GET', f'/sale/api/events/{event_id}/orders?limit=10', None),
+        ('GET', f'/sale/api/events/{event_id}/orders?limit=10&cursor={{orders_cursor}}', None),
+        ('GET', '/sale/api/master-products?limit=10', None),
+        ('GET', '/sale/api/master-products?limit=10&cursor={master_products_cursor}', None),
+        ('GET', f'/sale/api/events/{event_id}/stats', None),
+        ('GET', f'/sale/api/events/{event_id}/sales_summary', None),
+    ]
+
+
+def capture(app, engine, event_id, product_id):
+    """执行所有热点请求，返回 [(接口, 语句, 参数)]"""
+    from app import db
+    from app.sale_system.order_feed import _read_changes
+
+    captured = []
+    current = [None]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            captured.append((current[0], statement, parameters))
+
+    client = app.test_client()
+    ids = {'order_id': None, 'orders_cursor': None, 'master_products_cursor': None}
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for method, path, body in _requests(event_id, product_id):
+            path = path.format(**ids)
+            current[0] = f'{method} {path}'
+            response = client.open(path, method=method, json=body)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{method} {path} 返回 {response.status_code}')
+            if method == 'POST':
+                ids['order_id'] = response.get_json()['id']
+            elif 'limit=' in path and 'cursor=' not in path:
+                # 第一页的 next_cursor 用于请求第二页 (游标分页的定位查询)
+                listing = 'orders' if '/orders' in path else 'master_products'
+                ids[f'{listing}_cursor'] = response.get_json()['next_cursor']
+        # 订单推送 (SSE) 每次轮询执行的查询
+        current[0] = 'order stream poll'
+        with app.app_context():
+            _read_changes(event_id, 0)
+            db.session.remove()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='输出所有语句的执行计划')
+    args = parser.parse_args()
+
+    db_path = tempfile.mktemp(suffix='.db', prefix='query_plans_')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    try:
+        from app import create_app, db
+        from app.models import Product
+
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['SNAPSHOT_CACHE_ENABLED'] = False
+        with app.app_context():
+            db.create_all()
+            event_id = _seed(db, SEED_ROWS)
+            product_id = Product.query.filter_by(event_id=event_id).first().id
+            engine = db.engine
+
+        failures = 0
+        for endpoint, statement, parameters in capture(app, engine, event_id, product_id):
+            plan = explain(engine, statement, parameters)
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            failures += bool(scans)
+            if scans or args.verbose:
+                print(f"{'全表扫描' if scans else 'OK'}  [{endpoint}]")
+                print('    ' + ' '.join(statement.split())[:200])
+                for line in plan:
+                    print(f'      {line}')
+    finally:
+        for suffix in ('', '-wal', '-shm', '-snapshots'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    if failures:
+        print(f'{failures} 条热点语句使用了全表扫描')
+        sys.exit(1)
+    print('所有热点语句都使用了索引')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+列表接口序列化基准：比较同一份数据的三种读取 + 编码方式，报告每 1000 行消耗的 CPU 时间。
+  orm+stdlib   加载 ORM 对象 -> to_dict() -> 标准库 json (改动前的做法)
+  dto+stdlib   只查询需要的列 -> DTO (sale_system/read_models.py) -> 标准库 json
+  dto+orjson   同上，用 orjson 编码 (app/json_provider.py；没有安装 orjson 时跳过)
+同时检查三种方式输出的字节完全相同，不同时以非零状态退出。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --orders 20000 --catalogue 10000 --repeat 10
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import generate  # noqa: E402
+
+
+def _make_app(workdir):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        DEBUG = True  # 不写 app/logs (这里直接调用紧凑编码，不受调试模式影响)
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        STATIC_FOLDER = os.path.join(workdir, 'static')
+        UPLOAD_FOLDER = os.path.join(workdir, 'static', 'uploads')
+        SNAPSHOT_CACHE_ENABLED = False
+        METRICS_ENABLED = False
+        ORDER_SWEEPER_ENABLED = False
+        DIAGNOSTICS_FOLDER = os.path.join(workdir, 'logs')
+
+    app = create_app(BenchConfig)
+    app.logger.disabled = True
+    return app
+
+
+def _lists(event_id):
+    """[(名称, ORM 构建函数, DTO 构建函数)]，构建函数返回要交给 jsonify 的对象"""
+    from app.models import (
+        Event, MasterProduct, Product, Order, order_load_options, product_load_options,
+    )
+    from app.sale_system.read_models import (
+        EventDTO, MasterProductDTO, ProductDTO, event_query, master_product_query, product_query,
+        order_query, load_orders,
+    )
+
+    def orders_orm():
+        orders = Order.query.options(*order_load_options()).filter_by(event_id=event_id)\
+            .order_by(Order.timestamp.desc(), Order.id.desc()).all()
+        return [o.to_dict() for o in orders]
+
+    def orders_dto():
+        rows = order_query().filter(Order.event_id == event_id)\
+            .order_by(Order.timestamp.desc(), Order.id.desc()).all()
+        return load_orders(rows)
+
+    def master_products_orm():
+        return [p.to_dict() for p in MasterProduct.query.order_by(MasterProduct.product_code, MasterProduct.id)]
+
+    def master_products_dto():
+        rows = master_product_query().order_by(MasterProduct.product_code, MasterProduct.id).all()
+        return [MasterProductDTO(row) for row in rows]
+
+    def menu_orm():
+        products = Product.query.options(*product_load_options())\
+            .filter_by(event_id=event_id).order_by(Product.id).all()
+        return [p.to_dict() for p in products]
+
+    def menu_dto():
+        rows = product_query().filter(Product.event_id == event_id).order_by(Product.id).all()
+        return [ProductDTO(row) for row in rows]
+
+    def events_orm():
+        return [e.to_dict() for e in Event.query.order_by(Event.date.desc())]
+
+    def events_dto():
+        return [EventDTO(row) for row in event_query().order_by(Event.date.desc())]
+
+    return [
+        ('orders', orders_orm, orders_dto),
+        ('master-products', master_products_orm, master_products_dto),
+        ('menu', menu_orm, menu_dto),
+        ('events', events_orm, events_dto),
+    ]
+
+
+def _measure(app, build, use_orjson, repeat):
+    """返回 (编码结果, 行数, 每次的总 CPU 毫秒, 每次编码部分的 CPU 毫秒)；每次都用新的会话，与真实请求一样"""
+    from app import db
+
+    provider = app.json
+    provider.use_orjson = use_orjson
+    totals, encodes = [], []
+    payload = rows = None
+    for _ in range(repeat + 1):  # 第一次是预热
+        db.session.remove()
+        started = time.process_time()
+        obj = build()
+        built = time.process_time()
+        payload = provider.encode_compact(obj)
+        finished = time.process_time()
+        totals.append((finished - started) * 1000)
+        encodes.append((finished - built) * 1000)
+        rows = len(obj)
+    db.session.remove()
+    return payload, rows, totals[1:], encodes[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=5000, help='展会的订单数')
+    parser.add_argument('--products', type=int, default=300, help='展会的商品数')
+    parser.add_argument('--catalogue', type=int, default=5000, help='主商品数')
+    parser.add_argument('--events', type=int, default=20, help='展会数 (只有第一个有完整的订单量)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import db
+    from app.json_provider import orjson
+
+    workdir = tempfile.mkdtemp(prefix='bench_serialization_')
+    failed = False
+    try:
+        app = _make_app(workdir)
+        with app.test_request_context():
+            db.create_all()
+            fixture = generate(db, events=1, products=args.products, orders=args.orders, catalogue=args.catalogue)
+            if args.events > 1:
+                generate(db, events=args.events - 1, products=10, orders=10, catalogue=10, prefix='OLD')
+            event_id = fixture['event_ids'][0]
+
+            variants = [('orm+stdlib', 0, False), ('dto+stdlib', 1, False)]
+            if orjson is not None:
+                variants.append(('dto+orjson', 1, True))
+            else:
+                print('未安装 orjson，跳过 dto+orjson', file=sys.stderr)
+
+            print('每 1000 行的 CPU 毫秒 (中位数)，括号内为其中编码 JSON 的部分')
+            print(f"{'列表':<18}{'行数':>8}" + ''.join(f'{name:>22}' for name, _, _ in variants) + f"{'节省':>8}")
+            for name, orm_build, dto_build in _lists(event_id):
+                builders = (orm_build, dto_build)
+                cells = []
+                totals = []
+                payloads = []
+                rows = 0
+                for _, builder_index, use_orjson in variants:
+                    payload, rows, timings, encodes = _measure(app, builders[builder_index], use_orjson, args.repeat)
+                    payloads.append(payload)
+                    scale = 1000 / max(rows, 1)
+                    totals.append(statistics.median(timings) * scale)
+                    cells.append(f'{totals[-1]:.1f} ({statistics.median(encodes) * scale:.1f})')
+                identical = all(p == payloads[0] for p in payloads)
+                failed |= not identical
+                saved = 1 - totals[-1] / totals[0] if totals[0] else 0
+                print(f"{name:<18}{rows:>8}" + ''.join(f'{cell:>22}' for cell in cells)
+                      + f"{saved:>8.0%}" + ('' if identical else '    输出不一致!'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        print('存在输出不一致的列表', file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
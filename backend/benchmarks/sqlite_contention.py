@@ -0,0 +1,158 @@
+"""
+SQLite 读写并发基准：多个读进程 (订单列表/统计/菜单)、导出进程 (流式批量导出，读事务持续整个导出过程)
+与多个写进程 (下单 + 完成订单) 同时运行，
+分别在 "默认配置" (回滚日志、延迟事务、不重试) 和 "生产配置" (WAL、BEGIN IMMEDIATE、锁冲突重试) 下
+统计吞吐量、错误数和延迟。每种配置使用独立的临时数据库，统计快照缓存关闭，读请求全部落到数据库。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/sqlite_contention.py --readers 4 --exporters 1 --writers 3 --duration 5
+    python benchmarks/sqlite_contention.py --json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PRODUCTS = 20
+
+
+def _make_app(db_path, profile):
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        SNAPSHOT_CACHE_ENABLED = False
+        EXPORT_CACHE_FOLDER = db_path + '-exports'
+        SQLITE_PROFILE_ENABLED = profile
+        SQLITE_WRITE_RETRIES = 3 if profile else 0
+        ORDER_SWEEPER_ENABLED = False  # 合成数据的待处理订单都是 "过期" 的
+
+    app = create_app(BenchConfig)
+    app.logger.disabled = True
+    return app
+
+
+def _setup(db_path, profile):
+    from app import db
+    from app.models import Event, MasterProduct, Product
+
+    app = _make_app(db_path, profile)
+    with app.app_context():
+        db.create_all()
+        event = Event(name='contention', date=date.today(), status='进行中')
+        db.session.add(event)
+        db.session.flush()
+        for i in range(PRODUCTS):
+            mp = MasterProduct(product_code=f'BUSY-{i:04d}', name=f'并发商品{i}', default_price=10)
+            db.session.add(mp)
+            db.session.flush()
+            db.session.add(Product(event_id=event.id, master_product_id=mp.id, price=10, initial_stock=10 ** 7))
+        db.session.commit()
+        return event.id, [p.id for p in Product.query.filter_by(event_id=event.id)]
+
+
+def _worker(args):
+    role, db_path, profile, event_id, product_ids, start_at, duration, seed = args
+    import random
+
+    app = _make_app(db_path, profile)
+    client = app.test_client()
+    # 所有进程创建好应用后同时开始，保证统计窗口一致
+    time.sleep(max(0, start_at - time.time()))
+    deadline = start_at + duration
+    rng = random.Random(seed)
+    result = {'role': role, 'ok': 0, 'errors': 0, 'latencies': []}
+    read_urls = [
+        f'/sale/api/events/{event_id}/orders?status=pending',
+        f'/sale/api/events/{event_id}/stats',
+        f'/sale/api/events/{event_id}/products',
+    ]
+    while time.time() < deadline:
+        started = time.perf_counter()
+        if role == 'reader':
+            ok = client.get(rng.choice(read_urls)).status_code == 200
+        elif role == 'exporter':
+            response = client.get('/sale/api/events/sales_summary/export')
+            ok = response.status_code == 200 and len(response.get_data()) > 0
+        else:
+            items = [{'product_id': pid, 'quantity': 1} for pid in rng.sample(product_ids, k=2)]
+            response = client.post(f'/sale/api/events/{event_id}/orders', json={'items': items})
+            ok = response.status_code == 201
+            if ok:
+                order_id = response.get_json()['id']
+                ok = client.put(
+                    f'/sale/api/events/{event_id}/orders/{order_id}/status', json={'status': 'completed'}
+                ).status_code == 200
+        result['latencies'].append((time.perf_counter() - started) * 1000)
+        result['ok' if ok else 'errors'] += 1
+    return result
+
+
+def run(profile, readers, exporters, writers, duration):
+    db_path = tempfile.mktemp(suffix='.db', prefix='contention_')
+    try:
+        event_id, product_ids = _setup(db_path, profile)
+        start_at = time.time() + 2
+        roles = ['reader'] * readers + ['exporter'] * exporters + ['writer'] * writers
+        jobs = [
+            (role, db_path, profile, event_id, product_ids, start_at, duration, i)
+            for i, role in enumerate(roles)
+        ]
+        with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+            results = pool.map(_worker, jobs)
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        shutil.rmtree(db_path + '-exports', ignore_errors=True)
+
+    report = {}
+    for role in ('reader', 'exporter', 'writer'):
+        role_results = [r for r in results if r['role'] == role]
+        latencies = sorted(l for r in role_results for l in r['latencies'])
+        report[role] = {
+            'ok': sum(r['ok'] for r in role_results),
+            'errors': sum(r['errors'] for r in role_results),
+            'per_second': round(sum(r['ok'] for r in role_results) / duration, 1),
+            'p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 1) if latencies else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4, help='读进程数')
+    parser.add_argument('--exporters', type=int, default=1, help='导出进程数 (长时间持有读事务)')
+    parser.add_argument('--writers', type=int, default=3, help='写进程数')
+    parser.add_argument('--duration', type=float, default=5, help='每种配置运行的秒数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    report = {
+        'default': run(False, args.readers, args.exporters, args.writers, args.duration),
+        'production': run(True, args.readers, args.exporters, args.writers, args.duration),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'配置':<12}{'角色':<8}{'成功/秒':>10}{'错误':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, roles in report.items():
+        for role, r in roles.items():
+            if not r['ok'] and not r['errors']:
+                continue
+            print(f"{mode:<12}{role:<8}{r['per_second']:>10}{r['errors']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+冷启动基准：在全新的子进程中执行 `from app import create_app; create_app()`，
+统计导入 + 创建应用的耗时和进程常驻内存 (RSS)，即每个 gunicorn worker 启动时的开销。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/startup.py                    # 默认 (延迟导入) 与预加载两种模式各跑 5 次
+    python benchmarks/startup.py --budget-ms 600    # 默认模式的中位耗时超过 600ms 时以非零状态退出
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行的测量代码
+CHILD_CODE = r'''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+elapsed_ms = (time.perf_counter() - started) * 1000
+
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+
+from app.warmup import HEAVY_MODULES
+print(json.dumps({
+    'elapsed_ms': elapsed_ms,
+    'rss_mb': rss_kb / 1024,
+    'heavy_loaded': [m for m in HEAVY_MODULES if m in sys.modules],
+}))
+'''
+
+
+def run_once(preload, db_path):
+    env = dict(os.environ)
+    env['PRELOAD_HEAVY_MODULES'] = 'true' if preload else 'false'
+    env['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # 调试模式不写文件日志，避免污染 app/logs
+    env['FLASK_DEBUG'] = '1'
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(preload, runs, db_path):
+    results = [run_once(preload, db_path) for _ in range(runs)]
+    return {
+        'median_ms': statistics.median(r['elapsed_ms'] for r in results),
+        'max_ms': max(r['elapsed_ms'] for r in results),
+        'median_rss_mb': statistics.median(r['rss_mb'] for r in results),
+        'heavy_loaded': results[-1]['heavy_loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='每种模式运行的次数')
+    parser.add_argument('--budget-ms', type=float, default=None, help='默认模式中位耗时的上限 (毫秒)')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    db_path = tempfile.mktemp(suffix='.db', prefix='startup_')
+    try:
+        report = {
+            'lazy': measure(False, args.runs, db_path),
+            'preload': measure(True, args.runs, db_path),
+        }
+    finally:
+        for path in (db_path, db_path + '-snapshots'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for mode, r in report.items():
+            print(f"{mode:<8} 中位 {r['median_ms']:7.1f} ms  最大 {r['max_ms']:7.1f} ms  "
+                  f"RSS {r['median_rss_mb']:6.1f} MB  已加载: {', '.join(r['heavy_loaded']) or '无'}")
+
+    if args.budget_ms is not None and report['lazy']['median_ms'] > args.budget_ms:
+        print(f"启动耗时超出预算: {report['lazy']['median_ms']:.1f} ms > {args.budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+上传文件缓存检查：用一个按 HTTP 缓存规则工作的 "浏览器缓存" 访问商品图片两轮，
+统计第二轮 (刷新页面) 时有多少请求真正到达了 Flask worker。
+
+期望结果：
+  - 带内容摘要 (?v=) 的地址：第二轮 0 个请求到达 worker (Cache-Control: immutable)
+  - 不带摘要的旧地址：第二轮全部是带 If-None-Match 的协商请求，返回 304、不发送文件内容
+  - 摘要不匹配的地址不会得到 immutable
+  - 开启 STATIC_ACCEL_REDIRECT_PREFIX 时响应体为空，只有 X-Accel-Redirect 头
+任何一项不符合时以非零状态退出。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/static_cache.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+IMAGE_COUNT = 20
+
+
+class BrowserCache:
+    """最小化的浏览器缓存：immutable / max-age 未过期时不发请求，否则带 ETag 协商"""
+
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}
+
+    def get(self, url):
+        cached = self.entries.get(url)
+        if cached and 'immutable' in cached['cache_control']:
+            return cached['body']
+        headers = {'If-None-Match': cached['etag']} if cached and cached['etag'] else {}
+        response = self.client.get(url, headers=headers)
+        if response.status_code == 304:
+            return cached['body']
+        assert response.status_code == 200, f'{url} 返回 {response.status_code}'
+        self.entries[url] = {
+            'etag': response.headers.get('ETag'),
+            'cache_control': response.headers.get('Cache-Control', ''),
+            'body': response.get_data(),
+        }
+        return self.entries[url]['body']
+
+
+def main():
+    from config import Config
+    from app import create_app
+    from app.static_files import versioned_url
+
+    static_dir = tempfile.mkdtemp(prefix='static_cache_')
+    db_path = tempfile.mktemp(suffix='.db', prefix='static_cache_')
+
+    class BenchConfig(Config):
+        STATIC_FOLDER = static_dir
+        UPLOAD_FOLDER = os.path.join(static_dir, 'uploads')
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+
+    failures = []
+    try:
+        app = create_app(BenchConfig)
+        worker_hits = []
+        app.before_request(lambda: worker_hits.append(1) and None)
+
+        plain_urls = []
+        for i in range(IMAGE_COUNT):
+            path = os.path.join(BenchConfig.UPLOAD_FOLDER, 'products', f'{i}_thumb.webp')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(2048))
+            plain_urls.append(f'/static/uploads/products/{i}_thumb.webp')
+        with app.app_context():
+            versioned_urls = [versioned_url(url) for url in plain_urls]
+
+        for label, urls in (('带摘要', versioned_urls), ('不带摘要', plain_urls)):
+            browser = BrowserCache(app.test_client())
+            first = [browser.get(url) for url in urls]
+            worker_hits.clear()
+            second = [browser.get(url) for url in urls]
+            print(f'{label:<8} 第二轮到达 worker 的请求: {len(worker_hits)}/{len(urls)}')
+            if first != second:
+                failures.append(f'{label}: 两轮内容不一致')
+            if label == '带摘要' and worker_hits:
+                failures.append('带摘要的地址在第二轮仍然到达了 worker')
+
+        client = app.test_client()
+        response = client.get(plain_urls[0])
+        revalidated = client.get(plain_urls[0], headers={'If-None-Match': response.headers['ETag']})
+        print(f'协商请求: {revalidated.status_code}, 响应体 {len(revalidated.get_data())} 字节')
+        if revalidated.status_code != 304 or revalidated.get_data():
+            failures.append('不带摘要的地址协商后没有返回空的 304')
+
+        wrong = client.get(plain_urls[0] + '?v=000000000000')
+        if 'immutable' in wrong.headers.get('Cache-Control', ''):
+            failures.append('摘要不匹配的地址得到了 immutable')
+
+        app.config['STATIC_ACCEL_REDIRECT_PREFIX'] = '/_accel/static/'
+        accel = client.get(versioned_urls[0])
+        print(f"X-Accel-Redirect: {accel.headers.get('X-Accel-Redirect')}, 响应体 {len(accel.get_data())} 字节")
+        if accel.get_data() or accel.headers.get('X-Accel-Redirect') != '/_accel/static/uploads/products/0_thumb.webp':
+            failures.append('X-Accel-Redirect 模式仍然由 worker 发送了文件内容')
+    finally:
+        shutil.rmtree(static_dir, ignore_errors=True)
+        for path in (db_path, db_path + '-snapshots'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    for failure in failures:
+        print(f'失败: {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
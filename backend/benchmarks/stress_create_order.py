@@ -0,0 +1,140 @@
+"""
+并发下单压力测试：多个进程同时对同一个展会下单，验证不会超卖，并统计吞吐量。
+
+用法 (在 backend 目录下执行)：
+    python benchmarks/stress_create_order.py --processes 3 --orders 200 --stock 50
+    python benchmarks/stress_create_order.py --no-sqlite-profile    # 关闭 SQLITE_PROFILE_ENABLED 再跑一遍
+
+脚本使用临时 SQLite 数据库，不会影响 app.db。
+开始前检查库存预留能随事务回滚 (预留放在 SAVEPOINT 里，不能提前提交)；
+结束时检查每个商品 已售 + 预留 <= 初始库存，且计数器与订单明细一致，否则以非零状态退出。
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _setup_database(products, stock):
+    from app import create_app, db
+    from app.models import Event, MasterProduct, Product
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        event = Event(name='stress', date=date.today(), status='进行中')
+        db.session.add(event)
+        db.session.flush()
+        for i in range(products):
+            mp = MasterProduct(product_code=f'STRESS-{i:04d}', name=f'压测商品{i}', default_price=10)
+            db.session.add(mp)
+            db.session.flush()
+            db.session.add(Product(event_id=event.id, master_product_id=mp.id, price=10, initial_stock=stock))
+        db.session.commit()
+        return event.id, [p.id for p in Product.query.filter_by(event_id=event.id)]
+
+
+def _check_reservation_rollback(event_id, product_id):
+    """预留库存后回滚整个事务，预留数量应当不变；返回 (回滚前, 回滚后) 的预留数量"""
+    from app import create_app, db
+    from app.models import Product
+    from app.sale_system.inventory import reserve_stock
+
+    app = create_app()
+    with app.app_context():
+        before = db.session.get(Product, product_id).reserved_quantity
+        db.session.rollback()
+        if reserve_stock(event_id, {product_id: 2}):
+            return before, None
+        db.session.rollback()
+        return before, db.session.get(Product, product_id).reserved_quantity
+
+
+def _worker(args):
+    event_id, product_ids, orders, seed = args
+    from app import create_app
+
+    app = create_app()
+    client = app.test_client()
+    rng = random.Random(seed)
+    counts = {'created': 0, 'rejected': 0, 'errors': 0}
+    for _ in range(orders):
+        items = [
+            {'product_id': pid, 'quantity': rng.randint(1, 3)}
+            for pid in rng.sample(product_ids, k=min(len(product_ids), rng.randint(1, 3)))
+        ]
+        response = client.post(f'/sale/api/events/{event_id}/orders', json={'items': items})
+        if response.status_code == 201:
+            counts['created'] += 1
+        elif response.status_code == 406:
+            counts['rejected'] += 1
+        else:
+            counts['errors'] += 1
+    return counts
+
+
+def _check_oversell(event_id):
+    from app import create_app
+    from app.models import Product
+    from app.sale_system.inventory import recount_products
+
+    app = create_app()
+    with app.app_context():
+        oversold = [
+            p.id for p in Product.query.filter_by(event_id=event_id)
+            if p.sold_quantity + p.reserved_quantity > p.initial_stock
+        ]
+        mismatches = recount_products(event_id=event_id)
+        return oversold, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=3, help='并发进程数 (默认与 gunicorn worker 数一致)')
+    parser.add_argument('--orders', type=int, default=200, help='每个进程提交的订单数')
+    parser.add_argument('--products', type=int, default=5, help='商品数量 (越少竞争越激烈)')
+    parser.add_argument('--stock', type=int, default=50, help='每个商品的初始库存')
+    parser.add_argument('--no-sqlite-profile', action='store_true', help='关闭 SQLITE_PROFILE_ENABLED (不设置 WAL 等)')
+    args = parser.parse_args()
+
+    db_path = tempfile.mktemp(suffix='.db', prefix='stress_')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    if args.no_sqlite_profile:
+        os.environ['SQLITE_PROFILE_ENABLED'] = 'false'
+    try:
+        event_id, product_ids = _setup_database(args.products, args.stock)
+        before, after = _check_reservation_rollback(event_id, product_ids[0])
+        print(f"预留后回滚: 预留数量 {before} -> {after}")
+        if after != before:
+            sys.exit(1)
+
+        jobs = [(event_id, product_ids, args.orders, seed) for seed in range(args.processes)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(_worker, jobs)
+        elapsed = time.perf_counter() - started
+
+        totals = {key: sum(r[key] for r in results) for key in ('created', 'rejected', 'errors')}
+        requests_total = sum(totals.values())
+        oversold, mismatches = _check_oversell(event_id)
+
+        print(f"进程数: {args.processes}, 请求总数: {requests_total}, 耗时: {elapsed:.2f}s")
+        print(f"成功: {totals['created']}, 库存不足: {totals['rejected']}, 错误: {totals['errors']}")
+        print(f"吞吐量: {requests_total / elapsed:.1f} req/s")
+        print(f"超卖商品: {oversold or '无'}, 计数器不一致: {len(mismatches)}")
+        if oversold or mismatches:
+            sys.exit(1)
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,98 @@ class Config:
     
     # 关闭 SQLAlchemy 的事件通知系统，以节省资源
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite 生产配置 (见 app/sqlite_profile.py)：WAL、busy_timeout、缓存大小，写接口使用 BEGIN IMMEDIATE
+    SQLITE_PROFILE_ENABLED = os.environ.get('SQLITE_PROFILE_ENABLED', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+    # 写接口遇到锁冲突时的最大重试次数
+    SQLITE_WRITE_RETRIES = int(os.environ.get('SQLITE_WRITE_RETRIES', 3))
     
+    # 启动时是否预加载 openpyxl / PIL (默认关闭，第一次用到时才导入)
+    PRELOAD_HEAVY_MODULES = os.environ.get('PRELOAD_HEAVY_MODULES', 'false').lower() == 'true'
+
+    # 销售总结 Excel 的磁盘缓存目录 (按展会数据版本缓存，可以随时清空)
+    EXPORT_CACHE_FOLDER = os.environ.get('EXPORT_CACHE_FOLDER') or os.path.join(basedir, 'cache', 'exports')
+    # 批量导出 (ZIP) 时并行生成 Excel 的线程数
+    BULK_EXPORT_WORKERS = int(os.environ.get('BULK_EXPORT_WORKERS', 4))
+
+    # 商品图片后台处理的线程数；IMAGE_PIPELINE_SYNC=true 时在请求内同步处理 (脚本/调试用)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_PIPELINE_SYNC = os.environ.get('IMAGE_PIPELINE_SYNC', 'false').lower() == 'true'
+
+    # 主商品目录批量导入：每批处理的行数、生成图片的进程数 (0 表示在当前进程内处理)、
+    # 接口响应中最多列出的行数 (数量统计不受影响)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+    IMPORT_IMAGE_WORKERS = int(os.environ.get('IMPORT_IMAGE_WORKERS', os.cpu_count() or 1))
+    IMPORT_REPORT_MAX_ROWS = int(os.environ.get('IMPORT_REPORT_MAX_ROWS', 1000))
+
+    # 设置后 /static 和 /uploads 路由只返回 X-Accel-Redirect 头 (例如 /_accel/static/)，由 nginx 发送文件
+    STATIC_ACCEL_REDIRECT_PREFIX = os.environ.get('STATIC_ACCEL_REDIRECT_PREFIX')
+
+    # 批量修改订单状态接口每次最多处理的订单数
+    ORDER_BATCH_MAX_SIZE = int(os.environ.get('ORDER_BATCH_MAX_SIZE', 200))
+
+    # 待处理订单的自动取消 (见 app/sale_system/order_sweeper.py)
+    # 默认保留时长 (分钟，展会可以单独设置，0 表示不取消)：默认 0，只有单独设置了保留时长的展会才会自动取消；
+    # 只处理状态为 "进行中" 的展会。进程内定时执行的开关、间隔 (秒) 与每批订单数。
+    # 关闭进程内执行后可以用 cron 调用 flask expire-orders
+    PENDING_ORDER_TTL_MINUTES = int(os.environ.get('PENDING_ORDER_TTL_MINUTES', 0))
+    ORDER_SWEEPER_ENABLED = os.environ.get('ORDER_SWEEPER_ENABLED', 'true').lower() == 'true'
+    ORDER_SWEEPER_INTERVAL = float(os.environ.get('ORDER_SWEEPER_INTERVAL', 60))
+    ORDER_SWEEPER_BATCH_SIZE = int(os.environ.get('ORDER_SWEEPER_BATCH_SIZE', 200))
+
+    # 下单接口的幂等键 (Idempotency-Key)：保存成功响应的时长 (秒)、清理过期记录的间隔 (秒)
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', 600))
+
+    # 列表接口分页 (订单、主商品)：默认/最大每页条数；
+    # LEGACY_UNPAGINATED_LISTS=true 时不带 limit/cursor 的请求仍一次返回全部 (旧版客户端)
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 50))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 200))
+    LEGACY_UNPAGINATED_LISTS = os.environ.get('LEGACY_UNPAGINATED_LISTS', 'true').lower() == 'true'
+
+    # jsonify 的编码器：auto 表示装有 orjson 时使用 (输出与标准库逐字节相同)，stdlib 表示始终用标准库 json
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
     # 文件上传配置
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))   # 16MB 最大文件大小
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+    # 订单推送 (SSE) 配置
+    # 服务端检查变更流水的间隔 (秒)、心跳间隔 (秒)、单个连接的最长保持时间 (秒，到期后浏览器会带 Last-Event-ID 自动重连)
+    ORDER_STREAM_POLL_INTERVAL = float(os.environ.get('ORDER_STREAM_POLL_INTERVAL', 0.5))
+    ORDER_STREAM_HEARTBEAT = float(os.environ.get('ORDER_STREAM_HEARTBEAT', 15))
+    ORDER_STREAM_MAX_AGE = float(os.environ.get('ORDER_STREAM_MAX_AGE', 300))
+    # 订单变更流水的保留时长 (秒)，由订单自动取消的定时任务顺带清理；断线超过这个时长的页面重连后会重新拉取完整列表
+    ORDER_CHANGE_RETENTION = int(os.environ.get('ORDER_CHANGE_RETENTION', 24 * 3600))
+
+    # 统计快照缓存配置 (按展会数据版本缓存，所有 worker 共享)
+    # 默认存放在 SQLite 数据库文件旁边 (app.db-snapshots)
+    # 命中时只读；访问时间和命中次数在各 worker 内累计，至多每 SNAPSHOT_CACHE_FLUSH_INTERVAL 秒写入一次
+    SNAPSHOT_CACHE_ENABLED = os.environ.get('SNAPSHOT_CACHE_ENABLED', 'true').lower() == 'true'
+    SNAPSHOT_CACHE_PATH = os.environ.get('SNAPSHOT_CACHE_PATH')
+    SNAPSHOT_CACHE_MAX_ENTRIES = int(os.environ.get('SNAPSHOT_CACHE_MAX_ENTRIES', 256))
+    SNAPSHOT_CACHE_FLUSH_INTERVAL = float(os.environ.get('SNAPSHOT_CACHE_FLUSH_INTERVAL', 5.0))
+
+    # 请求计时与 /metrics (Prometheus 文本格式)
+    # 各 worker 至多每 METRICS_FLUSH_INTERVAL 秒把累计值写入共享文件，默认在数据库文件旁边 (app.db-metrics)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_PATH = os.environ.get('METRICS_PATH')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+
+    # 线上诊断 (见 app/diagnostics.py)，输出目录默认为 app/logs，通过 /sale/api/admin/diagnostics/* 查看
+    DIAGNOSTICS_FOLDER = os.environ.get('DIAGNOSTICS_FOLDER')
+    # 慢查询日志：记录耗时超过 SLOW_QUERY_MS 毫秒的 SQL (语句、参数、耗时、来源接口)，按大小轮转
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'false').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+    # 采样分析：按比例抽取请求，每 PROFILER_INTERVAL_MS 毫秒抓一次调用栈，
+    # 耗时不少于 PROFILER_MIN_DURATION_MS 的写成 collapsed stack 文件，总大小超过 PROFILER_MAX_BYTES 时删除最旧的
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.01))
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+    PROFILER_MIN_DURATION_MS = float(os.environ.get('PROFILER_MIN_DURATION_MS', 0))
+    PROFILER_MAX_BYTES = int(os.environ.get('PROFILER_MAX_BYTES', 50 * 1024 * 1024))
@@ -13,7 +13,8 @@ module.exports = {
       script: path.join(backendDir, 'venv', 'bin', 'gunicorn'),
       
       // Gunicorn 参数 (我们之前已经修正过)
-      args: `--workers 3 --bind ${socketPath} run:app`,
+      // 使用 gthread worker：订单推送 (SSE) 的长连接只占用一个线程，不会占满 worker
+      args: `--workers 3 --worker-class gthread --threads 32 --bind ${socketPath} run:app`,
 
       // 工作目录
       cwd: backendDir,
@@ -32,6 +33,8 @@ module.exports = {
       // 环境变量
       env_production: {
         NODE_ENV: 'production',
+        // 带摘要的静态文件请求由后端核对摘要后，交给 nginx 的 /_accel/static/ 发送文件内容 (见 deploy.sh)
+        STATIC_ACCEL_REDIRECT_PREFIX: '/_accel/static/',
       },
     },
   ],
@@ -147,10 +147,40 @@ server {
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
 
-    # 后端静态文件服务 (如果需要)
+    # Prometheus 指标 (各 worker 合并后的请求耗时直方图等)，只允许本机抓取
+    location = /metrics {
+        allow 127.0.0.1;
+        deny all;
+        proxy_pass http://unix:${SOCKET_PATH};
+    }
+
+    # 后端静态文件服务 (上传的商品图片、收款码等)
+    # 不带内容摘要的地址由 nginx 直接发送，每次用 ETag 协商 (未变化时 304)；
+    # 带摘要 (?v=...) 的地址交给后端核对摘要：与文件内容一致才返回 immutable 缓存头，
+    # 过期或伪造的 v 不会让浏览器把错误的内容缓存一年。文件内容仍由 nginx 发送 (X-Accel-Redirect)
     location /static {
+        if (\$arg_v) {
+            return 418;
+        }
+        error_page 418 = @versioned_static;
         alias ${BACKEND_DIR}/static;
-        expires 7d;
+        etag on;
+        add_header Cache-Control "no-cache" always;
+    }
+
+    location @versioned_static {
+        proxy_pass http://unix:${SOCKET_PATH};
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+    }
+
+    # X-Accel-Redirect 的目标：后端设置 STATIC_ACCEL_REDIRECT_PREFIX=/_accel/static/ 时 (见 ecosystem.config.js)，
+    # 经过 Gunicorn 的文件请求只返回响应头 (Cache-Control 由后端决定)，文件内容由 nginx 从这里发送
+    location /_accel/static/ {
+        internal;
+        alias ${BACKEND_DIR}/static/;
     }
 }
 EOF
@@ -15,6 +15,7 @@ export const useCustomerStore = defineStore('customer', () => {
   const error = ref(null);
   const activeEventId = ref(null);
   const activeEvent = ref(null); // 新增：当前展会信息
+  const menuVersion = ref(null); // 新增：菜单版本号，用于只拉取库存变化
 
   // --- Actions ---
   function setupStoreForEvent(eventId) {
@@ -49,6 +50,7 @@ export const useCustomerStore = defineStore('customer', () => {
     try {
       const response = await api.get(`/events/${activeEventId.value}/products`);
       products.value = response.data;
+      menuVersion.value = parseInt(response.headers['x-menu-version'], 10);
     } catch (err) {
       error.value = '加载商品失败，请联系摊主。';
       console.error(err);
@@ -57,6 +59,31 @@ export const useCustomerStore = defineStore('customer', () => {
     }
   }
 
+  // 新增：只拉取上次之后库存变化过的商品，刷新售罄状态 (商品阵容变化时服务端会返回完整列表)
+  async function refreshStock() {
+    if (!activeEventId.value) return;
+    if (menuVersion.value === null || Number.isNaN(menuVersion.value)) {
+      return fetchProductsForEvent();
+    }
+    try {
+      const response = await api.get(`/events/${activeEventId.value}/products`, {
+        params: { since_version: menuVersion.value },
+      });
+      const { version, full, products: changed } = response.data;
+      if (full) {
+        products.value = changed;
+      } else {
+        for (const { id, current_stock } of changed) {
+          const product = products.value.find(p => p.id === id);
+          if (product) product.current_stock = current_stock;
+        }
+      }
+      menuVersion.value = version;
+    } catch (err) {
+      console.error('刷新库存失败:', err);
+    }
+  }
+
   // 新增：获取展会信息
   async function fetchEventInfo() {
     if (!activeEventId.value) return;
@@ -102,6 +129,15 @@ export const useCustomerStore = defineStore('customer', () => {
     cart.value = [];
   }
 
+  // 上一次未成功的提交 (购物车内容 + 幂等键)
+  let pendingSubmission = null;
+
+  function newIdempotencyKey() {
+    // crypto.randomUUID 只在 HTTPS / localhost 下可用
+    if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+  }
+
   async function submitOrder() {
     if (!activeEventId.value || cart.value.length === 0) return;
 
@@ -112,9 +148,18 @@ export const useCustomerStore = defineStore('customer', () => {
       })),
     };
 
+    // 【新增】幂等键：同一份购物车重试提交时沿用同一个 key，服务端只会创建一次订单
+    const signature = JSON.stringify([activeEventId.value, orderData]);
+    if (!pendingSubmission || pendingSubmission.signature !== signature) {
+      pendingSubmission = { signature, key: newIdempotencyKey() };
+    }
+
     try {
       // 使用 axios.post 发送 HTTP 请求
-      const response = await api.post(`/events/${activeEventId.value}/orders`, orderData);
+      const response = await api.post(`/events/${activeEventId.value}/orders`, orderData, {
+        headers: { 'Idempotency-Key': pendingSubmission.key },
+      });
+      pendingSubmission = null;
       // 成功后返回订单数据，让视图可以触发后续操作（如弹窗）
       return response.data;
     } catch (err) {
@@ -153,6 +198,7 @@ export const useCustomerStore = defineStore('customer', () => {
     activeEvent, // 新增：导出展会信息
     qrCodeUrl, // 新增：导出收款码URL
     fetchProductsForEvent,
+    refreshStock, // 新增：导出库存增量刷新方法
     fetchEventInfo, // 新增：导出获取展会信息方法
     addToCart,
     removeFromCart,
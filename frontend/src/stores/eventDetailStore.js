@@ -12,8 +12,9 @@ export const useEventDetailStore = defineStore('eventDetail', () => {
 
   // --- Actions ---
   // 获取指定展会的商品列表
-  async function fetchProductsForEvent(eventId) {
-    isLoading.value = true;
+  // silent 为 true 时不切换 isLoading，用于后台刷新库存，避免页面闪烁
+  async function fetchProductsForEvent(eventId, { silent = false } = {}) {
+    if (!silent) isLoading.value = true;
     error.value = null;
     try {
       const response = await api.get(`/events/${eventId}/products`);
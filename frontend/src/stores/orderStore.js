@@ -1,13 +1,16 @@
 import { defineStore } from 'pinia';
 import { ref, computed } from 'vue';
-import api from '@/services/api';
+import api, { getApiBaseUrl } from '@/services/api';
 
 export const useOrderStore = defineStore('order', () => {
   const pendingOrders = ref([]);
   // 【新增】存储已完成订单列表
   const completedOrders = ref([]); 
   const activeEventId = ref(null);
+  // 【新增】每收到一次订单推送就加一，组件可以监听它来刷新库存
+  const changeVersion = ref(0);
   let pollingInterval = null;
+  let eventSource = null;
   // 【新增】设置当前活动的展会
   function setActiveEvent(eventId) {
     stopPolling(); // 切换展会时，先停止旧的轮询
@@ -35,19 +38,61 @@ export const useOrderStore = defineStore('order', () => {
     } catch (err) {
       console.error("Polling failed:", err);
       // 如果获取失败（比如展会不存在），停止轮询避免无限报错
-      stopPolling();
+      // (推送模式下由 EventSource 自己重连，重连成功后会再次拉取)
+      if (!eventSource) stopPolling();
     }
   }
 
-  function startPolling() {
-    if (pollingInterval) stopPolling(); // 防止重复启动
+  // 【新增】处理服务端推送的订单变更 (order_created / order_status)
+  function handleOrderChange(event) {
+    const order = JSON.parse(event.data);
+    const isNew = !pendingOrders.value.some(o => o.id === order.id);
+    pendingOrders.value = pendingOrders.value.filter(o => o.id !== order.id);
+
+    if (order.status === 'pending') {
+      // 待处理列表按时间倒序，新订单放在最前面
+      pendingOrders.value.unshift(order);
+      if (isNew && event.type === 'order_created') {
+        const audio = new Audio('/notification.mp3');
+        audio.play();
+      }
+    } else if (order.status === 'completed' && !completedOrders.value.some(o => o.id === order.id)) {
+      completedOrders.value.unshift(order);
+    }
+    changeVersion.value++;
+  }
+
+  // 【新增】断线太久、服务端已清理了断点之后的变更记录时收到 resync，重新拉取完整列表
+  function handleResync() {
     pollPendingOrders();
-    pollingInterval = setInterval(pollPendingOrders, 3000);
+    fetchCompletedOrders();
+    changeVersion.value++;
+  }
+
+  // 【修改】优先使用 SSE 推送 (订单变更实时到达)，浏览器不支持时退回 3 秒轮询
+  function startPolling() {
+    if (pollingInterval || eventSource) stopPolling(); // 防止重复启动
+    if (typeof EventSource === 'undefined') {
+      pollPendingOrders();
+      pollingInterval = setInterval(pollPendingOrders, 3000);
+      return;
+    }
+    eventSource = new EventSource(`${getApiBaseUrl()}/events/${activeEventId.value}/orders/stream`);
+    // 每次 (重新) 连接成功后拉取一次完整的待处理列表，补齐连接建立前的订单
+    eventSource.addEventListener('open', pollPendingOrders);
+    eventSource.addEventListener('order_created', handleOrderChange);
+    eventSource.addEventListener('order_status', handleOrderChange);
+    eventSource.addEventListener('resync', handleResync);
+    // 断线后 EventSource 会自动重连 (并带上 Last-Event-ID)，这里无需处理 error
   }
 
   function stopPolling() {
     clearInterval(pollingInterval);
     pollingInterval = null;
+    if (eventSource) {
+      eventSource.close();
+      eventSource = null;
+    }
   }
 
   async function markOrderAsCompleted(orderId) {
@@ -102,6 +147,7 @@ export const useOrderStore = defineStore('order', () => {
     completedOrders,
     totalRevenue,
     activeEventId,
+    changeVersion,
     setActiveEvent,
     markOrderAsCompleted,
     fetchCompletedOrders,